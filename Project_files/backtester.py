@@ -1,17 +1,32 @@
 import numpy as np
 import pandas as pd
 from enum import Enum
+import os
 import sys
-from datetime import timedelta
 import matplotlib.pyplot as plt
 import math
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-
-transaction_fee = 0.0015
+from datastore import is_store, load_store
+from equity import equity_curve
+from execution import ExecutionModel, transaction_fee
+from profiling import profiler
+from metrics import period_indices, period_pnl, rolling_metrics, sortino_ratio, window_bounds
+from rangequery import SparseTable
 
 sign = lambda x: int(x > 0) - int(x < 0)
 
+# Annualisation factor of the per-trade Sharpe and Sortino ratios
+TRADE_PERIODS_PER_YEAR = 365
+
+
+def infer_bar_duration(datetimes):
+    """Infer the bar duration as the most common gap between consecutive timestamps."""
+    gaps = datetimes.diff()
+    gaps = gaps[gaps > pd.Timedelta(0)]
+    return gaps.mode().min() if len(gaps) else pd.Timedelta(minutes=1)
+
+
 class TradeType(Enum):
     LONG = 1
     SHORT = -1
@@ -20,13 +35,17 @@ class TradeType(Enum):
         return "LONG" if self == TradeType.LONG else "SHORT"
 
 class TradePair:
-    def __init__(self, symbol, qty, init_price, final_price, init_timestamp, final_timestamp):
+    __slots__ = ('symbol', 'qty', 'init_price', 'final_price', 'init_timestamp', 'final_timestamp', 'costs')
+
+    def __init__(self, symbol, qty, init_price, final_price, init_timestamp, final_timestamp, costs=None):
         self.symbol = symbol
         self.qty = qty  # In USD (can be +ve or -ve)
         self.init_price = init_price
         self.final_price = final_price
         self.init_timestamp = init_timestamp
         self.final_timestamp = final_timestamp
+        # Fees and funding in USD, from the ExecutionModel; defaults to the flat transaction fee
+        self.costs = transaction_fee * abs(qty) if costs is None else costs
 
     def __str__(self):
         return f"TRADED {self.symbol} {self.trade_type()} ${self.qty} @{self.init_price} to {self.final_price} in {self.init_timestamp} - {self.final_timestamp}"
@@ -36,8 +55,7 @@ class TradePair:
 
     def pnl(self):
         """Calculate percentage profit and loss for the trade."""
-        return self.qty * (self.final_price - self.init_price) / self.init_price - transaction_fee * abs(self.qty)
-        # return ""
+        return self.qty * (self.final_price - self.init_price) / self.init_price - self.costs
 
     def is_win(self):
         """Check if the trade is a winning trade."""
@@ -53,6 +71,226 @@ class TradePair:
         lowest_price = min(self.init_price, self.final_price)
         return (peak_price - lowest_price) / peak_price * 100
     
+def longest_streaks(wins):
+    """Longest runs of True and of False in a boolean array, via run-length encoding."""
+    if len(wins) == 0:
+        return 0, 0
+    starts = np.flatnonzero(np.r_[True, wins[1:] != wins[:-1]])
+    lengths = np.diff(np.r_[starts, len(wins)])
+    values = wins[starts]
+    return int(lengths[values].max(initial=0)), int(lengths[~values].max(initial=0))
+
+
+class TradeLedger:
+    """Closed trades stored as parallel arrays, with timestamps as int64 nanoseconds.
+
+    Supports len(), iteration, indexing and slicing like a list of TradePair; each
+    item is a TradePair built on demand from one row of the arrays.
+    """
+    FIELDS = ('qty', 'init_price', 'final_price', 'init_time', 'final_time', 'costs')
+
+    def __init__(self, symbol, capacity=1024):
+        self.symbol = symbol
+        self.size = 0
+        self.qty = np.empty(capacity)
+        self.init_price = np.empty(capacity)
+        self.final_price = np.empty(capacity)
+        self.init_time = np.empty(capacity, dtype=np.int64)
+        self.final_time = np.empty(capacity, dtype=np.int64)
+        self.costs = np.empty(capacity)
+
+    def reserve(self, size):
+        """Grow the arrays (at least doubling) so they can hold size trades."""
+        if size <= len(self.qty):
+            return
+        capacity = max(size, 2 * len(self.qty))
+        for name in self.FIELDS:
+            array = getattr(self, name)
+            grown = np.empty(capacity, dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            setattr(self, name, grown)
+
+    def append(self, trade):
+        self.reserve(self.size + 1)
+        i = self.size
+        self.qty[i] = trade.qty
+        self.init_price[i] = trade.init_price
+        self.final_price[i] = trade.final_price
+        self.init_time[i] = pd.Timestamp(trade.init_timestamp).value
+        self.final_time[i] = pd.Timestamp(trade.final_timestamp).value
+        self.costs[i] = trade.costs
+        self.size += 1
+
+    def extend(self, qty, init_price, final_price, init_time, final_time, costs=None):
+        """Append many trades at once from arrays (timestamps as int64 ns or datetime64).
+
+        costs defaults to the flat transaction fee of each trade.
+        """
+        n = len(qty)
+        self.reserve(self.size + n)
+        end = self.size + n
+        self.qty[self.size:end] = qty
+        self.init_price[self.size:end] = init_price
+        self.final_price[self.size:end] = final_price
+        self.init_time[self.size:end] = np.asarray(init_time).view(np.int64)
+        self.final_time[self.size:end] = np.asarray(final_time).view(np.int64)
+        self.costs[self.size:end] = transaction_fee * np.abs(qty) if costs is None else costs
+        self.size = end
+
+    def column(self, name):
+        """View of one field over the stored trades."""
+        return getattr(self, name)[:self.size]
+
+    def trade(self, i):
+        return TradePair(self.symbol, float(self.qty[i]), float(self.init_price[i]), float(self.final_price[i]),
+                         pd.Timestamp(int(self.init_time[i])), pd.Timestamp(int(self.final_time[i])),
+                         float(self.costs[i]))
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self.trade(i)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.trade(i) for i in range(*index.indices(self.size))]
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("trade index out of range")
+        return self.trade(index)
+
+    def pnl(self):
+        """Per-trade pnl, computed exactly as TradePair.pnl()."""
+        qty = self.column('qty')
+        init_price = self.column('init_price')
+        return qty * (self.column('final_price') - init_price) / init_price - self.column('costs')
+
+    def holding_times(self):
+        """Per-trade holding time in nanoseconds."""
+        return self.column('final_time') - self.column('init_time')
+
+
+def trade_excursions(qty, init_price, final_price, low, high):
+    """MAE and MFE (fractions of entry price) of trades held over bars with the given low/high extremes."""
+    low = np.minimum(low, np.minimum(init_price, final_price))
+    high = np.maximum(high, np.maximum(init_price, final_price))
+
+    long = qty > 0
+    adverse = np.where(long, init_price - low, high - init_price) / init_price
+    favourable = np.where(long, high - init_price, init_price - low) / init_price
+    return {'mae': adverse, 'mfe': favourable}
+
+
+def drawdowns(pnl_array, initial_capital=1000):
+    """Maximum and average drawdown (%) of the capital path of a sequence of trade PnLs."""
+    cum_pnl_series = initial_capital + pnl_array.cumsum()
+    cumulative_max = np.maximum.accumulate(cum_pnl_series)
+
+    max_drawdown = np.min((cum_pnl_series - cumulative_max) / cumulative_max)
+    avg_drawdown = np.mean((cum_pnl_series - cumulative_max) / cumulative_max)
+
+    return abs(max_drawdown)*100, abs(avg_drawdown)*100
+
+
+def trade_returns(pnl, init_price):
+    """Per-trade returns shared by the Sharpe and Sortino ratios: pnl over the entry price."""
+    return pnl / init_price
+
+
+def trade_sharpe_ratio(pnl, init_price, risk_free_rate=0.0):
+    returns = trade_returns(pnl, init_price)
+    mean_return = np.mean(returns)
+    return_std = np.std(returns)
+
+    return (mean_return - risk_free_rate)*math.sqrt(TRADE_PERIODS_PER_YEAR) / return_std if return_std > 0 else 0
+
+
+def trade_sortino_ratio(pnl, init_price, risk_free_rate=0.0):
+    """Sortino Ratio of the same per-trade returns and annualisation as trade_sharpe_ratio()."""
+    return sortino_ratio(trade_returns(pnl, init_price), TRADE_PERIODS_PER_YEAR, risk_free_rate)
+
+
+def trade_statistics(trades, benchmark_return, adverse_excursions, initial_capital=1000):
+    """get_statistics() metrics of a trade ledger, or None if it is empty.
+
+    benchmark_return is a fraction and adverse_excursions holds each trade's MAE as a fraction.
+    """
+    total_trades = len(trades)
+    if total_trades==0:
+        return None
+
+    # Everything below is derived from these arrays in one pass over the ledger
+    pnl = trades.pnl()
+    qty = trades.column('qty')
+    holding_times = trades.holding_times()
+    wins = pnl > 0
+
+    winning_trades = int(np.count_nonzero(wins))
+    losing_trades = total_trades - winning_trades
+    long_trades = int(np.count_nonzero(qty > 0))
+    short_trades = total_trades - long_trades
+
+    gross_profit = float(pnl[wins].sum())
+    gross_loss = float(pnl[~wins].sum())
+    net_profit = gross_profit + gross_loss
+    transaction_costs = float(trades.column('costs').sum())
+
+    max_holding_time = pd.Timedelta(int(holding_times.max()))
+    avg_holding_time = pd.Timedelta(int(holding_times.sum())) / total_trades
+
+    largest_win = float(pnl[wins].max()) if winning_trades else 0
+    largest_loss = float(pnl[~wins].min()) if losing_trades else 0
+    average_win = gross_profit / winning_trades if winning_trades else 0
+    average_loss = gross_loss / losing_trades if losing_trades else 0
+
+    winning_streak, losing_streak = longest_streaks(wins)
+
+    max_drawdown, avg_drawdown = drawdowns(pnl, initial_capital)
+
+    sharpe_ratio = trade_sharpe_ratio(pnl, trades.column('init_price'))
+    sortino_ratio = trade_sortino_ratio(pnl, trades.column('init_price'))
+
+    stats = {
+        "static" : {
+            'Total Trades': total_trades,
+            'Leverage Applied': 1,  # Assuming no leverage for now
+            'Winning Trades': winning_trades,
+            'Losing Trades': losing_trades,
+            'No. of Long Trades': long_trades,
+            'No. of Short Trades': short_trades,
+            'Benchmark Return(%)': benchmark_return * 100,
+            'Benchmark Return(on $1000)': benchmark_return * 1000,
+            'Win Rate': winning_trades / total_trades * 100 if total_trades > 0 else 0,
+            'Winning Streak': winning_streak,
+            'Losing Streak': losing_streak,
+            'Gross Profit': net_profit + transaction_costs,
+            'Net Profit': net_profit,
+            'Average Profit': net_profit / total_trades if total_trades > 0 else 0,
+            'Maximum Drawdown(%)': max_drawdown,
+            'Average Drawdown(%)': avg_drawdown,
+            'Largest Win': largest_win,
+            'Average Win': average_win,
+            'Largest Loss': largest_loss,
+            'Average Loss': average_loss,
+            'Maximum Holding Time': max_holding_time,
+            'Average Holding Time': avg_holding_time,
+            'Maximum Adverse Excursion': float(adverse_excursions.max()) * 100,
+            'Average Adverse Excursion': float(adverse_excursions.mean()) * 100,
+            'Sharpe Ratio': sharpe_ratio,
+            'Sortino Ratio': sortino_ratio,
+        },
+        "compound" : {
+            'Trades Executed': total_trades,
+            'Total Profit': net_profit
+        }
+    }
+
+    return stats["static"]
+
+
 class Position:
     def __init__(self, symbol, qty, price, timestamp):
         self.symbol = symbol
@@ -71,8 +309,8 @@ class Position:
         self.price = price
         self.timestamp = timestamp
     
-    def close(self, price, timestamp):
-        trade = TradePair(self.symbol, self.qty, self.price, price, self.timestamp, timestamp)
+    def close(self, price, timestamp, costs=None):
+        trade = TradePair(self.symbol, self.qty, self.price, price, self.timestamp, timestamp, costs)
 
         self.qty = 0
         self.price = None
@@ -82,35 +320,148 @@ class Position:
     
 
 class BackTester:
-    def __init__(self, symbol, signal_data_path, master_file_path = None, compound_flag = 0):
+    def __init__(self, symbol, signal_data_path, master_file_path = None, compound_flag = 0, initial_capital = 1000,
+                 execution = None, bar_duration = None):
+        """Create a backtester over signal data and (optionally finer-grained) master data.
+
+        Each source may be a CSV path, a columnar store directory (see datastore.py), a DataFrame
+        or a dict of column arrays with a 'datetime' column or a DatetimeIndex. If the master source is omitted or is the same object or path
+        as the signal source, one frame is shared for both.
+        initial_capital is the starting capital of the equity curve and drawdown calculations.
+        execution is the ExecutionModel for fees, slippage, funding and fill delay (default: flat fee).
+        bar_duration fixes the bar length instead of inferring it from each source.
+        """
 
         self.compound_flag = compound_flag
+        self.initial_capital = initial_capital
         self.symbol = symbol
+        self.execution = execution or ExecutionModel()
+        self.entry_costs = 0.0
+        self.bar_duration = bar_duration
 
-        self.data = self.preprocess_csv(signal_data_path)
+        self.data = self.load_data(signal_data_path)
 
         if "TP" not in self.data.columns:
             self.data["TP"] = 0
         if "SL" not in self.data.columns:
             self.data["SL"] = 0
 
-        master_file_path = master_file_path if master_file_path else signal_data_path
-        self.master_data = self.preprocess_csv(master_file_path)
+        if master_file_path is None or master_file_path is signal_data_path or (
+                isinstance(master_file_path, (str, os.PathLike)) and isinstance(signal_data_path, (str, os.PathLike))
+                and master_file_path == signal_data_path):
+            self.master_data = self.data
+        else:
+            self.master_data = self.load_data(master_file_path)
+        self.index_master_data()
 
-        self.trades = []
+        self.trades = TradeLedger(symbol)
         self.position = Position(symbol, 0, None, None)
 
         self.tp = 0
         self.sl = 0
+        # Start (int64 ns) of the bar whose close filled the open position; with a fill delay
+        # the position does not exist on the bars before it, so TP/SL is not checked there
+        self.fill_bar_time = np.iinfo(np.int64).min
+
+    def load_data(self, source):
+        """Load a CSV path, columnar store directory, DataFrame or dict of column arrays into a datetime-indexed frame."""
+        if isinstance(source, (str, os.PathLike)):
+            return self.prepare_data(load_store(source)) if is_store(source) else self.preprocess_csv(source)
+        if isinstance(source, dict):
+            return self.prepare_data(pd.DataFrame(source, copy=False))
+        # A shallow copy lets us add columns and reindex without touching the caller's frame
+        return self.prepare_data(source.copy(deep=False))
 
     def preprocess_csv(self, file_path):
         data = pd.read_csv(file_path, header=0)
-        data['datetime'] = pd.to_datetime(data['datetime'])
-        data["nextdatetime"] = data["datetime"] + pd.Timedelta(minutes=1)
-        data.set_index("datetime", inplace=True)
+        return self.prepare_data(data)
+
+    def prepare_data(self, data):
+        """Index data by datetime and add the nextdatetime column."""
+        if "datetime" in data.columns:
+            data['datetime'] = pd.to_datetime(data['datetime'])
+            data.set_index("datetime", inplace=True)
+        datetimes = data.index.to_series()
+        data["nextdatetime"] = datetimes + (self.bar_duration or infer_bar_duration(datetimes))
         return data
 
+    def index_master_data(self):
+        """Hold master data as sorted int64 timestamp arrays and map signal bars onto it."""
+        master = self.master_data
+        if not master.index.is_monotonic_increasing:
+            master = master.sort_index()
+
+        self.master_times = master.index.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        self.master_next_times = master["nextdatetime"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        self.master_high = master["high"].to_numpy(dtype=np.float64)
+        self.master_low = master["low"].to_numpy(dtype=np.float64)
+        # Dollar volume per master row for volume-proportional slippage of stop fills
+        self.master_dollar_volume = (master["volume"].to_numpy(dtype=np.float64) * master["close"].to_numpy(dtype=np.float64)
+                                     if "volume" in master.columns and "close" in master.columns else None)
+        # Range min/max indexes over the master lows/highs, built on first use by get_excursions()
+        self.low_table = self.high_table = None
+
+        # Each signal bar covers the master rows in [datetime, nextdatetime)
+        signal_times = self.data.index.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        signal_next_times = self.data["nextdatetime"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        if "source_start" in self.data.columns and "source_end" in self.data.columns:
+            # Bars from resample.py carry their source row ranges; use them if master is that source
+            bar_start = self.data["source_start"].to_numpy(dtype=np.int64)
+            bar_end = self.data["source_end"].to_numpy(dtype=np.int64)
+            if self.covers_master_rows(bar_start, bar_end, signal_times, signal_next_times):
+                self.bar_start, self.bar_end = bar_start, bar_end
+                return
+        self.bar_start = np.searchsorted(self.master_times, signal_times, side="left")
+        self.bar_end = np.searchsorted(self.master_times, signal_next_times, side="left")
+
+    def covers_master_rows(self, bar_start, bar_end, signal_times, signal_next_times):
+        """Check that [bar_start, bar_end) are exactly the master rows in [datetime, nextdatetime) of every bar."""
+        times = self.master_times
+        n = len(times)
+        if n == 0 or len(bar_start) == 0 or bar_start.min() < 0 or bar_end.max() > n or np.any(bar_start > bar_end):
+            return False
+
+        def bounds(rows, time):
+            # Row `rows` is the first master row at or after time
+            at = (rows == n) | (times[np.minimum(rows, n - 1)] >= time)
+            before = (rows == 0) | (times[np.maximum(rows - 1, 0)] < time)
+            return bool(np.all(at & before))
+
+        return bounds(bar_start, signal_times) and bounds(bar_end, signal_next_times)
+
     def check_tp_sl(self, timestamp, next_timestamp):
+        """Row-by-row reference of check_tp_sl_range() over master data in [timestamp, next_timestamp), used by get_trades_loop()."""
+        if self.position.qty == 0:
+            return None
+
+        if self.tp == 0 and self.sl == 0:
+            return None
+
+        master = self.master_data
+        rows = master[(master.index >= timestamp) & (master.index < next_timestamp)].sort_index()
+        for index, row in rows.iterrows():
+            if self.position.qty > 0:
+                tp_hit = row["high"] >= self.tp and self.tp != 0
+                sl_hit = row["low"] <= self.sl and self.sl != 0
+            else:
+                tp_hit = row["low"] <= self.tp and self.tp != 0
+                sl_hit = row["high"] >= self.sl and self.sl != 0
+            side = "long" if self.position.qty > 0 else "short"
+
+            if tp_hit:
+                trade = self.close_position(self.tp, row["nextdatetime"], maker=True)
+                print(f"Triggered TP for {side}", file = sys.stderr)
+                return trade
+            if sl_hit:
+                dollar_volume = row["volume"] * row["close"] if "volume" in row and "close" in row else 0.0
+                trade = self.close_position(self.sl, row["nextdatetime"], dollar_volume)
+                print(f"Triggered SL for {side}", file = sys.stderr)
+                return trade
+
+        return None
+
+    def check_tp_sl_range(self, start, end):
+        """Close the open position at the first master row in [start, end) that hits TP or SL."""
 
         if self.position.qty == 0:
             return None
@@ -118,31 +469,145 @@ class BackTester:
         if self.tp == 0 and self.sl == 0:
             return None
 
-        trade = None
+        high = self.master_high[start:end]
+        low = self.master_low[start:end]
 
-        for index, row in self.master_data.loc[timestamp : next_timestamp].iterrows():
-            if self.position.qty > 0:
-                if row["high"] >= self.tp and self.tp != 0:
-                    trade = self.position.close(self.tp, row["nextdatetime"])
-                    print("Triggered TP for long", file = sys.stderr)
-                    break
-                elif row["low"] <= self.sl and self.sl != 0:
-                    trade = self.position.close(self.sl, row["nextdatetime"])
-                    print("Triggered SL for long", file = sys.stderr)
-                    break
-            elif self.position.qty < 0:
-                if row["low"] <= self.tp and self.tp != 0:
-                    trade = self.position.close(self.tp, row["nextdatetime"])
-                    print("Triggered TP for short", file = sys.stderr)
-                    break
-                elif row["high"] >= self.sl and self.sl != 0:
-                    trade = self.position.close(self.sl, row["nextdatetime"])
-                    print("Triggered SL for short", file = sys.stderr)
-                    break
+        # TP takes precedence over SL when both are hit within the same row
+        if self.position.qty > 0:
+            tp_hit = (high >= self.tp) & (self.tp != 0)
+            sl_hit = (low <= self.sl) & (self.sl != 0)
+        else:
+            tp_hit = (low <= self.tp) & (self.tp != 0)
+            sl_hit = (high >= self.sl) & (self.sl != 0)
+
+        hit = tp_hit | sl_hit
+        if not hit.any():
+            return None
+
+        first = int(hit.argmax())
+        closing_time = pd.Timestamp(self.master_next_times[start + first])
+        side = "long" if self.position.qty > 0 else "short"
+
+        if tp_hit[first]:
+            # TP is a resting limit order: filled at its price as a maker
+            trade = self.close_position(self.tp, closing_time, maker=True)
+            print(f"Triggered TP for {side}", file = sys.stderr)
+        else:
+            dollar_volume = self.master_dollar_volume[start + first] if self.master_dollar_volume is not None else 0.0
+            trade = self.close_position(self.sl, closing_time, dollar_volume)
+            print(f"Triggered SL for {side}", file = sys.stderr)
 
         return trade
 
-    def get_trades(self, trade_amt):
+    def open_position(self, price, qty, timestamp, dollar_volume=0.0):
+        """Open a position with a market order, paying slippage and the entry fee."""
+        self.entry_costs = self.execution.open(self.position, price, qty, timestamp, dollar_volume)
+
+    def close_position(self, price, timestamp, dollar_volume=0.0, maker=False):
+        """Close the position (as a market order unless maker) and return the trade with its fees and funding."""
+        return self.execution.close(self.position, price, timestamp, self.entry_costs, dollar_volume, maker)
+
+    @profiler.timed()
+    def get_trades(self, trade_amt, reset=True, stop=None):
+        """Run the signal event loop over column arrays instead of DataFrame rows.
+
+        Signals fill at the close of the bar fill_delay bars later (see ExecutionModel), and
+        TP/SL is only checked on the bars after an entry's fill.
+        Only the first `stop` signal bars are run if given (later bars just supply delayed
+        fills), and reset=False keeps the execution model's fee-tier turnover, so chunked
+        runs can continue one backtest. Returns the trade amount after compounding.
+        """
+        signals = self.data["signals"].to_numpy()
+        tps = self.data["TP"].to_numpy(dtype=np.float64)
+        sls = self.data["SL"].to_numpy(dtype=np.float64)
+        timestamps = self.data.index.to_numpy(dtype="datetime64[ns]")
+        bar_times = timestamps.view(np.int64)
+
+        # Fill prices, times and dollar volumes per signal bar, shifted once for the fill delay
+        if reset:
+            self.execution.reset()
+        fill = self.execution.fill_index(len(signals))
+        closes = self.data["close"].to_numpy(dtype=np.float64)[fill]
+        closing_times = self.data["nextdatetime"].to_numpy(dtype="datetime64[ns]")[fill]
+        dollar_volumes = (closes * self.data["volume"].to_numpy(dtype=np.float64)[fill]
+                          if self.execution.impact and "volume" in self.data.columns else None)
+
+        # A bar with no signal and no TP/SL is a no-op unless the previous bar set TP/SL,
+        # since TP/SL are cleared on such bars and nothing else changes state
+        has_tp_sl = (tps != 0) | (sls != 0)
+        active = (signals != 0) | has_tp_sl
+        active[1:] |= has_tp_sl[:-1]
+        if len(active):
+            active[0] = True
+        if stop is not None:
+            active[stop:] = False
+
+        # Counted locally and reported once, so the profiler costs nothing per bar
+        active_bars = np.flatnonzero(active).tolist()
+        tp_sl_checks = 0
+        trades_before, was_open = len(self.trades), self.position.qty != 0
+
+        for i in active_bars:
+            signal = signals[i]
+
+            if not self.position.is_valid(signal):
+                raise ValueError(f"Invalid signal {signal} for current position {sign(self.position.qty)} at {pd.Timestamp(timestamps[i])}")
+
+            if self.position.qty != 0 and (self.tp != 0 or self.sl != 0) and bar_times[i] > self.fill_bar_time:
+                tp_sl_checks += 1
+                trade = self.check_tp_sl_range(self.bar_start[i], self.bar_end[i])
+
+                if trade:
+                    self.trades.append(trade)
+                    trade_amt = (trade_amt + trade.pnl()) if self.compound_flag else trade_amt
+                    # The skipped TP/SL update would have been cleared by the next (inactive) bar
+                    if i + 1 < len(active) and not active[i + 1]:
+                        self.tp = self.sl = 0
+                    continue
+
+            tp = float(tps[i])
+            sl = float(sls[i])
+            self.tp = tp if tp != 0 else self.tp
+            self.sl = sl if sl != 0 else self.sl
+
+            if tp == 0 and sl == 0:
+                self.tp = self.sl = 0
+
+            if signal == 0:
+                continue
+
+            close = float(closes[i])
+            closing_time = pd.Timestamp(closing_times[i])
+            dollar_volume = float(dollar_volumes[i]) if dollar_volumes is not None else 0.0
+
+            if signal == 1 or signal == -1:
+                if self.position.qty == 0:
+                    self.open_position(close, sign(signal)*trade_amt, closing_time, dollar_volume)
+                    self.fill_bar_time = int(bar_times[fill[i]])
+                else:
+                    trade = self.close_position(close, closing_time, dollar_volume)
+                    self.trades.append(trade)
+                    trade_amt = (trade_amt + trade.pnl()) if self.compound_flag else trade_amt
+            elif signal == 2 or signal == -2:
+                trade = self.close_position(close, closing_time, dollar_volume)
+                self.trades.append(trade)
+                trade_amt = (trade_amt + trade.pnl()) if self.compound_flag else trade_amt
+                self.open_position(close, sign(signal)*trade_amt, closing_time, dollar_volume)
+                self.fill_bar_time = int(bar_times[fill[i]])
+            else:
+                raise ValueError(f"Invalid signal {signal} at {pd.Timestamp(timestamps[i])}")
+
+        closed = len(self.trades) - trades_before
+        profiler.count('bars processed', len(signals) if stop is None else min(stop, len(signals)))
+        profiler.count('active bars', len(active_bars))
+        profiler.count('TP/SL checks', tp_sl_checks)
+        profiler.count('trades opened', closed + (self.position.qty != 0) - was_open)
+        profiler.count('trades closed', closed)
+        return trade_amt
+
+    def get_trades_loop(self, trade_amt):
+        """Row-by-row reference implementation of get_trades(), kept for equivalence checks (without fill delay or volume impact)."""
+        self.execution.reset()
 
         for index, row in self.data.iterrows():
             signal = row["signals"]
@@ -168,91 +633,45 @@ class BackTester:
                 continue
             elif signal == 1 or signal == -1:
                 if self.position.qty == 0:
-                    self.position.open(row["close"], sign(signal)*trade_amt, closing_time)
+                    self.open_position(row["close"], sign(signal)*trade_amt, closing_time)
                 else:
-                    trade = self.position.close(row["close"], closing_time)
+                    trade = self.close_position(row["close"], closing_time)
                     self.trades.append(trade)
                     trade_amt = (trade_amt + trade.pnl()) if self.compound_flag else trade_amt
             elif signal == 2 or signal == -2:
-                trade = self.position.close(row["close"], closing_time)
+                trade = self.close_position(row["close"], closing_time)
                 self.trades.append(trade)
                 trade_amt = (trade_amt + trade.pnl()) if self.compound_flag else trade_amt
-                self.position.open(row["close"], sign(signal)*trade_amt, closing_time)
+                self.open_position(row["close"], sign(signal)*trade_amt, closing_time)
             else:
                 raise ValueError(f"Invalid signal {signal} at {index}")
 
+    @profiler.timed()
     def get_statistics(self):
-        total_trades = len(self.trades)
-        if total_trades==0:
+        if len(self.trades)==0:
             return None
-        winning_trades = [t for t in self.trades if t.is_win()]
-        losing_trades = [t for t in self.trades if not t.is_win()]
-        long_trades = [t for t in self.trades if t.trade_type() == TradeType.LONG]
-        short_trades = [t for t in self.trades if t.trade_type() == TradeType.SHORT]
-
-        gross_profit = sum(t.pnl() for t in winning_trades)
-        gross_loss = sum(t.pnl() for t in losing_trades)
-        net_profit = gross_profit + gross_loss
-        transaction_costs = sum(transaction_fee * abs(t.qty) for t in self.trades)
-
-        max_holding_time = max(t.holding_time() for t in self.trades)
-        avg_holding_time = sum((t.holding_time() for t in self.trades), timedelta()) / total_trades
-
-        largest_win = max(t.pnl() for t in winning_trades) if winning_trades else 0
-        largest_loss = min(t.pnl() for t in losing_trades) if losing_trades else 0
-        average_win = gross_profit / len(winning_trades) if winning_trades else 0
-        average_loss = gross_loss / len(losing_trades) if losing_trades else 0
-
-        winning_streak, losing_streak = self.get_streaks()
-
-        max_drawdown, avg_drawdown = self.get_drawdown(np.array([t.pnl() for t in self.trades]))
-
-        sharpe_ratio = self.get_sharpe_ratio()
-        # sortino_ratio = self.get_sortino_ratio()
-
-        # adverse_excursions = [self.adverse_excursion(t) for t in self.trades]
-        # max_adverse_excursion = max(adverse_excursions)
-        # avg_adverse_excursion = np.mean(adverse_excursions)
-
-        stats = {
-            "static" : {
-                'Total Trades': total_trades,
-                'Leverage Applied': 1,  # Assuming no leverage for now
-                'Winning Trades': len(winning_trades),
-                'Losing Trades': len(losing_trades),
-                'No. of Long Trades': len(long_trades),
-                'No. of Short Trades': len(short_trades),
-                'Benchmark Return(%)': self.get_benchmark_return() * 100,
-                'Benchmark Return(on $1000)': self.get_benchmark_return() * 1000,
-                'Win Rate': len(winning_trades) / total_trades * 100 if total_trades > 0 else 0,
-                'Winning Streak': winning_streak,
-                'Losing Streak': losing_streak,
-                'Gross Profit': net_profit + transaction_costs,
-                'Net Profit': net_profit,
-                'Average Profit': net_profit / total_trades if total_trades > 0 else 0,
-                'Maximum Drawdown(%)': max_drawdown,
-                'Average Drawdown(%)': avg_drawdown,
-                'Largest Win': largest_win,
-                'Average Win': average_win,
-                'Largest Loss': largest_loss,
-                'Average Loss': average_loss,
-                'Maximum Holding Time': max_holding_time,
-                'Average Holding Time': avg_holding_time,
-                'Maximum Adverse Excursion': None,
-                'Average Adverse Excursion': None,
-                'Sharpe Ratio': sharpe_ratio,
-                'Sortino Ratio': None,
-                # 'Granular Sharpe Ratio': self.get_granular_sharpe_ratio("1D"),
-                # 'Granular Sharpe Ratio (Window)': self.get_granular_sharpe_ratio_window("6ME", "1D")
-            },
-            "compound" : {
-                'Trades Executed': total_trades,
-                'Total Profit': net_profit
-            }
-        }
+        return trade_statistics(self.trades, self.get_benchmark_return(), self.get_excursions()['mae'],
+                                self.initial_capital)
+
+    def get_excursions(self):
+        """Maximum adverse and favourable excursion (fractions of entry price) of every trade.
+
+        A trade's excursions span the master rows in [entry time, exit time) plus its entry and
+        exit prices; the low/high over that range come from sparse-table range queries, so each
+        trade costs O(1) regardless of its length.
+        Returns a dict of arrays 'mae' and 'mfe' aligned with self.trades.
+        """
+        if self.low_table is None:
+            self.low_table = SparseTable(self.master_low, np.minimum)
+            self.high_table = SparseTable(self.master_high, np.maximum)
+
+        start = np.searchsorted(self.master_times, self.trades.column('init_time'), side="left")
+        end = np.searchsorted(self.master_times, self.trades.column('final_time'), side="left")
+
+        return trade_excursions(self.trades.column('qty'), self.trades.column('init_price'),
+                                self.trades.column('final_price'), self.low_table.query(start, end),
+                                self.high_table.query(start, end))
 
-        return stats["static"]
-    
     def get_benchmark_return(self):
         """Calculate benchmark return from the stock data."""
         initial_price = self.data.iloc[0]["close"]
@@ -261,42 +680,22 @@ class BackTester:
 
     def get_streaks(self):
         """Calculate winning and losing streaks."""
-        max_win_streak = max_loss_streak = 0
-        current_win_streak = current_loss_streak = 0
-
-        for t in self.trades:
-            if t.is_win():
-                current_win_streak += 1
-                max_win_streak = max(max_win_streak, current_win_streak)
-                current_loss_streak = 0
-            else:
-                current_loss_streak += 1
-                max_loss_streak = max(max_loss_streak, current_loss_streak)
-                current_win_streak = 0
-
-        return max_win_streak, max_loss_streak
+        return longest_streaks(self.trades.pnl() > 0)
     
     def get_drawdown(self, pnl_array):
         """Calculate the maximum and avg drawdown for the portfolio.
         Pass pnl_array as np.array of trade PnLs."""
-
-        cum_pnl_series = 1000 + pnl_array.cumsum()
-        cumulative_max = pd.Series(cum_pnl_series).cummax()
-        
-        max_drawdown = np.min((cum_pnl_series - cumulative_max) / cumulative_max)
-        avg_drawdown = np.mean((cum_pnl_series - cumulative_max) / cumulative_max)
-
-        return abs(max_drawdown)*100, abs(avg_drawdown)*100
+        return drawdowns(pnl_array, self.initial_capital)
     
     def plot_drawdown(self):
-        pnl_array = np.array([t.pnl() for t in self.trades])
-        cum_pnl_series = 1000 + pnl_array.cumsum()
+        pnl_array = self.trades.pnl()
+        cum_pnl_series = self.initial_capital + pnl_array.cumsum()
         cumulative_max = pd.Series(cum_pnl_series).cummax()
 
         drawdowns = (cum_pnl_series - cumulative_max) / cumulative_max
         drawdowns = drawdowns * 100
 
-        times = [t.final_timestamp for t in self.trades]
+        times = self.trades.column('final_time').astype("datetime64[ns]")
 
         plt.figure(figsize=(12, 6))
         plt.plot(np.array(times), np.array(drawdowns), label="Drawdown", color="red")
@@ -306,57 +705,52 @@ class BackTester:
         plt.legend(loc="best")
         plt.show()
 
-    def get_sharpe_ratio(self, risk_free_rate=0.0):
-        """Calculate the Sharpe Ratio for the portfolio."""
-        returns = [t.pnl()/t.init_price for t in self.trades]
-        mean_return = np.mean(returns)
-        return_std = np.std(returns)
-
-        return (mean_return - risk_free_rate)*math.sqrt(365) / return_std if return_std > 0 else 0
+    def get_sharpe_ratio(self, risk_free_rate=0.0, pnl=None):
+        """Calculate the Sharpe Ratio for the portfolio. pnl may pass precomputed trade PnLs."""
+        pnl = self.trades.pnl() if pnl is None else pnl
+        return trade_sharpe_ratio(pnl, self.trades.column('init_price'), risk_free_rate)
 
-    def get_sortino_ratio(self, risk_free_rate=0.0):
-        """Calculate the Sortino Ratio."""
-        returns = [t.pnl() for t in self.trades]
-        mean_return = np.mean(returns)
-        downside_risk = np.std([r for r in returns if r < 0])
+    def get_sortino_ratio(self, risk_free_rate=0.0, pnl=None):
+        """Calculate the Sortino Ratio of the Sharpe Ratio's per-trade returns. pnl may pass precomputed trade PnLs."""
+        pnl = self.trades.pnl() if pnl is None else pnl
+        return trade_sortino_ratio(pnl, self.trades.column('init_price'), risk_free_rate)
 
-        return (mean_return - risk_free_rate) / downside_risk if downside_risk > 0 else 0
-        
+    @profiler.timed()
     def calc_pnl(self):
+        """Add per-bar mark-to-market pnl, capital, position and exposure columns (see equity.py).
+
+        An open position at the end of the data is marked to the last close without fees.
+        """
         if "pnl" in self.data.columns:
             return
 
-        pnls = []
-
-        curr_trade_idx = 0
-        is_trade_open = False
-
-        prev_row = None
-
-        for index, row in self.data.iterrows():        
-            if curr_trade_idx < len(self.trades):
-                curr_trade = self.trades[curr_trade_idx]
-                if curr_trade.final_timestamp <= index and is_trade_open:
-                    is_trade_open = False
-                    pnl = -transaction_fee * abs(curr_trade.qty)
-                    curr_trade_idx += 1
-                elif curr_trade.init_timestamp <= index:
-                    is_trade_open = True
-                    pnl = curr_trade.qty * (row["close"] - prev_row["close"]) / curr_trade.init_price
-                else:
-                    pnl = 0
-            else:
-                pnl = 0
-
-            pnls.append(pnl)
-            prev_row = row
-        
-        self.data["pnl"] = pnls
+        trades = self.trades
+        qty = trades.column('qty')
+        init_price = trades.column('init_price')
+        final_price = trades.column('final_price')
+        init_time = trades.column('init_time')
+        final_time = trades.column('final_time')
+        fees = trades.column('costs')
+
+        close = self.data["close"].to_numpy(dtype=np.float64)
+        if self.position.qty != 0 and len(close):
+            qty = np.append(qty, self.position.qty)
+            init_price = np.append(init_price, self.position.price)
+            final_price = np.append(final_price, close[-1])
+            init_time = np.append(init_time, pd.Timestamp(self.position.timestamp).value)
+            final_time = np.append(final_time, np.iinfo(np.int64).max)
+            fees = np.append(fees, 0.0)
+
+        curve = equity_curve(self.data.index.to_numpy(dtype="datetime64[ns]").view(np.int64), close,
+                             qty, init_price, final_price, init_time, final_time, fees, self.initial_capital)
+        for name, values in curve.items():
+            self.data[name] = values
 
     def calc_capital(self):
         if "capital" not in self.data.columns:
             self.calc_pnl()
-            self.data["capital"] = 1000 + self.data["pnl"].cumsum()
+        if "capital" not in self.data.columns:
+            self.data["capital"] = self.initial_capital + self.data["pnl"].cumsum()
 
     def get_granular_sharpe_ratio(self, period="1D"):
         """
@@ -366,32 +760,8 @@ class BackTester:
 
         self.calc_capital()
 
-        # Convert period to pandas Timedelta
-        offset = pd.to_timedelta(period)
-
-        # Extract data
-        capitals = self.data["capital"]
-        time_index = self.data.index
-
-        # Initialize variables
-        pnls = []
-        last_time = time_index[0]  # Start from the first timestamp
-        last_capital = capitals.iloc[0]
-
-        # Loop through the index to find periods based on the offset
-        for i in range(1, len(time_index)):
-            current_time = time_index[i]
-
-            if current_time - last_time >= offset:
-                # Calculate PnL for the static capital
-                pnls.append(capitals.iloc[i] - last_capital)
-
-                # Update last checkpoint
-                last_time = current_time
-                last_capital = capitals.iloc[i]
-
-        # Convert to numpy arrays for Sharpe calculation
-        pnls = np.array(pnls)
+        times = self.data.index.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        pnls = period_pnl(times, self.data["capital"].to_numpy(dtype=np.float64), period)
 
         # Calculate Sharpe ratios
         granular_sharpe = np.mean(pnls) / np.std(pnls) if len(pnls) > 0 else np.nan
@@ -413,53 +783,40 @@ class BackTester:
 
         self.calc_capital()
 
-        # Resample self.data into windows of the specified size
-        data_windows = [
-            window for _, window in self.data.resample(window_size)
-            if not window.empty
-        ]
+        times = self.data.index.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        capitals = self.data["capital"].to_numpy(dtype=np.float64)
 
-        # Initialize a list to store Sharpe ratios for each window
         sharpe_ratios = []
+        for start, stop in window_bounds(times, window_size):
+            pnls = period_pnl(times, capitals, period, start, stop)
+            sharpe_ratio = np.sqrt(365)*np.mean(pnls) / np.std(pnls) if len(pnls) > 0 else np.nan
+            sharpe_ratios.append(sharpe_ratio)
 
-        # Iterate over each window
-        for window_data in data_windows:
-            # Convert period to pandas Timedelta
-            offset = pd.to_timedelta(period)
-
-            # Extract capital data and its index
-            capitals = window_data["capital"]
-            time_index = window_data.index
-
-            # Initialize variables for PnL calculation
-            pnls = []
-            last_time = time_index[0]
-            last_capital = capitals.iloc[0]
-
-            # Calculate PnLs for each period within the window
-            for i in range(1, len(time_index)):
-                current_time = time_index[i]
-
-                if current_time - last_time >= offset:
+        return sharpe_ratios
 
-                    # Calculate PnL
-                    pnls.append(capitals.iloc[i] - last_capital)
+    def get_rolling_metrics(self, window=30, period="1D", periods_per_year=365):
+        """
+        Rolling volatility, Sharpe, Sortino and Calmar ratios of period returns of the capital curve.
 
-                    # Update last checkpoint
-                    last_time = current_time
-                    last_capital = capitals.iloc[i]
+        Args:
+            window (int): Number of periods in each rolling window.
+            period (str): Sampling period of the returns (e.g., '1D', '1H', etc.).
 
-            # Convert to numpy array for Sharpe calculation
-            pnls = np.array(pnls)
+        Returns:
+            pd.DataFrame: One row per period end, NaN until the first full window.
+        """
 
-            # Calculate Sharpe ratio for the current window
-            sharpe_ratio = np.sqrt(365)*np.mean(pnls) / np.std(pnls) if len(pnls) > 0 else np.nan
+        self.calc_capital()
 
-            # Append the Sharpe ratio for the current window
-            sharpe_ratios.append(sharpe_ratio)
+        times = self.data.index.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        indices = period_indices(times, period)
+        capitals = self.data["capital"].to_numpy(dtype=np.float64)[indices]
+        returns = capitals[1:] / capitals[:-1] - 1
 
-        return sharpe_ratios
+        metrics = rolling_metrics(returns, window, periods_per_year)
+        return pd.DataFrame({'return': returns, **metrics}, index=self.data.index[indices[1:]])
 
+    @profiler.timed()
     def make_trade_graph(self):
         self.calc_capital()
 
@@ -534,6 +891,7 @@ class BackTester:
         )
         fig.show()
 
+    @profiler.timed()
     def make_pnl_graph(self):
         self.calc_capital()
 
@@ -0,0 +1,405 @@
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from contextlib import redirect_stderr
+
+import numpy as np
+import pandas as pd
+
+from backtester import BackTester
+from datastore import convert_csv, load_ohlcv
+from engine import run_strategy
+from indicator_cache import IndicatorCache
+from main import process_data, strat
+
+SUITE_SIZES = (100_000, 1_000_000, 10_000_000)
+
+# Columns of the compare_results() table, also when the files share no stage
+COMPARE_COLUMNS = ['stage', 'bars', 'base_s', 'current_s', 'time_ratio', 'base_mb', 'current_mb',
+                   'memory_ratio', 'regression']
+
+
+def synthetic_ohlcv(n, seed=0):
+    """Generate a random-walk OHLCV frame for benchmarking."""
+    rng = np.random.default_rng(seed)
+    close = 10000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.005, n)) * close
+    return pd.DataFrame({
+        'datetime': pd.date_range("2019-01-01", periods=n, freq="min"),
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.lognormal(8, 0.5, n),
+    })
+
+
+def regime_ohlcv(n, seed=0, freq="1min", annual_vols=(0.3, 0.6, 1.2), annual_drift=0.0,
+                 mean_regime_bars=5_000, start_price=10_000, chunk_size=1 << 20):
+    """Generate a deterministic GBM OHLCV frame with volatility regimes.
+
+    The annualized volatility switches between annual_vols after runs of geometrically
+    distributed length (mean mean_regime_bars), always to a different regime. Bars of length
+    freq are simulated in chunks so temporaries stay bounded for very long series (tens of
+    millions of bars); volume scales with the regime volatility.
+    """
+    rng = np.random.default_rng(seed)
+    dt = pd.to_timedelta(freq) / pd.Timedelta(days=365)
+    bar_vols = np.asarray(annual_vols, dtype=np.float64) * np.sqrt(dt)
+
+    # Regime runs: lengths and a walk over the regimes that never repeats one in a row
+    n_runs = n // mean_regime_bars + 1
+    lengths = rng.geometric(1 / mean_regime_bars, n_runs)
+    while lengths.sum() < n:
+        lengths = np.append(lengths, rng.geometric(1 / mean_regime_bars, n_runs))
+    steps = rng.integers(1, len(bar_vols), len(lengths)) if len(bar_vols) > 1 else np.zeros(len(lengths), dtype=int)
+    regimes = (np.cumsum(steps) % len(bar_vols)).astype(np.int8)
+    regime = np.repeat(regimes, lengths)[:n]
+
+    open_, high, low, close, volume = (np.empty(n) for _ in range(5))
+    log_price = np.log(start_price)
+    for lo in range(0, n, chunk_size):
+        hi = min(lo + chunk_size, n)
+        sigma = bar_vols[regime[lo:hi]]
+        log_close = log_price + np.cumsum((annual_drift * dt - 0.5 * sigma**2) + sigma * rng.standard_normal(hi - lo))
+        close[lo:hi] = np.exp(log_close)
+        open_[lo] = np.exp(log_price)
+        open_[lo + 1:hi] = close[lo:hi - 1]
+        # Wicks extend the open/close range by half-normal multiples of half the bar volatility
+        wicks = np.abs(rng.standard_normal((2, hi - lo))) * (0.5 * sigma)
+        high[lo:hi] = np.maximum(open_[lo:hi], close[lo:hi]) * np.exp(wicks[0])
+        low[lo:hi] = np.minimum(open_[lo:hi], close[lo:hi]) * np.exp(-wicks[1])
+        volume[lo:hi] = rng.lognormal(8, 0.5, hi - lo) * (sigma / bar_vols.min())
+        log_price = log_close[-1]
+
+    return pd.DataFrame({
+        'datetime': pd.date_range("2019-01-01", periods=n, freq=freq),
+        'open': open_,
+        'high': high,
+        'low': low,
+        'close': close,
+        'volume': volume,
+    }, copy=False)
+
+
+def make_signals(n_bars, seed=0):
+    """Build a processed synthetic signal frame."""
+    return run_strategy(process_data(synthetic_ohlcv(n_bars, seed)))
+
+
+def same_trades(a, b):
+    """Check that two TradePair lists are identical."""
+    return len(a) == len(b) and all(
+        (x.qty, x.init_price, x.final_price, x.init_timestamp, x.final_timestamp)
+        == (y.qty, y.init_price, y.final_price, y.init_timestamp, y.final_timestamp)
+        for x, y in zip(a, b))
+
+
+def time_get_trades(data, method, compound_flag=1):
+    bt = BackTester("BTC", signal_data_path=data, compound_flag=compound_flag)
+    start = time.perf_counter()
+    getattr(bt, method)(1000)
+    return time.perf_counter() - start, bt.trades
+
+
+def benchmark_get_trades(sizes=(1_000_000, 10_000_000), loop_size=100_000):
+    data = make_signals(loop_size)
+    for compound_flag in (0, 1):
+        loop_time, expected = time_get_trades(data, "get_trades_loop", compound_flag)
+        fast_time, actual = time_get_trades(data, "get_trades", compound_flag)
+        assert same_trades(expected, actual), "get_trades() diverged from get_trades_loop()"
+    print(f"{loop_size:>10} bars: loop {loop_time:.2f}s, array {fast_time:.3f}s "
+          f"({loop_time / fast_time:.0f}x), {len(actual)} trades")
+
+    for n_bars in sizes:
+        data = make_signals(n_bars)
+        fast_time, trades = time_get_trades(data, "get_trades")
+        print(f"{n_bars:>10} bars: array {fast_time:.3f}s, {len(trades)} trades")
+
+
+def benchmark_statistics(sizes=(1_000_000, 10_000_000)):
+    """Time get_statistics() on ledgers of random synthetic trades."""
+    bt = BackTester("BTC", signal_data_path=make_signals(1_000))
+    rng = np.random.default_rng(0)
+    for n_trades in sizes:
+        bt.trades = type(bt.trades)("BTC", capacity=n_trades)
+        init_time = np.cumsum(rng.integers(60, 3600, n_trades)) * 10**9
+        init_price = 10_000 * np.exp(np.cumsum(rng.normal(0, 0.01, n_trades)))
+        bt.trades.extend(np.where(rng.random(n_trades) < 0.5, 1000.0, -1000.0), init_price,
+                         init_price * np.exp(rng.normal(0, 0.01, n_trades)),
+                         init_time, init_time + rng.integers(60, 3600, n_trades) * 10**9)
+        start = time.perf_counter()
+        bt.get_statistics()
+        print(f"{n_trades:>10} trades: get_statistics {time.perf_counter() - start:.3f}s")
+
+
+def measure_load(path, queue):
+    """Child process: load a file, touch the close column and report time and peak RSS growth."""
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    data = load_ohlcv(path)
+    data['close'].sum()
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024))
+
+
+def time_load(path):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=measure_load, args=(path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def benchmark_load(sizes=(10_000_000,)):
+    """Compare CSV and columnar store load time and peak RSS for 1-minute OHLCV files."""
+    with tempfile.TemporaryDirectory() as directory:
+        for n_rows in sizes:
+            csv_path = os.path.join(directory, f"ohlcv_{n_rows}.csv")
+            store_path = os.path.join(directory, f"ohlcv_{n_rows}")
+            synthetic_ohlcv(n_rows).to_csv(csv_path, index=False)
+            convert_csv(csv_path, store_path)
+
+            for label, path in (("csv", csv_path), ("store", store_path)):
+                elapsed, rss = time_load(path)
+                print(f"{n_rows:>10} rows {label:>5}: load {elapsed:.3f}s, peak RSS +{rss:.0f} MB")
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS counter (Linux); returns False where that is not supported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def memory_status(field):
+    """A memory field of /proc/self/status (VmRSS, VmHWM, ...) in MB."""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise KeyError(field)
+
+
+def max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 1024
+
+
+def measure(function, *args):
+    """Run function(*args) and return (result, seconds, peak MB of RSS above the level at the start).
+
+    Without a resettable peak counter the growth of the process peak RSS is reported,
+    which is a lower bound when an earlier stage peaked higher.
+    """
+    gc.collect()
+    if reset_peak_rss():
+        before, peak = memory_status("VmRSS"), lambda: memory_status("VmHWM")
+    else:
+        before, peak = max_rss_mb(), max_rss_mb
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    return result, seconds, max(peak() - before, 0.0)
+
+
+def tp_sl_signals(data, seed=0, rate=0.05, distance=0.002):
+    """Signal frame with TP/SL set on every bar, so get_trades() checks TP/SL on every bar.
+
+    Signals alternate between +1 and -1 on random bars, which stays valid after a TP/SL exit.
+    """
+    rng = np.random.default_rng(seed)
+    events = np.flatnonzero(rng.random(len(data)) < rate)
+    signals = np.zeros(len(data), dtype=np.int64)
+    signals[events] = np.where(np.arange(len(events)) % 2 == 0, 1, -1)
+    close = data['close'].to_numpy()
+    side = rng.choice([1.0, -1.0], len(data))
+    return pd.DataFrame({**{name: data[name] for name in ('datetime', 'open', 'high', 'low', 'close')},
+                         'signals': signals,
+                         'TP': close * (1 + side * distance),
+                         'SL': close * (1 - side * 1.5 * distance)}, copy=False)
+
+
+def run_suite(sizes=SUITE_SIZES, freq="1min", seed=0):
+    """Time each pipeline stage on regime_ohlcv() data of each size.
+
+    Returns a list of {'stage', 'bars', 'seconds', 'peak_mb'} records. process_data() runs
+    with an empty in-memory indicator cache so every size measures cold indicators.
+    """
+    results = []
+
+    def record(stage, n_bars, function, *args):
+        result, seconds, peak_mb = measure(function, *args)
+        results.append({'stage': stage, 'bars': n_bars, 'seconds': seconds, 'peak_mb': peak_mb})
+        print(f"{n_bars:>10} bars {stage:>15}: {seconds:8.3f}s, peak +{peak_mb:.0f} MB", file=sys.stderr)
+        return result
+
+    for n_bars in sizes:
+        raw = record("generate", n_bars, regime_ohlcv, n_bars, seed, freq)
+        data = record("process_data", n_bars, process_data, raw.copy(), IndicatorCache())
+        data = record("strat", n_bars, strat, data)
+
+        bt = BackTester("BTC", signal_data_path=data, compound_flag=1)
+        record("get_trades", n_bars, bt.get_trades, 1000)
+        record("get_statistics", n_bars, bt.get_statistics)
+        record("calc_pnl", n_bars, bt.calc_pnl)
+        del bt, data
+
+        # TP/SL messages go to stderr once per exit
+        tp_sl = BackTester("BTC", signal_data_path=tp_sl_signals(raw, seed), compound_flag=1)
+        with open(os.devnull, "w") as devnull, redirect_stderr(devnull):
+            record("check_tp_sl", n_bars, tp_sl.get_trades, 1000)
+        del tp_sl, raw
+
+    return results
+
+
+def run_mode(raw, compact, trade_amt, compound_flag):
+    """Run process_data(), strat() and the backtest in one mode with a fresh indicator cache."""
+    data = strat(process_data(raw.copy(deep=False), IndicatorCache(), compact=compact), compact)
+    bt = BackTester("BTC", signal_data_path=data, compound_flag=compound_flag)
+    with open(os.devnull, "w") as devnull, redirect_stderr(devnull):
+        bt.get_trades(trade_amt)
+    bt.calc_pnl()
+    return data['signals'].to_numpy(dtype=np.int64), bt
+
+
+def compact_report(raw, trade_amt=1000, compound_flag=0):
+    """Memory saved by compact mode and how far its signals and P&L drift from the float64 run.
+
+    Each mode runs the whole pipeline with its own indicator cache, and its memory is the
+    process peak RSS above the level at the start (see measure()), so cached indicators and
+    temporaries count too. Also returns the number of bars whose signal differs, the largest
+    signal and per-bar capital differences, and both net profits.
+    """
+    runs = {}
+    for compact in (False, True):
+        (signals, bt), _, peak_mb = measure(run_mode, raw, compact, trade_amt, compound_flag)
+        runs[compact] = (peak_mb, signals, bt)
+
+    (full_mb, signals, bt), (compact_mb, compact_signals, compact_bt) = runs[False], runs[True]
+    net_profit = float(bt.trades.pnl().sum())
+    compact_net_profit = float(compact_bt.trades.pnl().sum())
+    return {
+        'bars': len(raw),
+        'float64_peak_mb': full_mb,
+        'compact_peak_mb': compact_mb,
+        'saved_mb': full_mb - compact_mb,
+        'saved_pct': (full_mb - compact_mb) / full_mb * 100 if full_mb else 0.0,
+        'signal_mismatches': int(np.count_nonzero(signals != compact_signals)),
+        'max_signal_deviation': int(np.abs(signals - compact_signals).max(initial=0)),
+        'trades': len(bt.trades),
+        'compact_trades': len(compact_bt.trades),
+        'net_profit': net_profit,
+        'compact_net_profit': compact_net_profit,
+        'max_capital_deviation': float(np.abs(bt.data['capital'].to_numpy() - compact_bt.data['capital'].to_numpy())
+                                       .max(initial=0)),
+    }
+
+
+def environment():
+    """Machine and library versions stored alongside benchmark results."""
+    return {
+        'timestamp': pd.Timestamp.now(tz="UTC").isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare_results(baseline, current, threshold=0.10, min_seconds=0.1, min_mb=32):
+    """Table of the stages present in two result files, flagging regressions.
+
+    A stage regresses when its time or peak memory grows by more than threshold (a fraction)
+    and the current value is above min_seconds / min_mb, so tiny stages do not flag on noise.
+    """
+    key = lambda record: (record['stage'], record['bars'])
+    base = {key(record): record for record in baseline['results']}
+    rows = []
+    for record in current['results']:
+        before = base.get(key(record))
+        if before is None:
+            continue
+        time_ratio = record['seconds'] / before['seconds'] if before['seconds'] > 0 else np.inf
+        memory_ratio = record['peak_mb'] / before['peak_mb'] if before['peak_mb'] > 0 else np.inf
+        regressed = ((time_ratio > 1 + threshold and record['seconds'] > min_seconds)
+                     or (memory_ratio > 1 + threshold and record['peak_mb'] > min_mb))
+        rows.append({
+            'stage': record['stage'], 'bars': record['bars'],
+            'base_s': before['seconds'], 'current_s': record['seconds'], 'time_ratio': time_ratio,
+            'base_mb': before['peak_mb'], 'current_mb': record['peak_mb'], 'memory_ratio': memory_ratio,
+            'regression': regressed,
+        })
+    return pd.DataFrame(rows, columns=COMPARE_COLUMNS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Performance benchmarks for the strategy and backtester.")
+    commands = parser.add_subparsers(dest="command")
+    for name in ('get_trades', 'statistics', 'load'):
+        commands.add_parser(name).add_argument("sizes", nargs="*", type=int)
+
+    suite = commands.add_parser("suite", help="time and measure memory of every pipeline stage")
+    suite.add_argument("sizes", nargs="*", type=int, help=f"bar counts (default {SUITE_SIZES})")
+    suite.add_argument("--freq", default="1min", help="synthetic bar size")
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--output", default="benchmark_results.json", help="where to write the JSON results")
+
+    compare = commands.add_parser("compare", help="compare two suite result files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.10, help="allowed fractional slowdown")
+
+    compact = commands.add_parser("compact", help="memory saved and deviation of compact (float32) mode")
+    compact.add_argument("sizes", nargs="*", type=int, help="synthetic bar counts (default 1000000)")
+    compact.add_argument("--data", default=None, help="CSV file or columnar store to use instead")
+    compact.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv or ['get_trades'])
+
+    if args.command == "suite":
+        results = run_suite(args.sizes or SUITE_SIZES, args.freq, args.seed)
+        with open(args.output, "w") as output:
+            json.dump({'environment': environment(), 'freq': args.freq, 'seed': args.seed,
+                       'results': results}, output, indent=2)
+        print(pd.DataFrame(results).to_string(index=False))
+        print(f"Results written to {args.output}")
+    elif args.command == "compact":
+        sources = [load_ohlcv(args.data)] if args.data else [regime_ohlcv(n, args.seed) for n in args.sizes or [1_000_000]]
+        for raw in sources:
+            for key, value in compact_report(raw).items():
+                print(f"{key:>22}: {value:.6g}" if isinstance(value, float) else f"{key:>22}: {value}")
+    elif args.command == "compare":
+        with open(args.baseline) as baseline, open(args.current) as current:
+            table = compare_results(json.load(baseline), json.load(current), args.threshold)
+        if table.empty:
+            print("No stage and bar count in common between the two result files")
+            return 0
+        print(table.to_string(index=False, float_format="%.3f"))
+        if table['regression'].any():
+            print(f"{int(table['regression'].sum())} regressions above {args.threshold:.0%}")
+            return 1
+    else:
+        benchmarks = {'get_trades': benchmark_get_trades, 'statistics': benchmark_statistics,
+                      'load': benchmark_load}
+        benchmarks[args.command](*([args.sizes] if args.sizes else []))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,206 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from backtester import BackTester, Position, TradeLedger, infer_bar_duration, trade_excursions, trade_statistics
+from engine import START_INDEX, TRADE_TYPES, generate_signals
+from execution import ExecutionModel
+from indicator_cache import IndicatorCache
+from profiling import profiler
+from resample import iter_chunks
+
+CHUNK_SIZE = 500_000
+
+# Bars recomputed ahead of each chunk: the 200-bar SMA needs 200, and the recursive
+# indicators (ATR, RSI, MACD) forget their starting point to the last bit within ~1000 bars
+WARMUP = 2000
+
+
+def range_extremes(low, high, start, end):
+    """Min of low and max of high over rows [start, end) of each range; empty ranges give inf/-inf."""
+    bounds = np.column_stack((start, end)).ravel()
+    lows = np.minimum.reduceat(np.append(low, np.inf), bounds)[::2]
+    highs = np.maximum.reduceat(np.append(high, -np.inf), bounds)[::2]
+    empty = start == end
+    lows[empty] = np.inf
+    highs[empty] = -np.inf
+    return lows, highs
+
+
+def append_csv(frame, path, first):
+    frame.to_csv(path, mode="w" if first else "a", header=first, index=False)
+
+
+class ChunkedBackTest:
+    """Indicators, strategy and backtest over a source processed in fixed-size windows.
+
+    Each chunk is processed together with the last `warmup` raw rows of the data before it,
+    which are dropped again after process_data(); the strategy state, the open position,
+    TP/SL, compounding and the execution model carry over from chunk to chunk, and each
+    chunk's signal rows and closed trades are appended to the output files. Memory use
+    follows the chunk size, not the length of the data; only the trade ledger grows.
+
+    Signals, trades and statistics match the in-memory run (BackTester over the full
+    process_data()/strat() output). Indicators built on running sums (SMA, Bollinger bands,
+    volatility) can differ from it in the last bits, since their rounding depends on where
+    the sum started; a signal could only change if a value sat within ~1e-13 of a threshold.
+    Each bar is its own master data and bar_duration defaults to the one of the first chunk.
+    """
+
+    def __init__(self, symbol="BTC", trade_amt=1000, compound_flag=0, initial_capital=1000, execution=None,
+                 warmup=WARMUP, bar_duration=None, signals_output=None, trades_output=None, **params):
+        self.symbol = symbol
+        self.trade_amt = trade_amt
+        self.compound_flag = compound_flag
+        self.initial_capital = initial_capital
+        self.execution = execution or ExecutionModel()
+        self.warmup = max(warmup, START_INDEX)
+        self.bar_duration = pd.Timedelta(bar_duration) if bar_duration is not None else None
+        self.signals_output = signals_output
+        self.trades_output = trades_output
+        self.params = params
+
+        self.cache = IndicatorCache(max_entries=0)
+        self.tail = None
+        self.rows_seen = 0
+        self.strategy_state = {}
+
+        # Signal rows whose delayed fills fall in the next chunk
+        self.pending = None
+        self.position = Position(symbol, 0, None, None)
+        self.tp = 0
+        self.sl = 0
+        self.entry_costs = 0.0
+        self.fill_bar_time = np.iinfo(np.int64).min
+        self.trades = TradeLedger(symbol)
+        self.adverse_excursions = []
+        self.chunks_backtested = 0
+
+        # Low/high of the rows of earlier chunks the open position has been held over
+        self.held_low = math.inf
+        self.held_high = -math.inf
+
+        self.first_close = None
+        self.last_close = None
+
+    def signals(self, chunk, process_data):
+        """Indicators and strategy signals of one chunk of raw rows (a dict of columns)."""
+        rows = pd.DataFrame(chunk, copy=False)
+        rows['datetime'] = rows['datetime'].to_numpy().view("datetime64[ns]")
+        frame = rows if self.tail is None else pd.concat([self.tail, rows], ignore_index=True)
+        lead = len(frame) - len(rows)
+        self.tail = frame.iloc[-self.warmup:].copy()
+
+        frame = process_data(frame, self.cache)
+        # Bars before the global start index or in the warm-up rows are never traded
+        start_index = max(START_INDEX - (self.rows_seen - lead), lead)
+        signals, trade_codes = generate_signals(frame, start_index=start_index, state=self.strategy_state,
+                                                **self.params)
+        frame['trade_type'] = TRADE_TYPES[trade_codes]
+        frame['signals'] = signals
+        self.rows_seen += len(rows)
+        return frame.iloc[lead:].reset_index(drop=True)
+
+    def backtest(self, rows, final=False):
+        """Run get_trades() over a chunk of signal rows, continuing the previous chunk's state."""
+        frame = rows if self.pending is None else pd.concat([self.pending, rows], ignore_index=True)
+        stop = len(frame) if final else max(len(frame) - self.execution.fill_delay, 0)
+        self.pending = frame.iloc[stop:]
+        if stop == 0:
+            return
+        if self.bar_duration is None:
+            self.bar_duration = infer_bar_duration(frame['datetime'])
+
+        bt = BackTester(self.symbol, signal_data_path=frame, compound_flag=self.compound_flag,
+                        initial_capital=self.initial_capital, execution=self.execution,
+                        bar_duration=self.bar_duration)
+        bt.trades, bt.position, bt.tp, bt.sl, bt.entry_costs, bt.fill_bar_time = (
+            self.trades, self.position, self.tp, self.sl, self.entry_costs, self.fill_bar_time)
+        before, was_open = len(self.trades), self.position.qty != 0
+        self.trade_amt = bt.get_trades(self.trade_amt, reset=self.chunks_backtested == 0, stop=stop)
+        self.tp, self.sl, self.entry_costs, self.fill_bar_time = bt.tp, bt.sl, bt.entry_costs, bt.fill_bar_time
+        self.chunks_backtested += 1
+
+        self.record_excursions(bt, before, was_open, stop)
+        if self.trades_output:
+            append_csv(self.trade_frame(before), self.trades_output, self.chunks_backtested == 1)
+
+    def record_excursions(self, bt, before, was_open, stop):
+        """MAE of the trades closed in this chunk, carrying the open position's low/high into the next."""
+        times, low, high = bt.master_times, bt.master_low, bt.master_high
+        qty = self.trades.column('qty')[before:]
+        init_price = self.trades.column('init_price')[before:]
+        final_price = self.trades.column('final_price')[before:]
+        start = np.searchsorted(times, self.trades.column('init_time')[before:], side="left")
+        end = np.searchsorted(times, self.trades.column('final_time')[before:], side="left")
+        lows, highs = range_extremes(low, high, start, end)
+        if was_open and len(qty):
+            # The first trade closed here is the position carried in from earlier chunks
+            lows[0] = min(lows[0], self.held_low)
+            highs[0] = max(highs[0], self.held_high)
+            self.held_low, self.held_high = math.inf, -math.inf
+        self.adverse_excursions.append(trade_excursions(qty, init_price, final_price, lows, highs)['mae'])
+
+        if self.position.qty != 0:
+            held_from = np.searchsorted(times, pd.Timestamp(self.position.timestamp).value, side="left")
+            if held_from < stop:
+                self.held_low = min(self.held_low, float(low[held_from:stop].min()))
+                self.held_high = max(self.held_high, float(high[held_from:stop].max()))
+
+    def trade_frame(self, start):
+        trades = self.trades
+        return pd.DataFrame({
+            'init_time': trades.column('init_time')[start:].view("datetime64[ns]"),
+            'final_time': trades.column('final_time')[start:].view("datetime64[ns]"),
+            'qty': trades.column('qty')[start:],
+            'init_price': trades.column('init_price')[start:],
+            'final_price': trades.column('final_price')[start:],
+            'costs': trades.column('costs')[start:],
+            'pnl': trades.pnl()[start:],
+        })
+
+    def run(self, source, process_data, chunk_size=CHUNK_SIZE):
+        """Run over a CSV path, columnar store, DataFrame or dict of OHLCV columns sorted by datetime.
+
+        process_data is main.process_data() (passed in, as main.py imports this module).
+        """
+        first = True
+        for chunk in iter_chunks(source, chunk_size):
+            if len(chunk['datetime']) == 0:
+                continue
+            with profiler.stage("chunk"):
+                rows = self.signals(chunk, process_data)
+                if self.signals_output:
+                    append_csv(rows, self.signals_output, first)
+                first = False
+
+                close = rows['close'].to_numpy(dtype=np.float64)
+                self.first_close = close[0] if self.first_close is None else self.first_close
+                self.last_close = close[-1]
+                self.backtest(rows)
+        if self.pending is not None and len(self.pending):
+            self.backtest(self.pending.iloc[:0], final=True)
+        return self
+
+    def get_benchmark_return(self):
+        return (self.last_close - self.first_close) / self.first_close
+
+    def get_statistics(self):
+        """The statistics BackTester.get_statistics() reports for the same run."""
+        if len(self.trades) == 0:
+            return None
+        return trade_statistics(self.trades, self.get_benchmark_return(), np.concatenate(self.adverse_excursions),
+                                self.initial_capital)
+
+
+def run_chunked(source, process_data, chunk_size=CHUNK_SIZE, symbol="BTC", trade_amt=1000, compound_flag=1,
+                signals_output="final_data.csv", trades_output="trades.csv", **kwargs):
+    """Backtest a source too large for memory chunk by chunk (see ChunkedBackTest)."""
+    for path in (signals_output, trades_output):
+        if path and os.path.exists(path):
+            os.remove(path)
+    bt = ChunkedBackTest(symbol, trade_amt, compound_flag, signals_output=signals_output,
+                         trades_output=trades_output, **kwargs)
+    return bt.run(source, process_data, chunk_size)
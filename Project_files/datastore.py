@@ -0,0 +1,193 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+META_FILE = "meta.json"
+STORE_VERSION = 1
+
+
+def is_store(path):
+    """Check whether path is a columnar store directory."""
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, META_FILE))
+
+
+def drop_unnamed(data):
+    """Drop the redundant unnamed index column written by to_csv(index=True)."""
+    return data.drop(columns=[c for c in data.columns if str(c).startswith("Unnamed")])
+
+
+def read_csv(file_path, **kwargs):
+    """Read an OHLCV/signal CSV without its unnamed index column."""
+    return drop_unnamed(pd.read_csv(file_path, **kwargs))
+
+
+def encode_column(values):
+    """Return (array, meta) for one column; strings are stored as int codes plus categories."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype="datetime64[ns]"), {}
+    if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return values.to_numpy(), {}
+    categorical = pd.Categorical(values)
+    return categorical.codes, {'categories': categorical.categories.tolist()}
+
+
+def write_store(data, store_path):
+    """Write a DataFrame as one .npy file per column plus a JSON metadata header."""
+    os.makedirs(store_path, exist_ok=True)
+    columns = {}
+    for name in data.columns:
+        values = data[name]
+        if name == 'datetime':
+            values = pd.to_datetime(values)
+        array, meta = encode_column(values)
+        file_name = f"{len(columns)}.npy"
+        np.save(os.path.join(store_path, file_name), np.ascontiguousarray(array))
+        columns[name] = {'file': file_name, 'dtype': str(array.dtype), **meta}
+
+    with open(os.path.join(store_path, META_FILE), "w") as f:
+        json.dump({'version': STORE_VERSION, 'rows': len(data), 'columns': columns}, f, indent=1)
+
+
+def promote_column(store_path, column, array, dtype, filled):
+    """Rewrite a memory-mapped column file at a wider dtype, keeping its first `filled` rows."""
+    path = os.path.join(store_path, column['file'])
+    promoted = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=dtype, shape=array.shape)
+    promoted[:filled] = array[:filled]
+    promoted.flush()
+    os.replace(path + ".tmp", path)
+    column['dtype'] = str(dtype)
+    return promoted
+
+
+def convert_csv(file_path, store_path, chunksize=1_000_000):
+    """Convert a CSV into a columnar store without loading the whole file.
+
+    Rows are counted first so each column can be written straight into a preallocated
+    memory-mapped .npy file, one chunk at a time. A numeric column whose dtype widens in a
+    later chunk (e.g. ints then floats) is rewritten at the promoted dtype, as a single
+    read_csv() would type it; a column mixing text and numbers raises ValueError, and any
+    other cast that would lose values raises TypeError.
+    """
+    with open(file_path) as f:
+        n_rows = sum(1 for _ in f) - 1
+
+    os.makedirs(store_path, exist_ok=True)
+    arrays, columns, categories = {}, {}, {}
+    offset = 0
+
+    for chunk in pd.read_csv(file_path, chunksize=chunksize):
+        chunk = drop_unnamed(chunk)
+        if 'datetime' in chunk:
+            chunk['datetime'] = pd.to_datetime(chunk['datetime'])
+
+        for name in chunk.columns:
+            values = chunk[name]
+            if pd.api.types.is_datetime64_any_dtype(values):
+                dtype = np.dtype("datetime64[ns]")
+            elif pd.api.types.is_numeric_dtype(values):
+                dtype = values.dtype
+            else:
+                dtype = None
+
+            if name not in arrays:
+                if dtype is None:
+                    dtype = np.dtype(np.int32)
+                    categories[name] = {}
+                file_name = f"{len(columns)}.npy"
+                arrays[name] = np.lib.format.open_memmap(os.path.join(store_path, file_name), mode="w+",
+                                                         dtype=dtype, shape=(n_rows,))
+                columns[name] = {'file': file_name, 'dtype': str(dtype)}
+            elif (dtype is None) != (name in categories):
+                raise ValueError(f"Column {name!r} mixes text and numeric values (chunk at row {offset})")
+            elif dtype is not None and dtype != arrays[name].dtype:
+                try:
+                    promoted = np.promote_types(arrays[name].dtype, dtype)
+                except TypeError:
+                    raise ValueError(f"Column {name!r} changes from {arrays[name].dtype} to {dtype} "
+                                     f"(chunk at row {offset})") from None
+                if promoted != arrays[name].dtype:
+                    arrays[name] = promote_column(store_path, columns[name], arrays[name], promoted, offset)
+
+            if name in categories:
+                lookup = categories[name]
+                values = np.array([lookup.setdefault(v, len(lookup)) for v in values.tolist()], dtype=np.int32)
+            else:
+                values = values.to_numpy()
+            np.copyto(arrays[name][offset:offset + len(chunk)], values, casting="safe")
+        offset += len(chunk)
+
+    for name, array in arrays.items():
+        array.flush()
+        if name in categories:
+            columns[name]['categories'] = list(categories[name])
+
+    with open(os.path.join(store_path, META_FILE), "w") as f:
+        json.dump({'version': STORE_VERSION, 'rows': offset, 'columns': columns}, f, indent=1)
+
+
+def read_meta(store_path):
+    with open(os.path.join(store_path, META_FILE)) as f:
+        return json.load(f)
+
+
+def load_columns(store_path, columns=None, start=None, end=None, rows=None):
+    """Memory-map a store and return {name: array} for rows with start <= datetime < end.
+
+    Arrays are read-only views onto the mapped files, so only the pages actually touched
+    are read from disk. The datetime range is located with a binary search on the
+    (sorted) datetime column instead of scanning the file. rows=(first, last) selects a
+    row range instead.
+    """
+    meta = read_meta(store_path)
+    names = columns if columns is not None else list(meta['columns'])
+
+    def mapped(name):
+        return np.load(os.path.join(store_path, meta['columns'][name]['file']), mmap_mode="r")
+
+    lo, hi = rows if rows is not None else (0, meta['rows'])
+    if start is not None or end is not None:
+        datetimes = mapped('datetime')
+        if start is not None:
+            lo = int(np.searchsorted(datetimes, np.datetime64(pd.Timestamp(start), "ns"), side="left"))
+        if end is not None:
+            hi = int(np.searchsorted(datetimes, np.datetime64(pd.Timestamp(end), "ns"), side="left"))
+
+    arrays = {}
+    for name in names:
+        array = mapped(name)[lo:hi]
+        if 'categories' in meta['columns'][name]:
+            array = np.asarray(meta['columns'][name]['categories'], dtype=object)[array]
+        arrays[name] = array
+    return arrays
+
+
+def load_store(store_path, columns=None, start=None, end=None):
+    """Load a store (or a datetime range of it) as a DataFrame backed by the mapped arrays."""
+    return pd.DataFrame(load_columns(store_path, columns, start, end), copy=False)
+
+
+def load_ohlcv(path, columns=None, start=None, end=None):
+    """Load OHLCV or signal data from either a columnar store directory or a CSV file."""
+    if is_store(path):
+        return load_store(path, columns, start, end)
+    data = read_csv(path, usecols=columns)
+    if start is not None or end is not None:
+        datetimes = pd.to_datetime(data['datetime'])
+        mask = np.ones(len(data), dtype=bool)
+        if start is not None:
+            mask &= datetimes >= pd.Timestamp(start)
+        if end is not None:
+            mask &= datetimes < pd.Timestamp(end)
+        data = data[mask].reset_index(drop=True)
+    return data
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python datastore.py <input.csv> <store_dir>")
+        sys.exit(1)
+    convert_csv(sys.argv[1], sys.argv[2])
+    print(f"Wrote {read_meta(sys.argv[2])['rows']} rows to {sys.argv[2]}")
@@ -0,0 +1,283 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+# Trade type labels written to the 'trade_type' column, indexed by trade code
+TRADE_TYPES = np.array(["HOLD", "LONG", "SHORT", "REVERSE_LONG_TO_SHORT", "CLOSE_LONG",
+                        "REVERSE_SHORT_TO_LONG", "CLOSE_SHORT"], dtype=object)
+HOLD, LONG, SHORT, REVERSE_LONG_TO_SHORT, CLOSE_LONG, REVERSE_SHORT_TO_LONG, CLOSE_SHORT = range(7)
+
+REQUIRED_COLUMNS = ['close', 'ATR', 'SMA_20', 'SMA_50', 'SMA_200', 'RSI', 'MACD', 'MACD_signal']
+
+START_INDEX = 200
+
+CONDITION_COLUMNS = ['close', 'SMA_20', 'SMA_50', 'SMA_200', 'RSI', 'MACD', 'MACD_signal', 'volume',
+                     'Volume_SMA', 'BB_upper', 'BB_middle', 'BB_lower']
+
+# Tunable strategy constants and their defaults in strat()
+DEFAULT_PARAMS = {
+    'trailing_stop_multiplier': 2.0,
+    'rsi_overbought': 70,
+    'rsi_oversold': 30,
+    'take_profit': 0.15,
+    'volume_confirmation_factor': 1.2,
+    'volume_floor_factor': 0.8,
+    'min_confirmations': 3,
+}
+
+
+def column(data, name):
+    """Return a DataFrame column or array as a contiguous float64 array."""
+    return np.ascontiguousarray(np.asarray(data[name], dtype=np.float64))
+
+
+def shift(values):
+    """Shift an array forward by one bar, padding with NaN."""
+    shifted = np.empty_like(values)
+    shifted[0] = np.nan
+    shifted[1:] = values[:-1]
+    return shifted
+
+
+def compute_conditions(data, rsi_overbought=70, rsi_oversold=30, volume_confirmation_factor=1.2,
+                       volume_floor_factor=0.8, min_confirmations=3):
+    """Precompute every stateless strategy condition as a boolean array."""
+    values = {name: column(data, name) for name in CONDITION_COLUMNS}
+
+    valid = np.ones(len(values['close']), dtype=bool)
+    for name in REQUIRED_COLUMNS:
+        valid &= ~np.isnan(values[name] if name in values else column(data, name))
+
+    return evaluate_conditions(values, shift(values['SMA_50']), shift(values['SMA_200']), valid,
+                               rsi_overbought, rsi_oversold, volume_confirmation_factor,
+                               volume_floor_factor, min_confirmations)
+
+
+def evaluate_conditions(values, prev_sma_50, prev_sma_200, valid, rsi_overbought=70, rsi_oversold=30,
+                        volume_confirmation_factor=1.2, volume_floor_factor=0.8, min_confirmations=3):
+    """Evaluate the strategy conditions on CONDITION_COLUMNS values.
+
+    values holds either float64 arrays (one entry per bar) or NumPy float64 scalars for a single
+    bar, as streaming.py uses; prev_sma_50/prev_sma_200 are the previous bar's SMAs.
+    """
+    close = values['close']
+    sma_20 = values['SMA_20']
+    sma_50 = values['SMA_50']
+    sma_200 = values['SMA_200']
+    rsi = values['RSI']
+    macd = values['MACD']
+    macd_signal = values['MACD_signal']
+    volume = values['volume']
+    volume_sma = values['Volume_SMA']
+    bb_upper = values['BB_upper']
+    bb_middle = values['BB_middle']
+    bb_lower = values['BB_lower']
+
+    # NaN comparisons are False, matching the scalar comparisons in strat()
+    trend_bullish = (sma_20 > sma_50) & (sma_50 > sma_200)
+    trend_bearish = (sma_20 < sma_50) & (sma_50 < sma_200)
+
+    sma_cross_up = (sma_50 > sma_200) & (prev_sma_50 <= prev_sma_200)
+    sma_cross_down = (sma_50 < sma_200) & (prev_sma_50 >= prev_sma_200)
+
+    macd_bullish = macd > macd_signal
+    macd_bearish = macd < macd_signal
+
+    volume_confirmation = volume > volume_sma * volume_confirmation_factor
+    volume_floor = volume > volume_sma * volume_floor_factor
+    price_above_bb_middle = close > bb_middle
+    price_below_bb_middle = close < bb_middle
+
+    # Confirmations that do not depend on the parameters (shared by variants.py)
+    long_votes = ((sma_cross_up | (trend_bullish & (close > sma_20))).astype(np.int8)
+                  + macd_bullish
+                  + (price_above_bb_middle | (close > bb_lower * 1.01)))
+    short_votes = ((sma_cross_down | (trend_bearish & (close < sma_20))).astype(np.int8)
+                   + macd_bearish
+                   + (price_below_bb_middle | (close < bb_upper * 0.99)))
+
+    long_count = long_votes + ((rsi < rsi_overbought) & (rsi > 40)) + (volume_confirmation | volume_floor)
+    short_count = short_votes + ((rsi > rsi_oversold) & (rsi < 60)) + (volume_confirmation | volume_floor)
+
+    # Exit conditions that do not depend on entry price or trailing stop
+    long_exit = (rsi > 75) | (macd_bearish & (rsi > 65)) | (trend_bearish & (close < sma_20))
+    short_exit = (rsi < 25) | (macd_bullish & (rsi < 35)) | (trend_bullish & (close > sma_20))
+
+    reverse_to_short = (sma_cross_down & macd_bearish & (rsi < 65)) | trend_bearish
+    reverse_to_long = (sma_cross_up & macd_bullish & (rsi > 35)) | trend_bullish
+
+    return {
+        'valid': valid,
+        'trend_bullish': trend_bullish,
+        'trend_bearish': trend_bearish,
+        'sma_cross_up': sma_cross_up,
+        'sma_cross_down': sma_cross_down,
+        'macd_bullish': macd_bullish,
+        'macd_bearish': macd_bearish,
+        'volume_confirmation': volume_confirmation,
+        'long_votes': long_votes,
+        'short_votes': short_votes,
+        'long_count': long_count,
+        'short_count': short_count,
+        'long_entry': long_count >= min_confirmations,
+        'short_entry': short_count >= min_confirmations,
+        'long_exit': long_exit,
+        'short_exit': short_exit,
+        'reverse_to_short': reverse_to_short,
+        'reverse_to_long': reverse_to_long,
+    }
+
+
+# The conditions dict entries run_state_machine() reads
+STATE_MACHINE_CONDITIONS = ['valid', 'long_entry', 'short_entry', 'long_exit', 'short_exit',
+                            'reverse_to_short', 'reverse_to_long']
+
+
+def run_state_machine(close, atr, conditions, start_index=START_INDEX,
+                      trailing_stop_multiplier=2.0, take_profit=0.15, state=None):
+    """Run the position/trailing-stop state machine over precomputed conditions.
+
+    Returns the signals array (int64) and an array of trade codes indexing TRADE_TYPES.
+    state is an optional dict of 'position', 'trailing_stop' and 'entry_price' to start from;
+    it is updated with the final state, so a later call can continue over the next rows.
+    """
+    n = len(close)
+    signals = np.zeros(n, dtype=np.int64)
+    trade_codes = np.zeros(n, dtype=np.int8)
+
+    # Plain Python lists index far faster than NumPy scalars inside the loop
+    close_l = close.tolist()
+    stop_offset = (atr * trailing_stop_multiplier).tolist()
+    long_entry = conditions['long_entry'].tolist()
+    short_entry = conditions['short_entry'].tolist()
+    long_exit = conditions['long_exit'].tolist()
+    short_exit = conditions['short_exit'].tolist()
+    reverse_to_short = conditions['reverse_to_short'].tolist()
+    reverse_to_long = conditions['reverse_to_long'].tolist()
+
+    state = state if state is not None else {}
+    position = state.get('position', 0)
+    trailing_stop = state.get('trailing_stop', 0)
+    entry_price = state.get('entry_price', 0)
+
+    # Bars with missing indicators leave the state untouched, so skip them outright
+    bars = (np.flatnonzero(conditions['valid'][start_index:]) + start_index).tolist()
+
+    for i in bars:
+        current_close = close_l[i]
+
+        if position == 0:
+            # A short entry overrides a long entry on the same bar, as in strat()
+            if short_entry[i]:
+                signals[i] = -1
+                trade_codes[i] = SHORT
+                position = -1
+                entry_price = current_close
+                trailing_stop = current_close + stop_offset[i]
+            elif long_entry[i]:
+                signals[i] = 1
+                trade_codes[i] = LONG
+                position = 1
+                entry_price = current_close
+                trailing_stop = current_close - stop_offset[i]
+
+        elif position == 1:
+            if reverse_to_short[i]:
+                signals[i] = -2
+                trade_codes[i] = REVERSE_LONG_TO_SHORT
+                position = -1
+                entry_price = current_close
+                trailing_stop = current_close + stop_offset[i]
+            elif (long_exit[i] or current_close < trailing_stop
+                  or (current_close - entry_price) / entry_price > take_profit):
+                signals[i] = -1
+                trade_codes[i] = CLOSE_LONG
+                position = 0
+                trailing_stop = 0
+            else:
+                trailing_stop = max(trailing_stop, current_close - stop_offset[i])
+
+        else:
+            if reverse_to_long[i]:
+                signals[i] = 2
+                trade_codes[i] = REVERSE_SHORT_TO_LONG
+                position = 1
+                entry_price = current_close
+                trailing_stop = current_close - stop_offset[i]
+            elif (short_exit[i] or current_close > trailing_stop
+                  or (entry_price - current_close) / entry_price > take_profit):
+                signals[i] = 1
+                trade_codes[i] = CLOSE_SHORT
+                position = 0
+                trailing_stop = 0
+            else:
+                trailing_stop = min(trailing_stop, current_close + stop_offset[i])
+
+    state.update(position=position, trailing_stop=trailing_stop, entry_price=entry_price)
+    return signals, trade_codes
+
+
+def generate_signals(data, trailing_stop_multiplier=2.0, rsi_overbought=70, rsi_oversold=30,
+                     take_profit=0.15, volume_confirmation_factor=1.2, volume_floor_factor=0.8,
+                     min_confirmations=3, start_index=START_INDEX, state=None):
+    """Return (signals, trade_codes) arrays for a DataFrame or dict of indicator columns.
+
+    The strategy starts flat at start_index (or from state, see run_state_machine()); earlier
+    bars only feed the one-bar lookback of the crossover conditions.
+    """
+    conditions = compute_conditions(data, rsi_overbought, rsi_oversold, volume_confirmation_factor,
+                                    volume_floor_factor, min_confirmations)
+    return run_state_machine(column(data, 'close'), column(data, 'ATR'), conditions, start_index,
+                             trailing_stop_multiplier=trailing_stop_multiplier,
+                             take_profit=take_profit, state=state)
+
+
+def run_strategy(data, compact=False, **params):
+    """Vectorized equivalent of strat(): adds 'trade_type' and 'signals' columns to data.
+
+    compact stores 'trade_type' as a categorical and 'signals' as int8 instead of Python
+    strings and int64.
+    """
+    signals, trade_codes = generate_signals(data, **params)
+    return add_signal_columns(data, signals, trade_codes, compact)
+
+
+def add_signal_columns(data, signals, trade_codes, compact=False):
+    """Write 'trade_type' and 'signals' columns (categorical and int8 if compact) and return data."""
+    if compact:
+        data['trade_type'] = pd.Categorical.from_codes(trade_codes, TRADE_TYPES)
+        data['signals'] = signals.astype(np.int8)
+    else:
+        data['trade_type'] = TRADE_TYPES[trade_codes]
+        data['signals'] = signals
+    return data
+
+
+if __name__ == "__main__":
+    from benchmarks import synthetic_ohlcv
+    from main import process_data, strat_loop
+
+    n_bars = 1_000_000
+    n_loop_bars = 20_000
+
+    data = process_data(synthetic_ohlcv(n_bars))
+
+    start = time.perf_counter()
+    result = run_strategy(data.copy())
+    engine_time = time.perf_counter() - start
+
+    sample = data.iloc[:n_loop_bars].copy()
+    start = time.perf_counter()
+    expected = strat_loop(sample.copy())
+    loop_time = time.perf_counter() - start
+
+    actual = run_strategy(sample.copy())
+    assert (actual['signals'] == expected['signals']).all()
+    assert (actual['trade_type'] == expected['trade_type']).all()
+
+    engine_per_bar = engine_time / n_bars * 1e6
+    loop_per_bar = loop_time / n_loop_bars * 1e6
+    print(f"engine: {engine_time:.2f}s for {n_bars} bars ({engine_per_bar:.2f} us/bar)")
+    print(f"loop:   {loop_time:.2f}s for {n_loop_bars} bars ({loop_per_bar:.2f} us/bar)")
+    print(f"speedup: {loop_per_bar / engine_per_bar:.1f}x")
@@ -0,0 +1,59 @@
+import numpy as np
+
+
+def held_sum(first, last, weights, n_bars):
+    """Per-bar sum of weights over the bar ranges [first, last], via a cumulative difference array."""
+    diff = np.bincount(first, weights, minlength=n_bars + 1)
+    diff -= np.bincount(last + 1, weights, minlength=n_bars + 1)
+    return np.cumsum(diff[:n_bars])
+
+
+def equity_curve(times, close, qty, init_price, final_price, init_time, final_time, fees, initial_capital=1000):
+    """Per-bar mark-to-market pnl, capital, position and exposure for a set of trades.
+
+    times are the sorted bar open times (int64 ns) and close the bar closing prices; trade
+    timestamps are int64 ns as well. A trade is held over every bar with
+    init_time <= time < final_time and marked to each bar's close, except on its last bar,
+    where it is marked to final_price and charged its fee, so the per-bar pnl of a trade
+    sums to its trade pnl exactly. Trade sizes already reflect compounding (get_trades()
+    grows qty with realized pnl when compound_flag is set), so capital is initial_capital
+    plus cumulative pnl either way.
+
+    Returns a dict of float64 arrays: pnl, capital, position (signed USD qty held) and
+    exposure (absolute market value of the position at the bar close).
+    """
+    n_bars = len(times)
+    close = np.asarray(close, dtype=np.float64)
+    if n_bars == 0:
+        empty = np.zeros(0)
+        return {'pnl': empty, 'capital': empty, 'position': empty, 'exposure': empty}
+
+    first = np.minimum(np.searchsorted(times, init_time, side="left"), n_bars - 1)
+    last = np.clip(np.searchsorted(times, final_time, side="left") - 1, first, n_bars - 1)
+
+    # Price units held per USD of entry notional
+    units = qty / init_price
+    held_units = held_sum(first, last, units, n_bars)
+
+    price_change = np.empty(n_bars)
+    price_change[0] = 0.0
+    np.subtract(close[1:], close[:-1], out=price_change[1:])
+
+    # Move each trade's first mark from the previous close to its entry price and its last
+    # mark from the bar close to its exit price
+    entry_fix = units * (close[np.maximum(first - 1, 0)] - init_price)
+    exit_fix = units * (final_price - close[last]) - fees
+
+    pnl = held_units * price_change
+    pnl += np.bincount(first, entry_fix, minlength=n_bars)
+    pnl += np.bincount(last, exit_fix, minlength=n_bars)
+
+    capital = np.cumsum(pnl)
+    capital += initial_capital
+
+    return {
+        'pnl': pnl,
+        'capital': capital,
+        'position': held_sum(first, last, qty, n_bars),
+        'exposure': np.abs(held_units * close),
+    }
@@ -0,0 +1,106 @@
+import bisect
+
+import numpy as np
+import pandas as pd
+
+transaction_fee = 0.0015
+
+
+class ExecutionModel:
+    """Fees, slippage, funding and fill delay applied by BackTester when it opens and closes positions.
+
+    Entries, signal exits and stop losses are market orders that pay the taker fee and slippage;
+    take profits are resting limit orders filled at the exact TP price for the maker fee.
+    Fees are charged on the entry notional |qty| of each side. The defaults (half of
+    transaction_fee per side, no slippage, funding or delay) reproduce the flat
+    transaction_fee per trade.
+    """
+
+    def __init__(self, taker_fee=transaction_fee / 2, maker_fee=transaction_fee / 2, fee_tiers=None,
+                 slippage=0.0, impact=0.0, funding_rate=0.0, funding_interval="8h", fill_delay=0):
+        """
+        Args:
+            taker_fee, maker_fee (float): Fee rates per side.
+            fee_tiers (list): Optional [(turnover, maker_fee, taker_fee), ...]; the rates of the highest
+                tier whose turnover the cumulative traded notional has reached replace the flat rates.
+            slippage (float): Fraction of price lost on every market fill.
+            impact (float): Extra slippage per unit of order notional over bar dollar volume (volume * close).
+            funding_rate (float or pd.Series): Perpetual funding rate per funding_interval, paid by longs
+                and received by shorts when positive; a Series gives the rate at each funding timestamp.
+            funding_interval (str): Time between funding payments when funding_rate is a float.
+            fill_delay (int): Bars between a signal and its fill, at the later bar's close.
+        """
+        self.taker_fee = taker_fee
+        self.maker_fee = maker_fee
+        self.fee_tiers = sorted(fee_tiers) if fee_tiers else None
+        self.tier_turnovers = [tier[0] for tier in self.fee_tiers] if fee_tiers else None
+        self.slippage = slippage
+        self.impact = impact
+        self.fill_delay = fill_delay
+
+        if isinstance(funding_rate, pd.Series):
+            funding_rate = funding_rate.sort_index()
+            self.funding_times = funding_rate.index.to_numpy(dtype="datetime64[ns]").view(np.int64)
+            self.cumulative_funding = np.concatenate(([0.0], np.cumsum(funding_rate.to_numpy(dtype=np.float64))))
+            self.funding_rate = None
+        else:
+            self.funding_times = None
+            self.funding_rate = funding_rate
+        self.funding_interval = pd.to_timedelta(funding_interval).value
+
+        self.turnover = 0.0
+
+    def reset(self):
+        """Forget the traded turnover before a new backtest."""
+        self.turnover = 0.0
+
+    def fee(self, notional, maker=False):
+        """Fee for one fill of the given notional, counting it towards the fee tier turnover."""
+        maker_fee, taker_fee = self.maker_fee, self.taker_fee
+        if self.fee_tiers:
+            tier = bisect.bisect_right(self.tier_turnovers, self.turnover) - 1
+            if tier >= 0:
+                _, maker_fee, taker_fee = self.fee_tiers[tier]
+        self.turnover += notional
+        return (maker_fee if maker else taker_fee) * notional
+
+    def fill_price(self, price, side, notional, dollar_volume=0.0):
+        """Price of a market order of `side` (+1 buy, -1 sell) after slippage and volume impact."""
+        if self.slippage == 0 and self.impact == 0:
+            return price
+        slip = self.slippage
+        if self.impact and dollar_volume > 0:
+            slip += self.impact * notional / dollar_volume
+        return price * (1 + side * slip)
+
+    def open(self, position, price, qty, timestamp, dollar_volume=0.0):
+        """Open position with a market order at price plus slippage; returns the entry fee."""
+        notional = abs(qty)
+        price = self.fill_price(price, 1 if qty > 0 else -1, notional, dollar_volume)
+        entry_costs = self.fee(notional)
+        position.open(price, qty, timestamp)
+        return entry_costs
+
+    def close(self, position, price, timestamp, entry_costs=0.0, dollar_volume=0.0, maker=False):
+        """Close position (as a market order unless maker) and return the trade with entry_costs, exit fee and funding."""
+        notional = abs(position.qty)
+        if not maker:
+            price = self.fill_price(price, -1 if position.qty > 0 else 1, notional, dollar_volume)
+        costs = entry_costs + self.fee(notional, maker) + self.funding(position.qty, position.timestamp, timestamp)
+        return position.close(price, timestamp, costs)
+
+    def funding(self, qty, init_time, final_time):
+        """Funding paid (negative if received) by a position of signed USD qty held over [init_time, final_time)."""
+        if self.funding_times is None and self.funding_rate == 0:
+            return 0.0
+        init_time, final_time = pd.Timestamp(init_time).value, pd.Timestamp(final_time).value
+        if self.funding_times is not None:
+            start, end = np.searchsorted(self.funding_times, [init_time, final_time], side="left")
+            return qty * float(self.cumulative_funding[end] - self.cumulative_funding[start])
+        # Funding timestamps are the multiples of the interval since the epoch
+        payments = -(-final_time // self.funding_interval) - -(-init_time // self.funding_interval)
+        return qty * self.funding_rate * payments
+
+    def fill_index(self, n_bars):
+        """Bar whose close fills a signal on each bar, after the fill delay."""
+        return np.minimum(np.arange(n_bars) + self.fill_delay, max(n_bars - 1, 0))
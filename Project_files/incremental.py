@@ -0,0 +1,332 @@
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+nan = float("nan")
+
+
+class RollingMean:
+    """Simple moving average over a fixed window using a running sum.
+
+    As in pandas rolling().mean(), a window holding a NaN gives NaN; NaNs are counted rather
+    than summed, so the average recovers once they leave the window. The sum is recomputed
+    from the window every `length` bars to bound rounding drift.
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.window = deque(maxlen=length)
+        self.total = 0.0
+        self.nans = 0
+        self.updates = 0
+
+    def update(self, value):
+        if value != value:
+            self.nans += 1
+        else:
+            self.total += value
+        self.window.append(value)
+        if len(self.window) < self.length:
+            return nan
+
+        self.updates += 1
+        if self.updates % self.length == 0:
+            self.total = sum(item for item in self.window if item == item)
+        mean = nan if self.nans else self.total / self.length
+        # Drop the oldest value now; the deque evicts it on the next append
+        oldest = self.window[0]
+        if oldest != oldest:
+            self.nans -= 1
+        else:
+            self.total -= oldest
+        return mean
+
+
+class RollingVariance:
+    """Sliding-window variance with Welford-style add/remove updates.
+
+    As in pandas rolling().var(), a window holding a NaN gives NaN; NaNs are counted rather
+    than added to the running mean and sum of squares, which are recomputed from the window
+    every `length` bars to bound rounding drift.
+    """
+
+    def __init__(self, length, ddof=0):
+        self.length = length
+        self.ddof = ddof
+        self.window = deque()
+        self.count = 0  # Finite values in the window
+        self.nans = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.updates = 0
+
+    def add(self, value):
+        if value != value:
+            self.nans += 1
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def remove(self, value):
+        if value != value:
+            self.nans -= 1
+            return
+        self.count -= 1
+        if self.count == 0:
+            self.mean = self.m2 = 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        self.m2 -= delta * (value - self.mean)
+
+    def resync(self):
+        values = [item for item in self.window if item == item]
+        self.count = len(values)
+        self.mean = sum(values) / self.count if values else 0.0
+        self.m2 = sum((item - self.mean) * (item - self.mean) for item in values)
+
+    def update(self, value):
+        self.window.append(value)
+        old = self.window.popleft() if len(self.window) > self.length else None
+
+        if old is not None and old == old and value == value:
+            # Replace in one step when the number of finite values stays the same
+            old_mean = self.mean
+            self.mean += (value - old) / self.count
+            self.m2 += (value - old) * (value - self.mean + old - old_mean)
+        else:
+            if old is not None:
+                self.remove(old)
+            self.add(value)
+
+        if len(self.window) < self.length:
+            return nan
+        self.updates += 1
+        if self.updates % self.length == 0:
+            self.resync()
+        if self.nans:
+            return nan
+        return max(self.m2, 0.0) / (self.length - self.ddof)
+
+
+class WilderRSI:
+    """RSI with Wilder smoothing, seeded by the simple average of the first `length` moves."""
+
+    def __init__(self, length=14):
+        self.length = length
+        self.prev_close = None
+        self.count = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+
+    def update(self, close):
+        prev_close, self.prev_close = self.prev_close, close
+        if prev_close is None:
+            return nan
+
+        change = close - prev_close
+        self.count += 1
+
+        if self.count <= self.length:
+            if change < 0:
+                self.avg_loss -= change
+            else:
+                self.avg_gain += change
+            if self.count < self.length:
+                return nan
+            self.avg_gain /= self.length
+            self.avg_loss /= self.length
+        else:
+            self.avg_gain *= self.length - 1
+            self.avg_loss *= self.length - 1
+            if change < 0:
+                self.avg_loss -= change
+            else:
+                self.avg_gain += change
+            self.avg_gain /= self.length
+            self.avg_loss /= self.length
+
+        total = self.avg_gain + self.avg_loss
+        return 100.0 * (self.avg_gain / total) if abs(total) >= 1e-8 else 0.0
+
+
+class WilderATR:
+    """Average True Range with Wilder smoothing, seeded by the mean of the first `length` true ranges."""
+
+    def __init__(self, length=14):
+        self.length = length
+        self.prev_close = None
+        self.count = 0
+        self.atr = 0.0
+
+    def update(self, high, low, close):
+        prev_close, self.prev_close = self.prev_close, close
+        if prev_close is None:
+            return nan
+
+        true_range = max(high - low, abs(prev_close - high), abs(prev_close - low))
+        self.count += 1
+
+        if self.count < self.length:
+            self.atr += true_range
+            return nan
+        if self.count == self.length:
+            self.atr = (self.atr + true_range) / self.length
+        else:
+            self.atr = (self.atr * (self.length - 1) + true_range) / self.length
+        return self.atr
+
+
+class EMA:
+    """Exponential moving average seeded with the simple average of its first `length` inputs."""
+
+    def __init__(self, length):
+        self.length = length
+        self.k = 2.0 / (length + 1)
+        self.seed = []
+        self.value = None
+
+    def seed_with(self, values):
+        """Start the average from the mean of `values` (used to align MACD's EMAs)."""
+        self.value = sum(values) / len(values)
+        return self.value
+
+    def update(self, value):
+        if self.value is None:
+            self.seed.append(value)
+            if len(self.seed) < self.length:
+                return nan
+            return self.seed_with(self.seed)
+        self.value = (value - self.value) * self.k + self.value
+        return self.value
+
+
+class MACD:
+    """MACD line, signal and histogram.
+
+    Both EMAs start on the same bar (the slow EMA's first bar), each seeded with the mean
+    of its own trailing window, and the signal EMA is seeded with the mean of the first
+    `signal` MACD values, matching the TA-Lib output used by pandas_ta.
+    """
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+        self.warmup = deque(maxlen=slow)
+
+    def update(self, close):
+        if self.slow.value is None:
+            self.warmup.append(close)
+            if len(self.warmup) < self.slow.length:
+                return nan, nan, nan
+            slow = self.slow.seed_with(self.warmup)
+            fast = self.fast.seed_with(list(self.warmup)[-self.fast.length:])
+        else:
+            slow = self.slow.update(close)
+            fast = self.fast.update(close)
+
+        macd = fast - slow
+        signal = self.signal.update(macd)
+        if math.isnan(signal):
+            return nan, nan, nan
+        return macd, signal, macd - signal
+
+
+class BollingerBands:
+    """Bollinger Bands around a simple moving average using population standard deviation."""
+
+    def __init__(self, length=20, std=2.0):
+        self.std = std
+        self.mean = RollingMean(length)
+        self.variance = RollingVariance(length, ddof=0)
+
+    def update(self, close):
+        middle = self.mean.update(close)
+        deviation = math.sqrt(self.variance.update(close)) * self.std
+        return middle + deviation, middle, middle - deviation
+
+
+class PriceChange:
+    """Bar-over-bar percentage change of the close."""
+
+    def __init__(self):
+        self.prev_close = None
+
+    def update(self, close):
+        prev_close, self.prev_close = self.prev_close, close
+        if prev_close is None:
+            return nan
+        if prev_close == 0:
+            # Float division by zero, as pandas pct_change() gives: +-inf, or NaN for 0/0
+            return nan if close == 0 or close != close else math.copysign(math.inf, close) * math.copysign(1.0, prev_close)
+        return close / prev_close - 1
+
+
+class IncrementalIndicators:
+    """O(1)-per-bar equivalent of process_data().
+
+    update() takes one OHLCV bar and returns the indicator columns process_data() would
+    have produced for it, so a new bar can be appended without reprocessing history.
+    """
+
+    COLUMNS = ['ATR', 'SMA_20', 'SMA_50', 'SMA_200', 'RSI', 'MACD', 'MACD_hist', 'MACD_signal',
+               'BB_lower', 'BB_middle', 'BB_upper', 'Volume_SMA', 'Price_Change', 'Volatility']
+
+    def __init__(self):
+        self.atr = WilderATR(14)
+        self.sma_20 = RollingMean(20)
+        self.sma_50 = RollingMean(50)
+        self.sma_200 = RollingMean(200)
+        self.rsi = WilderRSI(14)
+        self.macd = MACD(12, 26, 9)
+        self.bbands = BollingerBands(20, 2.0)
+        self.volume_sma = RollingMean(20)
+        self.price_change = PriceChange()
+        self.volatility = RollingVariance(14, ddof=1)
+
+    def update(self, high, low, close, volume):
+        """Consume one bar and return a dict of indicator values for it."""
+        macd, macd_signal, macd_hist = self.macd.update(close)
+        bb_upper, bb_middle, bb_lower = self.bbands.update(close)
+        price_change = self.price_change.update(close)
+        # NaN price changes stay in the window, as in pandas rolling().std(), so a gap gives NaN
+        # until it has left the window
+        volatility = math.sqrt(self.volatility.update(price_change))
+
+        return {
+            'ATR': self.atr.update(high, low, close),
+            'SMA_20': self.sma_20.update(close),
+            'SMA_50': self.sma_50.update(close),
+            'SMA_200': self.sma_200.update(close),
+            'RSI': self.rsi.update(close),
+            'MACD': macd,
+            'MACD_hist': macd_hist,
+            'MACD_signal': macd_signal,
+            'BB_lower': bb_lower,
+            'BB_middle': bb_middle,
+            'BB_upper': bb_upper,
+            'Volume_SMA': self.volume_sma.update(volume),
+            'Price_Change': price_change,
+            'Volatility': volatility,
+        }
+
+    def update_bar(self, bar):
+        """Consume a bar given as a mapping with high/low/close/volume keys."""
+        return self.update(bar['high'], bar['low'], bar['close'], bar['volume'])
+
+
+def process_data_incremental(data):
+    """Run IncrementalIndicators over every row; the result matches process_data() within float tolerance."""
+    indicators = IncrementalIndicators()
+    rows = [indicators.update(high, low, close, volume)
+            for high, low, close, volume in zip(data['high'].tolist(), data['low'].tolist(),
+                                                data['close'].tolist(), data['volume'].tolist())]
+    columns = pd.DataFrame(rows, columns=IncrementalIndicators.COLUMNS, index=data.index, dtype=np.float64)
+    for name in IncrementalIndicators.COLUMNS:
+        data[name] = columns[name]
+    return data
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+# Default bound of the in-memory tier; at 10M bars one float64 indicator is 80 MB
+MAX_BYTES = 512 * 2**20
+
+
+def fingerprint(values):
+    """Content hash of one column (dtype, length and raw bytes)."""
+    values = np.ascontiguousarray(np.asarray(values, dtype=np.float64))
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{values.dtype}:{values.shape}".encode())
+    digest.update(values)
+    return digest.hexdigest()
+
+
+class IndicatorCache:
+    """Content-addressed cache of indicator arrays with an in-memory LRU and an optional .npy disk tier.
+
+    Entries are keyed by the fingerprints of the source columns plus the indicator name and
+    parameters, so the same prices always map to the same entry regardless of file or run.
+    Arrays are cached at the dtype they are requested in (float64 unless compact), so a
+    float32 caller never holds float64 copies.
+    The in-memory tier evicts least recently used arrays once it holds more than
+    max_entries arrays or max_bytes bytes; arrays larger than max_bytes are not kept.
+    """
+
+    def __init__(self, cache_dir=None, max_entries=256, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def fingerprints(self, data, columns=('open', 'high', 'low', 'close', 'volume')):
+        """Fingerprint each OHLCV column present in data."""
+        return {name: fingerprint(data[name]) for name in columns if name in data}
+
+    def key(self, name, sources, params, dtype=np.float64):
+        """Build the cache key for an indicator over fingerprinted source columns."""
+        entry = {'name': name, 'sources': sources, 'params': params}
+        # float64 keys are left as they were, so existing disk tiers stay valid
+        if np.dtype(dtype) != np.float64:
+            entry['dtype'] = np.dtype(dtype).str
+        payload = json.dumps(entry, sort_keys=True)
+        return hashlib.blake2b(payload.encode(), digest_size=20).hexdigest()
+
+    def get(self, name, sources, params, compute, dtype=np.float64):
+        """Return the cached array for (name, sources, params), computing and storing it on a miss.
+
+        compute() must return a NumPy array (1-D, or 2-D with one row per output) or None;
+        None results are passed through and never cached. The result is cast to dtype, and
+        entries of each dtype are cached separately. Returned arrays are copies, so callers
+        may modify them freely.
+        """
+        key = self.key(name, sources, params, dtype)
+
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.memory_hits += 1
+            return self.memory[key].copy()
+
+        path = os.path.join(self.cache_dir, key + ".npy") if self.cache_dir else None
+        if path and os.path.exists(path):
+            values = np.load(path)
+            self.disk_hits += 1
+            self.remember(key, values)
+            return values.copy()
+
+        self.misses += 1
+        values = compute()
+        if values is None:
+            return None
+
+        values = np.asarray(values, dtype=dtype)
+        self.remember(key, values.copy())
+        if path:
+            # Write to a temporary file first so concurrent readers never see a partial array
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, values)
+            os.replace(tmp_path, path)
+
+        return values
+
+    def remember(self, key, values):
+        if values.nbytes > self.max_bytes or self.max_entries <= 0:
+            return
+        if key in self.memory:
+            self.memory_bytes -= self.memory.pop(key).nbytes
+        self.memory[key] = values
+        self.memory_bytes += values.nbytes
+        while len(self.memory) > self.max_entries or self.memory_bytes > self.max_bytes:
+            self.memory_bytes -= self.memory.popitem(last=False)[1].nbytes
+
+    def clear(self):
+        """Drop the in-memory tier (the disk tier is left intact)."""
+        self.memory.clear()
+        self.memory_bytes = 0
+
+    def stats(self):
+        """Return hit/miss counters for both tiers."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            'memory_entries': len(self.memory),
+            'memory_mb': self.memory_bytes / 2**20,
+        }
+
+
+# Shared cache used by process_data(); set INDICATOR_CACHE_DIR to enable the disk tier and
+# INDICATOR_CACHE_MB to bound the in-memory tier (0 disables it)
+indicator_cache = IndicatorCache(cache_dir=os.environ.get("INDICATOR_CACHE_DIR"),
+                                 max_bytes=int(float(os.environ.get("INDICATOR_CACHE_MB", MAX_BYTES / 2**20)) * 2**20))
@@ -0,0 +1,81 @@
+import numpy as np
+
+from incremental import IncrementalIndicators
+from streaming import StreamingStrategy
+
+
+def causal_replay(data, dtype=np.float64, **params):
+    """Recompute indicators and signals bar by bar, seeing only past and current bars.
+
+    The strategy sees the indicators rounded to dtype, so a float32 (compact) run is replayed
+    at its own precision. Returns (indicator columns dict, signals array).
+    """
+    rounded = np.dtype(dtype) != np.float64
+    n = len(data)
+    indicators = IncrementalIndicators()
+    strategy = StreamingStrategy(**params)
+    columns = {name: np.empty(n) for name in IncrementalIndicators.COLUMNS}
+    signals = np.zeros(n, dtype=np.int64)
+
+    bars = zip(data['high'].tolist(), data['low'].tolist(), data['close'].tolist(), data['volume'].tolist())
+    for i, (high, low, close, volume) in enumerate(bars):
+        bar = indicators.update(high, low, close, volume)
+        for name, value in bar.items():
+            columns[name][i] = value
+            if rounded:
+                bar[name] = float(dtype(value))
+        bar['close'] = close
+        bar['volume'] = volume
+        signals[i] = strategy.on_bar(bar)[0]
+
+    return columns, signals
+
+
+def column_mismatches(expected, actual, rtol):
+    """Indices where two indicator columns differ beyond a tolerance scaled to the column."""
+    expected = np.asarray(expected, dtype=np.float64)
+    finite = np.abs(expected[np.isfinite(expected)])
+    atol = rtol * finite.max() if len(finite) else 0.0
+    close = np.isclose(expected, actual, rtol=rtol, atol=atol, equal_nan=True)
+    return np.flatnonzero(~close)
+
+
+def find_lookahead(data, result_data, process_data, strat, rtol=1e-6, confirm=5, dtype=np.float64, **params):
+    """Check every bar of result_data for lookahead bias in time linear in the data length.
+
+    data is the raw OHLCV frame and result_data the output of strat(process_data(data)).
+    Every bar's signal and indicator values are compared against a causal bar-by-bar replay.
+    The first `confirm` signal mismatches, and the first mismatch of each indicator, are
+    re-run on the data truncated at that bar: if the truncated result differs from the full
+    result, the bar used future data. Mismatches that reproduce on the truncated data point
+    to the batch and streaming implementations diverging rather than to lookahead. dtype is
+    the precision of the indicators in result_data (see causal_replay()).
+
+    Returns a dict with every mismatching index and the confirmed lookahead indices.
+    """
+    columns, signals = causal_replay(data, dtype, **params)
+
+    result_signals = result_data['signals'].to_numpy()
+    signal_mismatches = np.flatnonzero(signals != result_signals)
+    indicator_mismatches = {
+        name: column_mismatches(result_data[name], columns[name], rtol)
+        for name in IncrementalIndicators.COLUMNS if name in result_data
+    }
+
+    to_confirm = set(signal_mismatches[:confirm].tolist())
+    to_confirm.update(int(idx[0]) for idx in indicator_mismatches.values() if len(idx))
+
+    lookahead, diverged = [], []
+    for i in sorted(to_confirm):
+        prefix = strat(process_data(data.iloc[:i + 1].copy(deep=False)))
+        changed = prefix['signals'].iloc[i] != result_data['signals'].iloc[i] or any(
+            len(column_mismatches(result_data[name].iloc[i:i + 1], prefix[name].iloc[i:i + 1], rtol))
+            for name in indicator_mismatches)
+        (lookahead if changed else diverged).append(i)
+
+    return {
+        'signal_mismatches': signal_mismatches.tolist(),
+        'indicator_mismatches': {name: idx.tolist() for name, idx in indicator_mismatches.items() if len(idx)},
+        'lookahead': lookahead,
+        'diverged': diverged,
+    }
@@ -1,30 +1,93 @@
+import argparse
+import sys
 import pandas as pd
 import numpy as np
 import talib as tb
 import pandas_ta as ta
-from backtester import BackTester
-
-
-def process_data(data):
-    """Process input data and add technical indicators."""
-    data['ATR'] = ta.atr(data['high'], data['low'], data['close'], length=14)
-    data['SMA_20'] = ta.sma(data['close'], length=20)
-    data['SMA_50'] = ta.sma(data['close'], length=50)
-    data['SMA_200'] = ta.sma(data['close'], length=200)
-    data['RSI'] = ta.rsi(data['close'], length=14)
-    data['MACD'], data['MACD_signal'], data['MACD_hist'] = ta.macd(data['close'])
-    data['BB_upper'], data['BB_middle'], data['BB_lower'] = ta.bbands(data['close'], length=20)
-    data['Volume_SMA'] = ta.sma(data['volume'], length=20)
+from backtester import BackTester, infer_bar_duration
+from chunked import run_chunked
+from datastore import load_ohlcv
+from engine import run_strategy
+from indicator_cache import IndicatorCache, indicator_cache
+from lookahead import find_lookahead
+from profiling import profiler
+from resample import align_higher_timeframe, resample
+
+
+def values(result):
+    """Convert a pandas_ta result to an array with one row per output column."""
+    return None if result is None else result.to_numpy(dtype=np.float64).T
+
+
+@profiler.timed()
+def process_data(data, cache=None, higher_timeframes=None, compact=False):
+    """Process input data and add technical indicators.
+
+    higher_timeframes maps a bar size to indicator columns to add from bars of that size,
+    e.g. {"1D": ["SMA_200"]} adds SMA_200_1D (see add_higher_timeframes()).
+    compact stores the indicators as float32, halving their memory.
+    """
+    cache = cache if cache is not None else indicator_cache
+    sources = cache.fingerprints(data)
+    dtype = np.float32 if compact else np.float64
+
+    def cached(name, columns, compute, **params):
+        # Cached at the requested dtype, so compact mode keeps no float64 copies in the cache
+        return cache.get(name, [sources[column] for column in columns], params, compute, dtype)
+
+    high, low, close, volume = data['high'], data['low'], data['close'], data['volume']
+
+    data['ATR'] = cached('atr', ['high', 'low', 'close'], lambda: values(ta.atr(high, low, close, length=14)), length=14)
+    data['SMA_20'] = cached('sma', ['close'], lambda: values(ta.sma(close, length=20)), length=20)
+    data['SMA_50'] = cached('sma', ['close'], lambda: values(ta.sma(close, length=50)), length=50)
+    data['SMA_200'] = cached('sma', ['close'], lambda: values(ta.sma(close, length=200)), length=200)
+    data['RSI'] = cached('rsi', ['close'], lambda: values(ta.rsi(close, length=14)), length=14)
+
+    # pandas_ta returns DataFrames: MACD/histogram/signal and lower/middle/upper/bandwidth/percent
+    macd = cached('macd', ['close'], lambda: values(ta.macd(close)))
+    data['MACD'], data['MACD_hist'], data['MACD_signal'] = macd[0], macd[1], macd[2]
+    bbands = cached('bbands', ['close'], lambda: values(ta.bbands(close, length=20))[:3], length=20)
+    data['BB_lower'], data['BB_middle'], data['BB_upper'] = bbands[0], bbands[1], bbands[2]
+    data['Volume_SMA'] = cached('sma', ['volume'], lambda: values(ta.sma(volume, length=20)), length=20)
     
     # Price momentum and volatility
-    data['Price_Change'] = data['close'].pct_change()
-    data['Volatility'] = data['Price_Change'].rolling(window=14).std()
+    data['Price_Change'] = cached('pct_change', ['close'], lambda: values(close.pct_change()))
+    data['Volatility'] = cached('volatility', ['close'],
+                                lambda: values(close.pct_change().rolling(window=14).std()), window=14)
+
+    if higher_timeframes:
+        add_higher_timeframes(data, higher_timeframes, cache, compact)
     
     return data
 
 
-def strat(data):
+def add_higher_timeframes(data, higher_timeframes, cache=None, compact=False):
+    """Add process_data() indicators computed on resampled higher-timeframe bars.
+
+    Each column is named '<indicator>_<freq>' and holds, for every bar, the value of the last
+    higher-timeframe bar that closed by the end of that bar, so there is no lookahead.
+    """
+    times = pd.to_datetime(data['datetime'] if 'datetime' in data.columns else data.index.to_series())
+    bar_duration = infer_bar_duration(pd.Series(times.to_numpy()))
+    ohlcv = data[['open', 'high', 'low', 'close', 'volume']].assign(datetime=times.to_numpy())
+
+    for freq, columns in higher_timeframes.items():
+        bars = resample(ohlcv, freq)
+        bars = process_data(bars[['datetime', 'open', 'high', 'low', 'close', 'volume']].copy(), cache,
+                            compact=compact)
+        for column in columns:
+            values = align_higher_timeframe(times.to_numpy(), bar_duration, bars['datetime'], freq, bars[column])
+            data[f"{column}_{freq}"] = values.astype(np.float32) if compact else values
+
+
+@profiler.timed()
+def strat(data, compact=False):
     """Enhanced trading strategy with multiple confirmation signals."""
+    return run_strategy(data, compact)
+
+
+def strat_loop(data):
+    """Per-row reference implementation of strat(), kept for equivalence checks."""
     data['trade_type'] = "HOLD"
     data['signals'] = 0
     
@@ -175,49 +238,96 @@ def strat(data):
     return data
 
 
-def validate_strategy(data, result_data):
-    """Check for lookahead bias in strategy implementation."""
+@profiler.timed()
+def validate_strategy(data, result_data, compact=False):
+    """Check for lookahead bias and that the causal replay reproduces every bar of result_data.
+
+    With compact, the replay rounds its indicators to float32 like result_data, so float32
+    rounding that flips a signal is reproduced rather than reported as a divergence.
+    """
     print("\n--- Checking for lookahead bias ---")
-    lookahead_bias = False
-    
-    signal_indices = result_data[result_data['signals'] != 0].index[:5]  # Check first 5 signals
-    
-    for i in signal_indices:
-        temp_data = data.iloc[:i+1].copy()
-        temp_data = process_data(temp_data)
-        temp_data = strat(temp_data)
-        
-        if i < len(temp_data) and temp_data.loc[i, 'signals'] != result_data.loc[i, 'signals']:
-            print(f"Lookahead bias detected at index {i}")
-            lookahead_bias = True
-            break
-    
-    if not lookahead_bias:
-        print("No lookahead bias detected in sample validation.")
-    
-    return not lookahead_bias
+    # Truncated re-runs must use the same dtypes as result_data to compare equal; their
+    # indicators are never reused, so they bypass the shared cache's memory tier
+    prefix_cache = IndicatorCache(max_entries=0)
+    report = find_lookahead(data, result_data, lambda prefix: process_data(prefix, prefix_cache, compact=compact),
+                            lambda prefix: strat(prefix, compact), dtype=np.float32 if compact else np.float64)
+
+    for i in report['lookahead']:
+        print(f"Lookahead bias detected at index {i}")
+
+    if report['diverged']:
+        print(f"Streaming replay diverges from batch output at indices {report['diverged']} "
+              f"without lookahead; check that streaming.py matches strat().")
+    if report['signal_mismatches']:
+        print(f"{len(report['signal_mismatches'])} signal mismatches vs causal replay, "
+              f"first at index {report['signal_mismatches'][0]}")
+    for name, indices in report['indicator_mismatches'].items():
+        print(f"{name}: {len(indices)} mismatches vs causal replay, first at index {indices[0]}")
 
+    # The replay is the causal reference: any bar it cannot reproduce is unverified, so a
+    # mismatch fails validation even when no truncated re-run confirmed lookahead
+    mismatched = bool(report['signal_mismatches'] or report['indicator_mismatches'])
+    if not report['lookahead'] and not mismatched:
+        print(f"No lookahead bias detected across all {len(result_data)} bars.")
 
-def main():
-    # Load and process data
-    data = pd.read_csv("BTC_2019_2023_1d.csv")
-    processed_data = process_data(data.copy())
-    result_data = strat(processed_data.copy())
+    return not report['lookahead'] and not mismatched
+
+
+def main(data_path="BTC_2019_2023_1d.csv", profile=None, profile_output="profile.json", master_path=None,
+         timeframe=None, chunk_size=None, compact=False):
+    """Run the full pipeline; with profile (see profiling.MODES) write a stage report to profile_output.
+
+    With timeframe, data_path holds fine bars (e.g. 1-minute) that are resampled to that bar size
+    for the strategy and kept as master data, so TP/SL is checked on intrabar prices.
+    master_path gives separate master data instead. With chunk_size, data_path is processed in
+    windows of that many bars (see run_chunked_pipeline()). compact keeps indicators as float32
+    and signals as int8 (see benchmarks.py compact for the memory saved and the deviation).
+    """
+    if profile:
+        profiler.enable(profile)
+    try:
+        with profiler.stage("main"):
+            if chunk_size:
+                run_chunked_pipeline(data_path, chunk_size)
+            else:
+                run(data_path, master_path, timeframe, compact)
+    finally:
+        if profiler.enabled:
+            print("\n--- Profile ---")
+            print(profiler.summary())
+            profiler.write_report(profile_output)
+            print(f"Profile report written to {profile_output}")
+
+
+def run(data_path, master_path=None, timeframe=None, compact=False):
+    # Load and process data (CSV file or columnar store directory)
+    with profiler.stage("load"):
+        if timeframe:
+            data = resample(data_path, timeframe)
+            master_path = master_path or data_path
+        else:
+            data = load_ohlcv(data_path)
+    # Each stage only adds columns, so shallow copies keep data intact without copying it
+    processed_data = process_data(data.copy(deep=False), compact=compact)
+    result_data = strat(processed_data.copy(deep=False), compact)
     
     # Save results
-    result_data.to_csv("final_data.csv", index=False)
+    with profiler.stage("save_results"):
+        result_data.to_csv("final_data.csv", index=False)
     
     # Validate strategy
-    is_valid = validate_strategy(data, result_data)
+    is_valid = validate_strategy(data, result_data, compact)
     if not is_valid:
         print("Strategy validation failed. Please review implementation.")
         return
+    print(f"Indicator cache: {indicator_cache.stats()}")
     
-    # Initialize backtester
-    bt = BackTester("BTC", 
-                   signal_data_path="final_data.csv", 
-                   master_file_path="final_data.csv", 
-                   compound_flag=1)
+    # Initialize backtester on the in-memory results (also used as master data unless given)
+    with profiler.stage("init_backtester"):
+        bt = BackTester("BTC", 
+                       signal_data_path=result_data, 
+                       master_file_path=master_path,
+                       compound_flag=1)
     
     # Execute backtesting
     bt.get_trades(1000)
@@ -239,9 +349,29 @@ def main():
     else:
         print("No trades executed.")
     
-    # Performance statistics
+    print_statistics(bt.get_statistics())
+    
+    # Generate visualizations
+    print("\nGenerating analysis charts...")
+    bt.make_trade_graph()
+    bt.make_pnl_graph()
+    print("Analysis complete. Check generated charts for visual insights.")
+
+
+def run_chunked_pipeline(data_path, chunk_size):
+    """Out-of-core run(): indicators, strategy and backtest chunk by chunk (see chunked.py).
+
+    final_data.csv and trades.csv are written as chunks complete; the whole-history
+    lookahead check and the charts are skipped, since they need all bars in memory.
+    """
+    bt = run_chunked(data_path, process_data, chunk_size, compound_flag=1)
+    print(f"Processed {bt.rows_seen} bars in chunks of {chunk_size}: {len(bt.trades)} trades written to trades.csv")
+    print_statistics(bt.get_statistics())
+
+
+def print_statistics(stats):
+    """Print the key metrics of a get_statistics() result."""
     print("\n--- Performance Statistics ---")
-    stats = bt.get_statistics()
     if stats:
         key_metrics = ['Total Return', 'Max Drawdown', 'Sharpe Ratio', 'Win Rate', 'Total Trades']
         for key, val in stats.items():
@@ -257,13 +387,25 @@ def main():
                     print(f"{key}: {val}")
     else:
         print("No statistics available.")
-    
-    # Generate visualizations
-    print("\nGenerating analysis charts...")
-    bt.make_trade_graph()
-    bt.make_pnl_graph()
-    print("Analysis complete. Check generated charts for visual insights.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the strategy, validate it and backtest it.")
+    parser.add_argument("data_path", nargs="?", default="BTC_2019_2023_1d.csv", help="CSV file or columnar store")
+    parser.add_argument("--profile", nargs="?", const="time", default=None,
+                        help="time stages; add ',cprofile' and/or ',tracemalloc' for function and memory capture "
+                             "(or set BACKTEST_PROFILE)")
+    parser.add_argument("--profile-output", default="profile.json", help="where to write the JSON profile report")
+    parser.add_argument("--master", default=None, help="finer-grained OHLCV data for intrabar TP/SL checks")
+    parser.add_argument("--timeframe", default=None,
+                        help="resample data_path to this bar size (e.g. 1h) and use data_path as master data")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="process data_path in windows of this many bars to bound memory use")
+    parser.add_argument("--compact", action="store_true", help="float32 indicators and int8 signals")
+    args = parser.parse_args(sys.argv[1:])
+    if args.chunk_size and (args.master or args.timeframe):
+        parser.error("--chunk-size uses data_path as its own master data; drop --master/--timeframe")
+    if args.chunk_size and args.compact:
+        parser.error("--compact is not supported with --chunk-size")
+    main(args.data_path, args.profile, args.profile_output, args.master, args.timeframe, args.chunk_size,
+         args.compact)
\ No newline at end of file
@@ -0,0 +1,177 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+
+def period_indices(times, period, start=0, stop=None):
+    """Indices of the period checkpoints in times[start:stop].
+
+    times are sorted int64 ns. Starting from times[start], the next checkpoint is the first
+    bar at least `period` after the previous checkpoint, matching a walk that compares
+    current_time - last_time >= period bar by bar. The first index is the start itself.
+    """
+    stop = len(times) if stop is None else stop
+    if stop <= start:
+        return np.zeros(0, dtype=np.int64)
+    offset = pd.to_timedelta(period).value
+    window = times[start:stop]
+    following = (np.searchsorted(window, window + offset, side="left") + start).tolist()
+
+    indices = [start]
+    i = following[0]
+    while i < stop:
+        indices.append(i)
+        i = following[i - start]
+    return np.array(indices, dtype=np.int64)
+
+
+def period_pnl(times, capital, period, start=0, stop=None):
+    """Capital changes between consecutive period checkpoints."""
+    return np.diff(np.asarray(capital, dtype=np.float64)[period_indices(times, period, start, stop)])
+
+
+def period_returns(times, capital, period, start=0, stop=None):
+    """Fractional capital returns between consecutive period checkpoints."""
+    sampled = np.asarray(capital, dtype=np.float64)[period_indices(times, period, start, stop)]
+    return sampled[1:] / sampled[:-1] - 1
+
+
+def window_bounds(times, window_size):
+    """(start, stop) row ranges of the non-empty calendar windows pandas.resample() would produce."""
+    index = pd.DatetimeIndex(np.asarray(times).view("datetime64[ns]"))
+    counts = pd.Series(1, index=index).resample(window_size).size().to_numpy()
+    counts = counts[counts > 0]
+    stops = np.cumsum(counts)
+    return np.column_stack([stops - counts, stops])
+
+
+def sharpe_ratio(returns, periods_per_year=365, risk_free_rate=0.0):
+    """Annualized Sharpe ratio of per-period returns (population std, as np.std)."""
+    returns = np.asarray(returns, dtype=np.float64)
+    if len(returns) == 0:
+        return np.nan
+    std = returns.std()
+    return (returns.mean() - risk_free_rate) / std * math.sqrt(periods_per_year) if std > 0 else 0
+
+
+def downside_deviation(returns, target=0.0):
+    """Root mean square of the returns below target, over all periods."""
+    shortfall = np.minimum(np.asarray(returns, dtype=np.float64) - target, 0)
+    return math.sqrt(np.mean(shortfall * shortfall)) if len(shortfall) else 0
+
+
+def sortino_ratio(returns, periods_per_year=365, risk_free_rate=0.0):
+    """Annualized Sortino ratio of per-period returns."""
+    returns = np.asarray(returns, dtype=np.float64)
+    if len(returns) == 0:
+        return np.nan
+    downside = downside_deviation(returns, risk_free_rate)
+    return (returns.mean() - risk_free_rate) / downside * math.sqrt(periods_per_year) if downside > 0 else 0
+
+
+def rolling_sum(values, window):
+    """Sums over each trailing window of `window` values; entries before the first full window are NaN."""
+    values = np.asarray(values, dtype=np.float64)
+    sums = np.full(len(values), np.nan)
+    if window <= len(values):
+        cumulative = np.concatenate(([0.0], np.cumsum(values)))
+        sums[window - 1:] = cumulative[window:] - cumulative[:-window]
+    return sums
+
+
+def rolling_mean_std(returns, window):
+    """Rolling mean and population standard deviation in O(n) from cumulative sums."""
+    returns = np.asarray(returns, dtype=np.float64)
+    # Centering first keeps the sum-of-squares variance from cancelling catastrophically
+    center = returns.mean() if len(returns) else 0.0
+    centered = returns - center
+    mean = rolling_sum(centered, window) / window
+    variance = np.maximum(rolling_sum(centered * centered, window) / window - mean * mean, 0)
+    return mean + center, np.sqrt(variance)
+
+
+def rolling_volatility(returns, window, periods_per_year=365):
+    """Annualized rolling standard deviation of returns."""
+    return rolling_mean_std(returns, window)[1] * math.sqrt(periods_per_year)
+
+
+def rolling_sharpe(returns, window, periods_per_year=365, risk_free_rate=0.0):
+    """Annualized Sharpe ratio over each trailing window of returns."""
+    mean, std = rolling_mean_std(returns, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(std > 0, (mean - risk_free_rate) / std, 0) * math.sqrt(periods_per_year)
+
+
+def rolling_sortino(returns, window, periods_per_year=365, risk_free_rate=0.0):
+    """Annualized Sortino ratio over each trailing window of returns."""
+    returns = np.asarray(returns, dtype=np.float64)
+    mean = rolling_sum(returns, window) / window
+    shortfall = np.minimum(returns - risk_free_rate, 0)
+    downside = np.sqrt(rolling_sum(shortfall * shortfall, window) / window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(downside > 0, (mean - risk_free_rate) / downside, 0) * math.sqrt(periods_per_year)
+
+
+def rolling_max_drawdown(capital, window):
+    """Maximum fractional drawdown within each trailing window of `window` capital values, in O(n).
+
+    Log capital drawdown max(x[a] - x[b]) over a <= b combines across adjacent segments, so
+    each window is split at a block boundary (blocks of `window` values) into a block suffix
+    and a block prefix whose aggregates are running accumulations (van Herk/Gil-Werman).
+    """
+    capital = np.asarray(capital, dtype=np.float64)
+    n = len(capital)
+    result = np.full(n, np.nan)
+    if window < 1 or window > n:
+        return result
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = np.log(np.where(capital > 0, capital, np.nan))
+    n_blocks = -(-n // window)
+    padded = np.full(n_blocks * window, x[-1])
+    padded[:n] = x
+    blocks = padded.reshape(n_blocks, window)
+
+    prefix_max = np.maximum.accumulate(blocks, axis=1)
+    prefix_min = np.minimum.accumulate(blocks, axis=1)
+    prefix_drawdown = np.maximum.accumulate(prefix_max - blocks, axis=1)
+
+    reverse = blocks[:, ::-1]
+    suffix_max = np.maximum.accumulate(reverse, axis=1)[:, ::-1]
+    suffix_min = np.minimum.accumulate(reverse, axis=1)[:, ::-1]
+    suffix_drawdown = np.maximum.accumulate(reverse - np.minimum.accumulate(reverse, axis=1), axis=1)[:, ::-1]
+
+    prefix_max, prefix_min, prefix_drawdown = prefix_max.ravel(), prefix_min.ravel(), prefix_drawdown.ravel()
+    suffix_max, suffix_drawdown = suffix_max.ravel(), suffix_drawdown.ravel()
+
+    # Window [l, r] with r = l + window - 1: a suffix of l's block and a prefix of r's block
+    left = np.arange(n - window + 1)
+    right = left + window - 1
+    spanning = np.maximum(np.maximum(suffix_drawdown[left], prefix_drawdown[right]),
+                          suffix_max[left] - prefix_min[right])
+    log_drawdown = np.where(left % window == 0, suffix_drawdown[left], spanning)
+    result[window - 1:] = 1 - np.exp(-log_drawdown)
+    return result
+
+
+def rolling_calmar(returns, window, periods_per_year=365):
+    """Annualized mean return over each trailing window divided by that window's maximum drawdown."""
+    returns = np.asarray(returns, dtype=np.float64)
+    # Capital path of the compounded returns, with its starting value, so the window of
+    # `window` returns spans `window + 1` capital values
+    capital = np.concatenate(([1.0], np.cumprod(1 + returns)))
+    drawdown = rolling_max_drawdown(capital, window + 1)[1:]
+    annual_return = rolling_sum(returns, window) / window * periods_per_year
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(drawdown > 0, annual_return / drawdown, np.nan)
+
+
+def rolling_metrics(returns, window, periods_per_year=365):
+    """Rolling volatility, Sharpe, Sortino and Calmar of per-period returns as a dict of arrays."""
+    return {
+        'volatility': rolling_volatility(returns, window, periods_per_year),
+        'sharpe': rolling_sharpe(returns, window, periods_per_year),
+        'sortino': rolling_sortino(returns, window, periods_per_year),
+        'calmar': rolling_calmar(returns, window, periods_per_year),
+    }
@@ -0,0 +1,177 @@
+import math
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from metrics import period_returns
+
+METHODS = ('shuffle', 'bootstrap', 'block')
+
+
+def resample_indices(rng, n_paths, n, method="shuffle", block_size=5):
+    """(n_paths, n) matrix of indices into a length-n sequence.
+
+    shuffle reorders the sequence, bootstrap draws with replacement and block draws
+    wrapped runs of block_size consecutive elements (moving block bootstrap), which keeps
+    short-range autocorrelation.
+    """
+    if method == "shuffle":
+        # Sorting random keys is faster than Generator.permuted() row by row
+        return np.argsort(rng.integers(0, 1 << 31, (n_paths, n), dtype=np.int32), axis=1).astype(np.int32)
+    if method == "bootstrap":
+        return rng.integers(0, n, (n_paths, n), dtype=np.int32)
+    if method == "block":
+        n_blocks = -(-n // block_size)
+        starts = rng.integers(0, n, (n_paths, n_blocks, 1), dtype=np.int32)
+        blocks = (starts + np.arange(block_size, dtype=np.int32)) % n
+        return blocks.reshape(n_paths, n_blocks * block_size)[:, :n]
+    raise ValueError(f"Unknown resampling method {method!r}, expected one of {METHODS}")
+
+
+def max_drawdowns(capital):
+    """Maximum drawdown (%) below the running peak of each row of a capital matrix."""
+    peak = np.maximum.accumulate(capital, axis=1)
+    np.divide(capital, peak, out=peak)
+    return (1 - np.min(peak, axis=1)) * 100
+
+
+def sharpe_ratios(returns, periods_per_year=365):
+    """Annualized Sharpe ratio of each row of a returns matrix (0 where the std is 0)."""
+    mean = returns.mean(axis=1)
+    std = returns.std(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(std > 0, mean / std, 0) * math.sqrt(periods_per_year)
+
+
+def trade_path_statistics(pnl, returns, initial_capital=1000, sharpe=None):
+    """Net profit, terminal capital, max drawdown and Sharpe of each row of trade pnl/return matrices.
+
+    Matches get_statistics(): capital is initial_capital plus cumulative pnl and the Sharpe
+    ratio uses per-trade returns. pnl is overwritten. If sharpe is given (reordered paths all
+    share it) returns is not used.
+    """
+    capital = np.cumsum(pnl, axis=1, out=pnl)
+    capital += initial_capital
+    return {
+        'Net Profit': capital[:, -1] - initial_capital,
+        'Terminal Capital': capital[:, -1].copy(),
+        'Maximum Drawdown(%)': max_drawdowns(capital),
+        'Sharpe Ratio': sharpe_ratios(returns) if sharpe is None else np.full(len(capital), sharpe),
+    }
+
+
+def return_path_statistics(returns, initial_capital=1000, periods_per_year=365):
+    """The same statistics for each row of a matrix of compounded period returns."""
+    capital = initial_capital * np.cumprod(1 + returns, axis=1)
+    return {
+        'Net Profit': capital[:, -1] - initial_capital,
+        'Terminal Capital': capital[:, -1],
+        'Maximum Drawdown(%)': max_drawdowns(capital),
+        'Sharpe Ratio': sharpe_ratios(returns, periods_per_year),
+    }
+
+
+def simulate_chunk(task):
+    """Worker: resample and evaluate one chunk of paths."""
+    kind, values, n_paths, method, block_size, initial_capital, periods_per_year, seed = task
+    rng = np.random.default_rng(seed)
+    indices = resample_indices(rng, n_paths, len(values[0]), method, block_size)
+    if kind == "trades":
+        pnl, returns = values
+        if method == "shuffle":
+            # Reordering leaves the per-trade return distribution, and so the Sharpe ratio, unchanged
+            return trade_path_statistics(pnl[indices], None, initial_capital, sharpe_ratios(returns[None])[0])
+        return trade_path_statistics(pnl[indices], returns[indices], initial_capital)
+    return return_path_statistics(values[0][indices], initial_capital, periods_per_year)
+
+
+def simulate(kind, values, n_paths, method, block_size, initial_capital, periods_per_year=365, seed=0,
+             max_workers=1, chunk_bytes=64 << 20):
+    """Run n_paths resampled paths in chunks of bounded memory, optionally across processes.
+
+    Every chunk gets its own child seed, so results do not depend on max_workers.
+    Returns {statistic: array of n_paths values}. Raises ValueError if there is nothing to
+    resample (no trades or returns) or n_paths < 1.
+    """
+    n = len(values[0])
+    if n == 0:
+        raise ValueError(f"No {kind} to resample")
+    if n_paths < 1:
+        raise ValueError(f"n_paths must be at least 1, got {n_paths}")
+    # About a dozen (paths x n) float64 temporaries are alive at once per chunk
+    chunk_paths = max(1, chunk_bytes // (12 * 8 * max(n, 1)))
+    sizes = [min(chunk_paths, n_paths - start) for start in range(0, n_paths, chunk_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(kind, values, size, method, block_size, initial_capital, periods_per_year, child)
+             for size, child in zip(sizes, seeds)]
+
+    if max_workers == 1:
+        results = list(map(simulate_chunk, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(simulate_chunk, tasks))
+
+    return {name: np.concatenate([result[name] for result in results]) for name in results[0]}
+
+
+def summarize(samples, observed=None, percentiles=(5, 25, 50, 75, 95)):
+    """Percentile table (one row per statistic) of simulated samples, with the observed values if given."""
+    table = pd.DataFrame({f"p{q}": [np.percentile(values, q) for values in samples.values()] for q in percentiles},
+                         index=list(samples))
+    table.insert(0, 'mean', [values.mean() for values in samples.values()])
+    if observed is not None:
+        table['observed'] = [observed[name] for name in samples]
+    return table
+
+
+def trade_monte_carlo(bt, n_paths=10_000, method="shuffle", block_size=5, seed=0, max_workers=1,
+                      percentiles=(5, 25, 50, 75, 95)):
+    """Distributions of net profit, terminal capital, max drawdown and Sharpe over resampled trade sequences.
+
+    bt is a BackTester after get_trades(). Reshuffling keeps the set of trades (so only the
+    path-dependent drawdown varies); bootstrap and block resampling also vary the trade mix.
+    Returns (samples dict, percentile table).
+    """
+    pnl = bt.trades.pnl()
+    values = (pnl, pnl / bt.trades.column('init_price'))
+    samples = simulate("trades", values, n_paths, method, block_size, bt.initial_capital, seed=seed,
+                       max_workers=max_workers)
+    observed = {name: value[0] for name, value in
+                trade_path_statistics(values[0][None].copy(), values[1][None], bt.initial_capital).items()}
+    return samples, summarize(samples, observed, percentiles)
+
+
+def return_monte_carlo(bt, n_paths=10_000, block_size=5, period="1D", periods_per_year=365, seed=0,
+                       max_workers=1, percentiles=(5, 25, 50, 75, 95)):
+    """Block-bootstrap the period returns of the calc_pnl() capital curve.
+
+    Returns (samples dict, percentile table) of net profit, terminal capital, max drawdown
+    and annualized Sharpe of the compounded resampled paths.
+    """
+    bt.calc_capital()
+    times = bt.data.index.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    returns = period_returns(times, bt.data["capital"].to_numpy(dtype=np.float64), period)
+    samples = simulate("returns", (returns,), n_paths, "block", block_size, bt.initial_capital,
+                       periods_per_year, seed, max_workers)
+    observed = {name: value[0] for name, value in
+                return_path_statistics(returns[None], bt.initial_capital, periods_per_year).items()}
+    return samples, summarize(samples, observed, percentiles)
+
+
+if __name__ == "__main__":
+    n_trades = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    n_paths = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    rng = np.random.default_rng(0)
+    pnl = rng.normal(1, 20, n_trades)
+    values = (pnl, pnl / 10_000)
+
+    for method in METHODS:
+        for workers in (1, None):
+            start = time.perf_counter()
+            samples = simulate("trades", values, n_paths, method, 5, 1000, max_workers=workers)
+            elapsed = time.perf_counter() - start
+            print(f"{method:>9} x{workers or 'all'}: {n_paths} paths of {n_trades} trades in {elapsed:.3f}s")
+    print(summarize(samples).to_string())
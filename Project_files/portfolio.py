@@ -0,0 +1,269 @@
+import argparse
+import io
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr
+
+import numpy as np
+import pandas as pd
+
+from backtester import BackTester, TradeLedger, trade_statistics
+from datastore import load_ohlcv
+from engine import run_strategy
+from equity import equity_curve
+from execution import ExecutionModel
+
+OPEN = np.iinfo(np.int64).max  # final_time of a position still open at the end of the data
+
+
+def load_signals(source):
+    """Load a signal source, running process_data() and the strategy if it has no signals column."""
+    data = load_ohlcv(source) if isinstance(source, (str, os.PathLike)) else source
+    if 'signals' not in data:
+        from main import process_data
+        data = run_strategy(process_data(pd.DataFrame(data)))
+    return data
+
+
+def symbol_trades(symbol, signal_source, master_source=None, execution=None):
+    """Worker: backtest one symbol at unit size and return its trade legs and bar timeline.
+
+    Trade timing and prices do not depend on position size, so each symbol runs on its own
+    with qty = +-1; the portfolio sizes the legs afterwards from the shared capital. Each
+    leg's 'cost_rate' is its fees and funding per unit of notional under `execution`.
+    A position still open at the end is returned as a leg with final_time OPEN.
+    """
+    bt = BackTester(symbol, signal_data_path=load_signals(signal_source), master_file_path=master_source,
+                    execution=execution)
+    with redirect_stderr(io.StringIO()):
+        bt.get_trades(1)
+
+    trades = bt.trades
+    close = bt.data["close"].to_numpy(dtype=np.float64)
+    legs = {
+        'direction': np.sign(trades.column('qty')),
+        'init_price': trades.column('init_price').copy(),
+        'final_price': trades.column('final_price').copy(),
+        'init_time': trades.column('init_time').copy(),
+        'final_time': trades.column('final_time').copy(),
+        'cost_rate': trades.column('costs').copy(),
+        'mae': bt.get_excursions()['mae'],
+    }
+    if bt.position.qty != 0:
+        open_leg = {'direction': np.sign(bt.position.qty), 'init_price': bt.position.price,
+                    'final_price': close[-1], 'init_time': pd.Timestamp(bt.position.timestamp).value,
+                    'final_time': OPEN, 'cost_rate': 0.0, 'mae': np.nan}
+        legs = {name: np.append(values, open_leg[name]) for name, values in legs.items()}
+
+    return {
+        'symbol': symbol,
+        'legs': legs,
+        'times': bt.data.index.to_numpy(dtype="datetime64[ns]").view(np.int64),
+        'close': close,
+        'benchmark_return': bt.get_benchmark_return(),
+    }
+
+
+def allocate(legs, weights, initial_capital, compound_flag):
+    """Size every leg from the shared capital and return (qty, pnl) arrays.
+
+    Each new position gets its symbol's weight times the capital: the initial capital, or
+    with compound_flag the initial capital plus the pnl of every trade closed by then
+    (exits are booked before entries at the same timestamp, as in get_trades()).
+    """
+    direction, init_price, final_price = legs['direction'], legs['init_price'], legs['final_price']
+    cost_rate = legs['cost_rate']
+    closed = legs['final_time'] != OPEN
+    weight = weights[legs['symbol']]
+
+    if not compound_flag:
+        qty = direction * (weight * initial_capital)
+        pnl = np.where(closed, qty * (final_price - init_price) / init_price - cost_rate * np.abs(qty), 0.0)
+        return qty, pnl
+
+    init_time, final_time = legs['init_time'], legs['final_time']
+    qty = np.zeros(len(direction))
+    pnl = np.zeros(len(direction))
+    exits = np.argsort(final_time, kind="stable").tolist()
+    exit_times = final_time[exits].tolist()
+    capital = initial_capital
+    booked = 0
+
+    for k in np.argsort(init_time, kind="stable").tolist():
+        entry_time = init_time[k]
+        while booked < len(exits) and exit_times[booked] <= entry_time:
+            capital = capital + pnl[exits[booked]]
+            booked += 1
+        qty[k] = direction[k] * (weight[k] * capital)
+        if closed[k]:
+            pnl[k] = qty[k] * (final_price[k] - init_price[k]) / init_price[k] - cost_rate[k] * abs(qty[k])
+
+    return qty, pnl
+
+
+class PortfolioBackTester:
+    """Backtest one strategy over a basket of symbols sharing a single capital pool.
+
+    sources maps symbol -> signal source (CSV path, columnar store, DataFrame or dict of
+    column arrays, as for BackTester); sources without a signals column are run through
+    process_data() and the strategy first. master_sources optionally maps symbol -> master
+    data. weights maps symbol -> fraction of capital per position (default equal weights).
+    execution is the ExecutionModel of every symbol (default: flat fee). Costs are scaled
+    from unit-size backtests, so models whose costs are not proportional to the position
+    size (fee_tiers, impact) raise ValueError. Per-symbol backtests run in parallel worker
+    processes.
+    """
+
+    def __init__(self, sources, master_sources=None, compound_flag=0, initial_capital=1000,
+                 weights=None, max_workers=None, execution=None):
+        self.symbols = list(sources)
+        self.sources = sources
+        self.master_sources = master_sources or {}
+        self.compound_flag = compound_flag
+        self.initial_capital = initial_capital
+        weights = weights or {symbol: 1 / len(self.symbols) for symbol in self.symbols}
+        self.weights = np.array([weights[symbol] for symbol in self.symbols], dtype=np.float64)
+        self.max_workers = max_workers
+        self.execution = execution or ExecutionModel()
+        if self.execution.fee_tiers or self.execution.impact:
+            raise ValueError("Portfolio costs scale linearly with position size; fee_tiers and impact are not supported")
+
+        self.results = None
+        self.trades = TradeLedger("PORTFOLIO")
+        self.trade_symbols = np.zeros(0, dtype=object)
+        self.symbol_trades = {}
+        self.adverse_excursions = np.zeros(0)
+        self.legs = None
+
+    def run_symbols(self):
+        masters = [self.master_sources.get(symbol) for symbol in self.symbols]
+        sources = [self.sources[symbol] for symbol in self.symbols]
+        executions = [self.execution] * len(self.symbols)
+        if self.max_workers == 1 or len(self.symbols) == 1:
+            return list(map(symbol_trades, self.symbols, sources, masters, executions))
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(symbol_trades, self.symbols, sources, masters, executions))
+
+    def get_trades(self):
+        """Run every symbol, size the trades from the shared capital and collect them in time order."""
+        self.results = self.run_symbols()
+
+        legs = {name: np.concatenate([result['legs'][name] for result in self.results])
+                for name in self.results[0]['legs']}
+        legs['symbol'] = np.concatenate([np.full(len(result['legs']['direction']), i, dtype=np.int64)
+                                         for i, result in enumerate(self.results)])
+        legs['qty'], legs['pnl'] = allocate(legs, self.weights, self.initial_capital, self.compound_flag)
+        self.legs = legs
+
+        closed = np.flatnonzero(legs['final_time'] != OPEN)
+        order = closed[np.argsort(legs['final_time'][closed], kind="stable")]
+        costs = legs['cost_rate'] * np.abs(legs['qty'])
+        self.trades = TradeLedger("PORTFOLIO", capacity=max(1, len(order)))
+        self.trades.extend(legs['qty'][order], legs['init_price'][order], legs['final_price'][order],
+                           legs['init_time'][order], legs['final_time'][order], costs[order])
+        self.trade_symbols = np.array(self.symbols, dtype=object)[legs['symbol'][order]]
+        self.adverse_excursions = legs['mae'][order]
+
+        self.symbol_trades = {}
+        for i, symbol in enumerate(self.symbols):
+            rows = order[legs['symbol'][order] == i]
+            ledger = TradeLedger(symbol, capacity=max(1, len(rows)))
+            ledger.extend(legs['qty'][rows], legs['init_price'][rows], legs['final_price'][rows],
+                          legs['init_time'][rows], legs['final_time'][rows], costs[rows])
+            self.symbol_trades[symbol] = ledger
+
+    def get_benchmark_return(self):
+        """Weighted average of the symbols' buy-and-hold returns."""
+        returns = np.array([result['benchmark_return'] for result in self.results])
+        return float(np.dot(self.weights, returns) / self.weights.sum())
+
+    def get_statistics(self):
+        """get_statistics() metrics over every trade of the portfolio, in exit-time order.
+
+        None before get_trades() or without trades, as for BackTester.
+        """
+        if self.results is None:
+            return None
+        return trade_statistics(self.trades, self.get_benchmark_return(), self.adverse_excursions,
+                                self.initial_capital)
+
+    def get_symbol_statistics(self):
+        """get_statistics() metrics of each symbol's (portfolio-sized) trades (None before get_trades())."""
+        if self.results is None:
+            return {symbol: None for symbol in self.symbols}
+        stats = {}
+        for i, (symbol, result) in enumerate(zip(self.symbols, self.results)):
+            rows = np.flatnonzero(self.trade_symbols == symbol)
+            stats[symbol] = trade_statistics(self.symbol_trades[symbol], result['benchmark_return'],
+                                             self.adverse_excursions[rows], self.initial_capital * self.weights[i])
+        return stats
+
+    def get_equity(self):
+        """Portfolio equity on the union of all symbols' bar times.
+
+        Returns a DataFrame with the per-bar mark-to-market pnl, capital, gross exposure
+        and drawdown (fraction below the running capital peak).
+        """
+        legs = self.legs
+        timeline = np.unique(np.concatenate([result['times'] for result in self.results]))
+        pnl = np.zeros(len(timeline))
+        exposure = np.zeros(len(timeline))
+
+        for i, result in enumerate(self.results):
+            rows = legs['symbol'] == i
+            qty = legs['qty'][rows]
+            fees = np.where(legs['final_time'][rows] != OPEN, legs['cost_rate'][rows] * np.abs(qty), 0.0)
+            curve = equity_curve(result['times'], result['close'], qty, legs['init_price'][rows],
+                                 legs['final_price'][rows], legs['init_time'][rows], legs['final_time'][rows],
+                                 fees, 0)
+            pnl += np.bincount(np.searchsorted(timeline, result['times']), curve['pnl'], minlength=len(timeline))
+            # Hold each symbol's exposure until its next bar
+            last_bar = np.searchsorted(result['times'], timeline, side="right") - 1
+            exposure += np.where(last_bar >= 0, curve['exposure'][np.maximum(last_bar, 0)], 0.0)
+
+        capital = self.initial_capital + np.cumsum(pnl)
+        return pd.DataFrame({
+            'pnl': pnl,
+            'capital': capital,
+            'exposure': exposure,
+            'drawdown': capital / np.maximum.accumulate(capital) - 1,
+        }, index=pd.DatetimeIndex(timeline.view("datetime64[ns]"), name="datetime"))
+
+
+def parse_pairs(values):
+    """Parse ['SYM=value', ...] into a dict."""
+    return dict(value.split('=', 1) for value in values or [])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest the strategy over several symbols with shared capital.")
+    parser.add_argument("sources", nargs="+", help="SYMBOL=path of OHLCV or signal data (CSV or columnar store)")
+    parser.add_argument("--master", action="append", help="SYMBOL=path of finer-grained master data")
+    parser.add_argument("--weight", action="append", help="SYMBOL=fraction of capital per position")
+    parser.add_argument("--initial-capital", type=float, default=1000)
+    parser.add_argument("--compound-flag", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--output", default=None, help="write the portfolio equity curve to this CSV")
+    args = parser.parse_args(argv)
+
+    weights = {symbol: float(value) for symbol, value in parse_pairs(args.weight).items()} or None
+    portfolio = PortfolioBackTester(parse_pairs(args.sources), parse_pairs(args.master), args.compound_flag,
+                                    args.initial_capital, weights, args.workers)
+    portfolio.get_trades()
+
+    for symbol, stats in portfolio.get_symbol_statistics().items():
+        print(f"{symbol}: {stats['Total Trades'] if stats else 0} trades, "
+              f"net profit {stats['Net Profit'] if stats else 0:.2f}")
+
+    print("\n--- Portfolio Statistics ---")
+    for key, val in (portfolio.get_statistics() or {}).items():
+        print(key, ":", val)
+
+    if args.output:
+        portfolio.get_equity().to_csv(args.output)
+        print(f"Equity curve written to {args.output}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
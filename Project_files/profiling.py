@@ -0,0 +1,160 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+MODES = ('time', 'cprofile', 'tracemalloc')
+
+
+class Stage:
+    """Context manager timing one entry into a named stage of a Profiler."""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.enter(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.exit()
+        return False
+
+
+class Profiler:
+    """Stage timers and counters for the pipeline, off unless enabled.
+
+    Stages nest: a stage entered inside another is reported as 'outer/inner', and repeated
+    entries accumulate calls and time. mode is a comma-separated subset of MODES ('time' is
+    implied): 'cprofile' profiles everything run inside top-level stages, 'tracemalloc'
+    records each stage's peak traced memory. While disabled, stage() returns a shared no-op
+    context and count() returns at once.
+    """
+
+    def __init__(self, mode=None):
+        self.enabled = False
+        self.modes = set()
+        self.reset()
+        if mode:
+            self.enable(mode)
+
+    def reset(self):
+        self.stages = {}
+        self.counters = {}
+        self.stack = []
+        self.profile = None
+
+    def enable(self, mode="time"):
+        modes = {name.strip() for name in str(mode).split(',') if name.strip()} - {'1', 'on', 'true'}
+        unknown = modes - set(MODES)
+        if unknown:
+            raise ValueError(f"Unknown profiling mode {sorted(unknown)}, expected a subset of {MODES}")
+        self.modes = modes | {'time'}
+        self.enabled = True
+        if 'cprofile' in self.modes and self.profile is None:
+            self.profile = cProfile.Profile()
+        if 'tracemalloc' in self.modes and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        self.enabled = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def stage(self, name):
+        return Stage(self, name) if self.enabled else nullcontext()
+
+    def timed(self, name=None):
+        """Decorator running the function as a stage (named after the function by default)."""
+        def decorate(function):
+            stage_name = name or function.__name__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with Stage(self, stage_name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def count(self, name, n=1):
+        """Add n to a counter; hot loops should count locally and add the total once."""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def enter(self, name):
+        path = f"{self.stack[-1]['path']}/{name}" if self.stack else name
+        # Created on entry so the report lists stages in the order they started
+        self.stages.setdefault(path, {'calls': 0, 'seconds': 0.0})
+        tracing = 'tracemalloc' in self.modes and tracemalloc.is_tracing()
+        if tracing:
+            # The inner stage resets the peak, so fold it into the enclosing stage first
+            if self.stack:
+                self.stack[-1]['peak'] = max(self.stack[-1]['peak'], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        if not self.stack and self.profile is not None:
+            self.profile.enable()
+        self.stack.append({'path': path, 'peak': 0, 'start': time.perf_counter()})
+
+    def exit(self):
+        frame = self.stack.pop()
+        seconds = time.perf_counter() - frame['start']
+        if not self.stack and self.profile is not None:
+            self.profile.disable()
+
+        stats = self.stages[frame['path']]
+        stats['calls'] += 1
+        stats['seconds'] += seconds
+        if 'tracemalloc' in self.modes and tracemalloc.is_tracing():
+            peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+            stats['peak_mb'] = max(stats.get('peak_mb', 0.0), peak / 2**20)
+            if self.stack:
+                self.stack[-1]['peak'] = max(self.stack[-1]['peak'], peak)
+
+    def profile_rows(self, limit=25):
+        """Top functions of the cProfile capture by cumulative time."""
+        if self.profile is None:
+            return []
+        self.profile.create_stats()
+        if not self.profile.stats:
+            return []
+        stats = pstats.Stats(self.profile, stream=io.StringIO())
+        rows = [{'function': f"{filename}:{line}({function})", 'calls': calls, 'total_s': total,
+                 'cumulative_s': cumulative}
+                for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items()]
+        return sorted(rows, key=lambda row: row['cumulative_s'], reverse=True)[:limit]
+
+    def report(self):
+        return {
+            'modes': sorted(self.modes),
+            'stages': [{'stage': path, **stats} for path, stats in self.stages.items()],
+            'counters': dict(self.counters),
+            'profile': self.profile_rows(),
+        }
+
+    def summary(self):
+        """Plain-text table of stages (in first-entry order) and counters."""
+        lines = [f"{'stage':<40} {'calls':>6} {'seconds':>10} {'peak MB':>9}"]
+        for path, stats in self.stages.items():
+            depth = path.count('/')
+            peak = f"{stats['peak_mb']:.1f}" if 'peak_mb' in stats else "-"
+            lines.append(f"{'  ' * depth + path.rsplit('/', 1)[-1]:<40} {stats['calls']:>6} "
+                         f"{stats['seconds']:>10.4f} {peak:>9}")
+        for name, value in self.counters.items():
+            lines.append(f"{name:<40} {value:>6}")
+        return "\n".join(lines)
+
+    def write_report(self, path):
+        with open(path, "w") as output:
+            json.dump(self.report(), output, indent=2)
+
+
+# Shared profiler used by main() and the backtester; set BACKTEST_PROFILE=time[,cprofile][,tracemalloc]
+profiler = Profiler(os.environ.get("BACKTEST_PROFILE"))
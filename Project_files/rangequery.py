@@ -0,0 +1,72 @@
+import numpy as np
+
+IDENTITY = {np.minimum: np.inf, np.maximum: -np.inf}
+
+
+class SparseTable:
+    """Range min or max over a fixed array with O(1) vectorized queries.
+
+    Values are split into blocks of block_size. A sparse table over the block reductions
+    answers whole-block spans and per-block prefix/suffix accumulations cover the partial
+    blocks at either end, so memory is about 3n plus (n / block_size) * log2(n) values
+    instead of the n * log2(n) of a plain sparse table. Ranges inside a single block are
+    reduced directly over at most block_size values.
+    """
+
+    def __init__(self, values, ufunc=np.minimum, block_size=32, chunksize=1 << 18):
+        self.ufunc = ufunc
+        self.identity = IDENTITY[ufunc]
+        self.block_size = block_size
+        self.chunksize = chunksize
+        self.n = len(values)
+
+        n_blocks = max(1, -(-self.n // block_size))
+        padded = np.full(n_blocks * block_size, self.identity)
+        padded[:self.n] = values
+        blocks = padded.reshape(n_blocks, block_size)
+
+        self.values = padded
+        self.prefix = ufunc.accumulate(blocks, axis=1).ravel()
+        self.suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+
+        # table[k, i] reduces blocks i .. i + 2**k - 1
+        n_levels = max(1, int(n_blocks).bit_length())
+        self.table = np.full((n_levels, n_blocks), self.identity)
+        self.table[0] = self.prefix[block_size - 1::block_size]
+        for k in range(1, n_levels):
+            width = 1 << (k - 1)
+            ufunc(self.table[k - 1, :-width], self.table[k - 1, width:], out=self.table[k, :n_blocks - width])
+
+    def query(self, start, end):
+        """Reduce values[start:end] for each pair of bounds; empty ranges give the identity."""
+        start = np.asarray(start, dtype=np.int64)
+        end = np.minimum(np.asarray(end, dtype=np.int64), self.n)
+        result = np.full(start.shape, self.identity)
+
+        last = end - 1
+        first_block = start // self.block_size
+        last_block = last // self.block_size
+        nonempty = end > start
+
+        apart = np.flatnonzero(nonempty & (first_block != last_block))
+        if len(apart):
+            lo = first_block[apart] + 1
+            hi = last_block[apart]
+            value = self.ufunc(self.suffix[start[apart]], self.prefix[last[apart]])
+            inner = hi > lo
+            span = np.where(inner, hi - lo, 1)
+            level = np.frexp(span)[1].astype(np.int64) - 1
+            whole = self.ufunc(self.table[level, np.where(inner, lo, 0)],
+                               self.table[level, np.where(inner, hi - (1 << level), 0)])
+            result[apart] = np.where(inner, self.ufunc(value, whole), value)
+
+        same = np.flatnonzero(nonempty & (first_block == last_block))
+        offsets = np.arange(self.block_size)
+        for chunk in range(0, len(same), self.chunksize):
+            rows = same[chunk:chunk + self.chunksize]
+            positions = start[rows, None] + offsets
+            inside = positions <= last[rows, None]
+            values = self.values[np.minimum(positions, len(self.values) - 1)]
+            result[rows] = self.ufunc.reduce(np.where(inside, values, self.identity), axis=1)
+
+        return result
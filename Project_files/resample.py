@@ -0,0 +1,199 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from datastore import drop_unnamed, is_store, load_columns, read_meta, write_store
+
+BAR_COLUMNS = ('datetime', 'open', 'high', 'low', 'close', 'volume', 'source_start', 'source_end')
+
+
+def iter_chunks(source, chunksize=1_000_000):
+    """Yield {column: array} chunks of a CSV path, columnar store, DataFrame or dict of columns.
+
+    Datetimes are returned as int64 nanoseconds. CSVs are read chunkwise and each chunk of a
+    store is copied out of a fresh memory map, so only one chunk of the source is in memory
+    (or mapped) at a time.
+    """
+    if isinstance(source, (str, os.PathLike)) and not is_store(source):
+        for chunk in pd.read_csv(source, chunksize=chunksize):
+            chunk = drop_unnamed(chunk)
+            columns = {name: chunk[name].to_numpy() for name in chunk.columns}
+            columns['datetime'] = pd.to_datetime(chunk['datetime']).to_numpy(dtype="datetime64[ns]").view(np.int64)
+            yield columns
+        return
+
+    if isinstance(source, (str, os.PathLike)):
+        for lo in range(0, read_meta(source)['rows'], chunksize):
+            mapped = load_columns(source, rows=(lo, lo + chunksize))
+            columns = {name: np.array(values) for name, values in mapped.items()}
+            columns['datetime'] = columns['datetime'].astype("datetime64[ns]").view(np.int64)
+            yield columns
+        return
+
+    if isinstance(source, pd.DataFrame):
+        columns = {name: source[name].to_numpy() for name in source.columns}
+        if 'datetime' not in columns:
+            columns['datetime'] = source.index.to_numpy()
+    else:
+        columns = dict(source)
+    times = np.asarray(columns['datetime'])
+    if not np.issubdtype(times.dtype, np.datetime64):
+        times = pd.to_datetime(times).to_numpy()
+    columns['datetime'] = times.astype("datetime64[ns]").view(np.int64)
+
+    n = len(columns['datetime'])
+    for lo in range(0, n, chunksize):
+        yield {name: values[lo:lo + chunksize] for name, values in columns.items()}
+
+
+def price_columns(chunk):
+    """(open, high, low, close, volume) arrays of an OHLCV chunk or of trade-level rows (price plus size)."""
+    if 'open' in chunk:
+        volume = chunk['volume'] if 'volume' in chunk else np.zeros(len(chunk['close']))
+        return chunk['open'], chunk['high'], chunk['low'], chunk['close'], volume
+    price = chunk['price']
+    size = next((chunk[name] for name in ('volume', 'qty', 'size', 'amount') if name in chunk), None)
+    return price, price, price, price, np.abs(size) if size is not None else np.zeros(len(price))
+
+
+class Resampler:
+    """Streaming OHLCV aggregation into bars of one frequency.
+
+    Bars cover [datetime, datetime + freq) aligned to multiples of freq since the Unix epoch
+    (pandas resample(origin="epoch")); bins without source rows are skipped. The last bar of
+    each chunk is held back until a later row (or flush()) shows it is complete, so chunks
+    may split bars anywhere. source_start/source_end are the bar's half-open row range in
+    the source.
+    """
+
+    def __init__(self, freq):
+        self.freq_name = freq
+        self.freq = pd.to_timedelta(freq).value
+        self.pending = None
+        self.last_time = None
+
+    def update(self, times, open_, high, low, close, volume, offset):
+        """Add source rows starting at global row offset and return the bars they complete."""
+        n = len(times)
+        if n == 0:
+            return None
+        if (self.last_time is not None and times[0] < self.last_time) or np.any(times[1:] < times[:-1]):
+            raise ValueError("Source rows must be sorted by datetime")
+        self.last_time = times[-1]
+
+        bins = times // self.freq
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+        ends = np.r_[starts[1:], n]
+        bars = {
+            'datetime': bins[starts] * self.freq,
+            'open': open_[starts].astype(np.float64),
+            'high': np.maximum.reduceat(high, starts).astype(np.float64),
+            'low': np.minimum.reduceat(low, starts).astype(np.float64),
+            'close': close[ends - 1].astype(np.float64),
+            'volume': np.add.reduceat(volume, starts).astype(np.float64),
+            'source_start': starts + offset,
+            'source_end': ends + offset,
+        }
+
+        pending = self.pending
+        completed = None
+        if pending is not None:
+            if pending['datetime'] == bars['datetime'][0]:
+                # The held-back bar continues into this chunk
+                bars['open'][0] = pending['open']
+                bars['high'][0] = max(pending['high'], bars['high'][0])
+                bars['low'][0] = min(pending['low'], bars['low'][0])
+                bars['volume'][0] += pending['volume']
+                bars['source_start'][0] = pending['source_start']
+            else:
+                completed = {name: np.array([value]) for name, value in pending.items()}
+
+        self.pending = {name: values[-1] for name, values in bars.items()}
+        bars = {name: values[:-1] for name, values in bars.items()}
+        if completed is not None:
+            bars = {name: np.concatenate((completed[name], bars[name])) for name in bars}
+        return bars
+
+    def flush(self):
+        """Return the held-back last bar, if any."""
+        pending, self.pending = self.pending, None
+        return None if pending is None else {name: np.array([value]) for name, value in pending.items()}
+
+
+def bars_frame(parts):
+    """DataFrame of resampled bars from a list of Resampler outputs."""
+    parts = [part for part in parts if part is not None and len(part['datetime'])]
+    if not parts:
+        return pd.DataFrame({name: pd.Series(dtype="datetime64[ns]" if name == 'datetime' else np.float64)
+                             for name in BAR_COLUMNS})
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in BAR_COLUMNS}
+    columns['datetime'] = columns['datetime'].view("datetime64[ns]")
+    return pd.DataFrame(columns, copy=False)
+
+
+def resample_many(source, freqs, chunksize=1_000_000):
+    """Resample a source into several bar sizes in a single streaming pass.
+
+    source is a CSV path, columnar store, DataFrame or dict of columns holding OHLCV bars or
+    trade-level rows (price plus volume/qty/size/amount), sorted by datetime. Returns
+    {freq: DataFrame} with OHLCV plus the source_start/source_end row range of every bar.
+    """
+    resamplers = {freq: Resampler(freq) for freq in freqs}
+    parts = {freq: [] for freq in freqs}
+    offset = 0
+    for chunk in iter_chunks(source, chunksize):
+        times = chunk['datetime']
+        prices = price_columns(chunk)
+        for freq, resampler in resamplers.items():
+            parts[freq].append(resampler.update(times, *prices, offset))
+        offset += len(times)
+    for freq, resampler in resamplers.items():
+        parts[freq].append(resampler.flush())
+    return {freq: bars_frame(parts[freq]) for freq in freqs}
+
+
+def resample(source, freq, chunksize=1_000_000):
+    """Resample a source into bars of one size (see resample_many())."""
+    return resample_many(source, [freq], chunksize)[freq]
+
+
+def align_higher_timeframe(times, bar_duration, htf_times, htf_freq, values):
+    """Values of higher-timeframe bars as known at the close of each lower-timeframe bar.
+
+    A bar starting at t closes at t + bar_duration and may only use higher-timeframe bars
+    that closed by then (start + htf_freq <= t + bar_duration), so a daily value reaches
+    hourly bars from the last hour of its day on and never earlier. NaN before the first
+    completed higher-timeframe bar.
+    """
+    times = np.asarray(times).astype("datetime64[ns]").view(np.int64)
+    htf_end = np.asarray(htf_times).astype("datetime64[ns]").view(np.int64) + pd.to_timedelta(htf_freq).value
+    latest = np.searchsorted(htf_end, times + pd.to_timedelta(bar_duration).value, side="right") - 1
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(latest >= 0, values[np.maximum(latest, 0)], np.nan)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resample 1-minute or trade-level data into larger bars.")
+    parser.add_argument("source", help="CSV file or columnar store sorted by datetime")
+    parser.add_argument("--freq", nargs="+", default=["5min", "1h", "4h", "1D"], help="bar sizes to build")
+    parser.add_argument("--output-dir", default=".", help="directory for the resampled files")
+    parser.add_argument("--format", choices=("csv", "store"), default="csv")
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    name = os.path.splitext(os.path.basename(os.path.normpath(args.source)))[0]
+    for freq, bars in resample_many(args.source, args.freq, args.chunksize).items():
+        path = os.path.join(args.output_dir, f"{name}_{freq}")
+        if args.format == "csv":
+            path += ".csv"
+            bars.to_csv(path, index=False)
+        else:
+            write_store(bars, path)
+        print(f"{freq}: {len(bars)} bars written to {path}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
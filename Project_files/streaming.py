@@ -0,0 +1,407 @@
+import math
+import sys
+from collections import deque
+from itertools import chain, islice
+
+import numpy as np
+import pandas as pd
+
+from backtester import TRADE_PERIODS_PER_YEAR, Position, TradeType, infer_bar_duration, sign, trade_returns
+from engine import (CONDITION_COLUMNS, DEFAULT_PARAMS, REQUIRED_COLUMNS, START_INDEX,
+                    STATE_MACHINE_CONDITIONS, TRADE_TYPES, evaluate_conditions, run_state_machine)
+from execution import ExecutionModel
+from incremental import IncrementalIndicators
+
+# Bars buffered by run_stream() to infer the bar duration
+BAR_DURATION_SAMPLE = 100
+
+
+class StreamingStrategy:
+    """Bar-at-a-time version of strat() holding position, entry_price and trailing_stop as state.
+
+    on_bar() takes a mapping with 'close', 'volume' and the process_data() indicator columns
+    and returns (signal, trade_type) for that bar, identical to what strat() writes for it.
+    The rules are engine.evaluate_conditions() and engine.run_state_machine() applied to one bar.
+    """
+
+    def __init__(self, start_index=START_INDEX, **params):
+        self.params = {**DEFAULT_PARAMS, **params}
+        self.condition_params = {name: value for name, value in self.params.items()
+                                 if name not in ('trailing_stop_multiplier', 'take_profit')}
+        self.start_index = start_index
+        self.index = 0
+        self.state = {'position': 0, 'trailing_stop': 0, 'entry_price': 0}
+
+        self.prev_sma_50 = np.float64(np.nan)
+        self.prev_sma_200 = np.float64(np.nan)
+
+    @property
+    def position(self):
+        return self.state['position']
+
+    def on_bar(self, bar):
+        i = self.index
+        self.index += 1
+
+        values = {name: np.float64(bar[name]) for name in CONDITION_COLUMNS}
+        prev_sma_50, prev_sma_200 = self.prev_sma_50, self.prev_sma_200
+        self.prev_sma_50, self.prev_sma_200 = values['SMA_50'], values['SMA_200']
+
+        if i < self.start_index or any(math.isnan(bar[name]) for name in REQUIRED_COLUMNS):
+            return 0, "HOLD"
+
+        conditions = evaluate_conditions(values, prev_sma_50, prev_sma_200, True, **self.condition_params)
+        signals, trade_codes = run_state_machine(
+            np.array([values['close']]), np.array([bar['ATR']], dtype=np.float64),
+            {name: np.array([conditions[name]]) for name in STATE_MACHINE_CONDITIONS}, 0,
+            trailing_stop_multiplier=self.params['trailing_stop_multiplier'],
+            take_profit=self.params['take_profit'], state=self.state)
+        return int(signals[0]), TRADE_TYPES[trade_codes[0]]
+
+
+class RunningStatistics:
+    """get_statistics() metrics maintained in O(1) memory as trades close."""
+
+    def __init__(self, initial_capital=1000):
+        self.initial_capital = initial_capital
+        self.total_trades = 0
+        self.winning_trades = 0
+        self.long_trades = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.transaction_costs = 0.0
+        self.largest_win = 0
+        self.largest_loss = 0
+
+        self.win_streak = self.loss_streak = 0
+        self.max_win_streak = self.max_loss_streak = 0
+
+        self.max_holding_time = None
+        self.total_holding_time = pd.Timedelta(0)
+
+        self.cum_pnl = 0.0
+        self.peak_capital = -math.inf
+        self.max_drawdown = 0.0
+        self.total_drawdown = 0.0
+
+        # Welford accumulators for the Sharpe ratio of per-trade returns
+        self.return_mean = 0.0
+        self.return_m2 = 0.0
+        # Sortino ratio accumulator of the same per-trade returns
+        self.shortfall_sq_sum = 0.0
+
+        self.max_adverse_excursion = 0.0
+        self.total_adverse_excursion = 0.0
+
+        self.first_close = None
+        self.last_close = None
+
+    def update(self, trade, low=None, high=None):
+        """Add a closed trade; low/high are the extremes of the bars it was held over, if known."""
+        pnl = trade.pnl()
+        self.total_trades += 1
+        self.transaction_costs += trade.costs
+        if trade.trade_type() == TradeType.LONG:
+            self.long_trades += 1
+
+        if pnl > 0:
+            self.winning_trades += 1
+            self.gross_profit += pnl
+            self.largest_win = max(self.largest_win, pnl)
+            self.win_streak += 1
+            self.loss_streak = 0
+            self.max_win_streak = max(self.max_win_streak, self.win_streak)
+        else:
+            self.gross_loss += pnl
+            self.largest_loss = min(self.largest_loss, pnl)
+            self.loss_streak += 1
+            self.win_streak = 0
+            self.max_loss_streak = max(self.max_loss_streak, self.loss_streak)
+
+        holding_time = trade.holding_time()
+        self.total_holding_time += holding_time
+        if self.max_holding_time is None or holding_time > self.max_holding_time:
+            self.max_holding_time = holding_time
+
+        self.cum_pnl += pnl
+        capital = self.initial_capital + self.cum_pnl
+        self.peak_capital = max(self.peak_capital, capital)
+        drawdown = (capital - self.peak_capital) / self.peak_capital
+        self.max_drawdown = min(self.max_drawdown, drawdown)
+        self.total_drawdown += drawdown
+
+        trade_return = trade_returns(pnl, trade.init_price)
+        delta = trade_return - self.return_mean
+        self.return_mean += delta / self.total_trades
+        self.return_m2 += delta * (trade_return - self.return_mean)
+        self.shortfall_sq_sum += min(trade_return, 0) ** 2
+
+        low = min(trade.init_price, trade.final_price, low if low is not None else math.inf)
+        high = max(trade.init_price, trade.final_price, high if high is not None else -math.inf)
+        adverse = (trade.init_price - low if trade.qty > 0 else high - trade.init_price) / trade.init_price
+        self.max_adverse_excursion = max(self.max_adverse_excursion, adverse)
+        self.total_adverse_excursion += adverse
+
+    def observe_close(self, close):
+        if self.first_close is None:
+            self.first_close = close
+        self.last_close = close
+
+    def statistics(self):
+        """Return the same keys as BackTester.get_statistics(), or None before the first trade."""
+        n = self.total_trades
+        if n == 0:
+            return None
+        losing_trades = n - self.winning_trades
+        net_profit = self.gross_profit + self.gross_loss
+        benchmark_return = ((self.last_close - self.first_close) / self.first_close
+                            if self.first_close else 0)
+        return_std = math.sqrt(self.return_m2 / n)
+        annualisation = math.sqrt(TRADE_PERIODS_PER_YEAR)
+        sharpe_ratio = self.return_mean * annualisation / return_std if return_std > 0 else 0
+        downside = math.sqrt(self.shortfall_sq_sum / n)
+        sortino_ratio = self.return_mean * annualisation / downside if downside > 0 else 0
+
+        return {
+            'Total Trades': n,
+            'Leverage Applied': 1,
+            'Winning Trades': self.winning_trades,
+            'Losing Trades': losing_trades,
+            'No. of Long Trades': self.long_trades,
+            'No. of Short Trades': n - self.long_trades,
+            'Benchmark Return(%)': benchmark_return * 100,
+            'Benchmark Return(on $1000)': benchmark_return * 1000,
+            'Win Rate': self.winning_trades / n * 100,
+            'Winning Streak': self.max_win_streak,
+            'Losing Streak': self.max_loss_streak,
+            'Gross Profit': net_profit + self.transaction_costs,
+            'Net Profit': net_profit,
+            'Average Profit': net_profit / n,
+            'Maximum Drawdown(%)': abs(self.max_drawdown) * 100,
+            'Average Drawdown(%)': abs(self.total_drawdown / n) * 100,
+            'Largest Win': self.largest_win,
+            'Average Win': self.gross_profit / self.winning_trades if self.winning_trades else 0,
+            'Largest Loss': self.largest_loss,
+            'Average Loss': self.gross_loss / losing_trades if losing_trades else 0,
+            'Maximum Holding Time': self.max_holding_time,
+            'Average Holding Time': self.total_holding_time / n,
+            'Maximum Adverse Excursion': self.max_adverse_excursion * 100,
+            'Average Adverse Excursion': self.total_adverse_excursion / n * 100,
+            'Sharpe Ratio': sharpe_ratio,
+            'Sortino Ratio': sortino_ratio,
+        }
+
+
+class StreamingBackTester:
+    """Incremental BackTester: processes one signal bar at a time and closes trades as they happen.
+
+    Each bar doubles as its own master data, so TP/SL are checked against the bar's high/low.
+    execution is the ExecutionModel for fees, slippage, funding and fill delay (default: flat
+    fee); with a fill delay each bar is processed once the bar that fills it has arrived, so
+    up to fill_delay bars are buffered until finish().
+    Only the running statistics are kept unless keep_trades is set.
+    """
+
+    def __init__(self, symbol, trade_amt, compound_flag=0, keep_trades=False, initial_capital=1000,
+                 execution=None):
+        self.symbol = symbol
+        self.trade_amt = trade_amt
+        self.compound_flag = compound_flag
+        self.execution = execution or ExecutionModel()
+        self.position = Position(symbol, 0, None, None)
+        self.entry_costs = 0.0
+        self.stats = RunningStatistics(initial_capital)
+        self.trades = [] if keep_trades else None
+
+        self.tp = 0
+        self.sl = 0
+
+        # Bars waiting for their fill bar, the number of bars processed and the bar that
+        # filled the open position (TP/SL only applies after it)
+        self.pending = deque()
+        self.index = 0
+        self.fill_bar = -1
+
+        # Low/high of the bars the open position has been held over
+        self.held_low = math.inf
+        self.held_high = -math.inf
+
+    def record(self, trade):
+        # With a fill delay the exit fills on a buffered bar; the position was held over the
+        # buffered bars from its entry fill to its exit fill too
+        for timestamp, _, _, _, high, low, *_ in self.pending:
+            if trade.init_timestamp <= timestamp < trade.final_timestamp:
+                self.held_low = min(self.held_low, low)
+                self.held_high = max(self.held_high, high)
+        self.stats.update(trade, self.held_low, self.held_high)
+        self.held_low = math.inf
+        self.held_high = -math.inf
+        if self.trades is not None:
+            self.trades.append(trade)
+        self.trade_amt = (self.trade_amt + trade.pnl()) if self.compound_flag else self.trade_amt
+
+    def check_tp_sl(self, high, low, closing_time, dollar_volume=0.0):
+        """Close the open position if this bar's range hits TP (checked first, a maker fill) or SL."""
+        if self.position.qty == 0 or (self.tp == 0 and self.sl == 0):
+            return None
+
+        side = "long" if self.position.qty > 0 else "short"
+        if self.position.qty > 0:
+            tp_hit = high >= self.tp and self.tp != 0
+            sl_hit = low <= self.sl and self.sl != 0
+        else:
+            tp_hit = low <= self.tp and self.tp != 0
+            sl_hit = high >= self.sl and self.sl != 0
+
+        if tp_hit:
+            print(f"Triggered TP for {side}", file = sys.stderr)
+            return self.execution.close(self.position, self.tp, closing_time, self.entry_costs, maker=True)
+        if sl_hit:
+            print(f"Triggered SL for {side}", file = sys.stderr)
+            return self.execution.close(self.position, self.sl, closing_time, self.entry_costs, dollar_volume)
+        return None
+
+    def on_bar(self, timestamp, closing_time, signal, close, high, low, tp=0, sl=0, volume=0.0):
+        """Process one bar the way BackTester.get_trades() does and return the trades it closed.
+
+        With a fill delay this processes the bar fill_delay bars back, filled at this bar's close.
+        """
+        self.stats.observe_close(close)
+        self.pending.append((timestamp, closing_time, signal, close, high, low, tp, sl, volume))
+        if len(self.pending) <= self.execution.fill_delay:
+            return []
+        bar = self.pending.popleft()
+        return self.process(bar, self.pending[-1] if self.pending else bar)
+
+    def finish(self):
+        """Process the bars still waiting for a delayed fill, filled at the last bar's close as in get_trades()."""
+        trades = []
+        last = self.pending[-1] if self.pending else None
+        while self.pending:
+            trades += self.process(self.pending.popleft(), last)
+        return trades
+
+    def process(self, bar, fill):
+        """Run one bar's TP/SL check and signal, filling at the close of the `fill` bar."""
+        timestamp, closing_time, signal, close, high, low, tp, sl, volume = bar
+        i = self.index
+        self.index += 1
+        if self.position.qty != 0 and i > self.fill_bar:
+            self.held_low = min(self.held_low, low)
+            self.held_high = max(self.held_high, high)
+
+        if not self.position.is_valid(signal):
+            raise ValueError(f"Invalid signal {signal} for current position {sign(self.position.qty)} at {timestamp}")
+
+        if i > self.fill_bar:
+            trade = self.check_tp_sl(high, low, closing_time, volume * close)
+            if trade:
+                self.record(trade)
+                return [trade]
+
+        self.tp = tp if tp != 0 else self.tp
+        self.sl = sl if sl != 0 else self.sl
+        if tp == 0 and sl == 0:
+            self.tp = self.sl = 0
+
+        if signal == 0:
+            return []
+
+        _, fill_time, _, fill_close, _, _, _, _, fill_volume = fill
+        dollar_volume = fill_close * fill_volume if self.execution.impact else 0.0
+        model = self.execution
+        if signal == 1 or signal == -1:
+            if self.position.qty == 0:
+                self.entry_costs = model.open(self.position, fill_close, sign(signal)*self.trade_amt, fill_time,
+                                              dollar_volume)
+                self.fill_bar = i + len(self.pending)
+                return []
+            trade = model.close(self.position, fill_close, fill_time, self.entry_costs, dollar_volume)
+            self.record(trade)
+            return [trade]
+        if signal == 2 or signal == -2:
+            trade = model.close(self.position, fill_close, fill_time, self.entry_costs, dollar_volume)
+            self.record(trade)
+            self.entry_costs = model.open(self.position, fill_close, sign(signal)*self.trade_amt, fill_time,
+                                          dollar_volume)
+            self.fill_bar = i + len(self.pending)
+            return [trade]
+        raise ValueError(f"Invalid signal {signal} at {timestamp}")
+
+    def get_statistics(self):
+        return self.stats.statistics()
+
+
+def read_bars(file_path, chunksize=100_000):
+    """Yield OHLCV bars from a CSV as dicts, reading at most `chunksize` rows at a time."""
+    for chunk in pd.read_csv(file_path, chunksize=chunksize):
+        chunk['datetime'] = pd.to_datetime(chunk['datetime'])
+        columns = ['datetime', 'open', 'high', 'low', 'close', 'volume']
+        for values in zip(*(chunk[name].tolist() for name in columns)):
+            yield dict(zip(columns, values))
+
+
+def simulated_feed(n_bars, seed=0, start="2019-01-01", freq="1min", price=10000.0, chunksize=100_000):
+    """Yield a random-walk OHLCV feed bar by bar, generating it in fixed-size chunks."""
+    rng = np.random.default_rng(seed)
+    step = pd.Timedelta(freq)
+    timestamp = pd.Timestamp(start)
+
+    for offset in range(0, n_bars, chunksize):
+        n = min(chunksize, n_bars - offset)
+        close = price * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+        open_ = np.concatenate(([price], close[:-1]))
+        spread = np.abs(rng.normal(0, 0.005, n)) * close
+        high = np.maximum(open_, close) + spread
+        low = np.minimum(open_, close) - spread
+        volume = rng.lognormal(8, 0.5, n)
+        price = close[-1]
+
+        for values in zip(open_.tolist(), high.tolist(), low.tolist(), close.tolist(), volume.tolist()):
+            yield dict(zip(['datetime', 'open', 'high', 'low', 'close', 'volume'], (timestamp,) + values))
+            timestamp += step
+
+
+def stream_signals(bars, **params):
+    """Attach incremental indicators and the strategy signal to each bar of a bar iterator."""
+    indicators = IncrementalIndicators()
+    strategy = StreamingStrategy(**params)
+    for bar in bars:
+        bar.update(indicators.update_bar(bar))
+        bar['signals'], bar['trade_type'] = strategy.on_bar(bar)
+        yield bar
+
+
+def run_stream(bars, symbol="BTC", trade_amt=1000, compound_flag=0, bar_duration=None,
+               keep_trades=False, execution=None, **params):
+    """Run indicators, strategy and backtest over a bar iterator with bounded memory.
+
+    bar_duration defaults to infer_bar_duration() over the first BAR_DURATION_SAMPLE bars, so a
+    gap at the start of the feed does not set it, as in the batch BackTester.
+    Returns the StreamingBackTester with its running statistics (and trades if kept).
+    """
+    bars = iter(bars)
+    if bar_duration is None:
+        first = list(islice(bars, BAR_DURATION_SAMPLE))
+        bar_duration = infer_bar_duration(pd.Series([bar['datetime'] for bar in first]))
+        bars = chain(first, bars)
+
+    bt = StreamingBackTester(symbol, trade_amt, compound_flag, keep_trades, execution=execution)
+    for bar in stream_signals(bars, **params):
+        timestamp = bar['datetime']
+        bt.on_bar(timestamp, timestamp + bar_duration, bar['signals'], bar['close'], bar['high'], bar['low'],
+                  bar.get('TP', 0), bar.get('SL', 0), bar.get('volume', 0.0))
+    bt.finish()
+    return bt
+
+
+if __name__ == "__main__":
+    import time
+
+    n_bars = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    start = time.perf_counter()
+    bt = run_stream(simulated_feed(n_bars), compound_flag=1)
+    elapsed = time.perf_counter() - start
+    print(f"Streamed {n_bars} bars in {elapsed:.2f}s ({elapsed / n_bars * 1e6:.1f} us/bar)")
+    for key, val in (bt.get_statistics() or {}).items():
+        print(key, ":", val)
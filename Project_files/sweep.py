@@ -0,0 +1,170 @@
+import argparse
+import io
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtester import BackTester
+from datastore import load_ohlcv
+from engine import DEFAULT_PARAMS, generate_signals
+from variants import backtest_variants
+
+# Columns the strategy and BackTester read, shared with workers as one float64 block
+SHARED_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'ATR', 'SMA_20', 'SMA_50', 'SMA_200',
+                  'RSI', 'MACD', 'MACD_signal', 'Volume_SMA', 'BB_upper', 'BB_middle', 'BB_lower']
+
+# Worker-side view of the shared indicator block, set by attach_shared()
+shared = {}
+
+
+def share_columns(data):
+    """Copy indicator columns and datetimes into a new shared memory block.
+
+    Returns the SharedMemory object (the caller must close and unlink it) and the
+    layout (name, rows, columns) workers need to attach.
+    """
+    columns = SHARED_COLUMNS + ['datetime']
+    shm = shared_memory.SharedMemory(create=True, size=8 * len(columns) * len(data))
+    block = np.ndarray((len(columns), len(data)), dtype=np.float64, buffer=shm.buf)
+
+    for row, name in enumerate(SHARED_COLUMNS):
+        block[row] = data[name].to_numpy(dtype=np.float64)
+    # Datetimes are stored as int64 nanoseconds in the float64 block's last row
+    block[-1].view(np.int64)[:] = pd.to_datetime(data['datetime']).to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+    return shm, (shm.name, len(columns), len(data))
+
+
+def attach_shared(layout, symbol, trade_amt, compound_flag, execution=None):
+    """Process pool initializer: map the shared block into this worker."""
+    name, n_columns, n_rows = layout
+    shm = shared_memory.SharedMemory(name=name)
+    block = np.ndarray((n_columns, n_rows), dtype=np.float64, buffer=shm.buf)
+
+    shared['shm'] = shm
+    shared['columns'] = {name: block[row] for row, name in enumerate(SHARED_COLUMNS)}
+    shared['datetime'] = block[-1].view(np.int64).view("datetime64[ns]")
+    shared['config'] = (symbol, trade_amt, compound_flag, execution)
+
+
+def run_combination(params):
+    """Run strategy and backtest for one parameter combination using the shared columns."""
+    columns = shared['columns']
+    symbol, trade_amt, compound_flag, execution = shared['config']
+
+    signals, _ = generate_signals(columns, **params)
+    bars = {
+        'datetime': shared['datetime'],
+        'open': columns['open'],
+        'high': columns['high'],
+        'low': columns['low'],
+        'close': columns['close'],
+        'volume': columns['volume'],
+        'signals': signals,
+    }
+
+    bt = BackTester(symbol, signal_data_path=bars, compound_flag=compound_flag, execution=execution)
+    with redirect_stderr(io.StringIO()):
+        bt.get_trades(trade_amt)
+
+    return {**params, **(bt.get_statistics() or {'Total Trades': 0})}
+
+
+def parameter_grid(ranges):
+    """Expand {name: [values]} into a list of full parameter dicts, filling defaults."""
+    names = list(ranges)
+    return [{**DEFAULT_PARAMS, **dict(zip(names, values))}
+            for values in itertools.product(*(ranges[name] for name in names))]
+
+
+def sweep(data, ranges, symbol="BTC", trade_amt=1000, compound_flag=1, max_workers=None, vectorized=False,
+          execution=None):
+    """Backtest every combination of parameter ranges over processed indicator data.
+
+    data must already contain the process_data() columns; indicators are computed
+    once by the caller and shared read-only with the worker processes. vectorized runs
+    all combinations in this process in one pass over the bars (see variants.py), which
+    is faster for large grids. execution is the ExecutionModel of every backtest (default: flat fee).
+    Returns a DataFrame with one row of parameters and get_statistics() metrics per combination.
+    """
+    combinations = parameter_grid(ranges)
+    if vectorized:
+        return backtest_variants(data, combinations, symbol, trade_amt, compound_flag, execution=execution)
+    max_workers = max_workers or os.cpu_count()
+    chunksize = max(1, len(combinations) // (max_workers * 4))
+
+    shm, layout = share_columns(data)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=attach_shared,
+                                 initargs=(layout, symbol, trade_amt, compound_flag, execution)) as pool:
+            results = list(pool.map(run_combination, combinations, chunksize=chunksize))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return pd.DataFrame(results)
+
+
+def parse_values(text, kind):
+    """Parse '1,2,3' or an inclusive 'start:stop:step' range into a list of values."""
+    if ':' in text:
+        start, stop, step = (float(part) for part in text.split(':'))
+        values = np.arange(start, stop + step / 2, step)
+    else:
+        values = [float(part) for part in text.split(',')]
+    values = [round(value, 10) for value in values]
+    if kind is int:
+        fractional = [value for value in values if not float(value).is_integer()]
+        if fractional:
+            raise ValueError(f"Expected whole numbers, got {fractional} in '{text}'")
+    return [kind(value) for value in values]
+
+
+def main(argv=None):
+    from main import process_data
+
+    parser = argparse.ArgumentParser(description="Grid search over strat() parameters.")
+    parser.add_argument("--data", default="BTC_2019_2023_1d.csv", help="OHLCV CSV file or columnar store")
+    parser.add_argument("--output", default="sweep_results.csv", help="where to write the results table")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="evaluate all combinations in one pass in this process instead of a worker pool")
+    parser.add_argument("--trade-amt", type=float, default=1000)
+    parser.add_argument("--compound-flag", type=int, default=1)
+    parser.add_argument("--sort-by", default="Net Profit", help="metric used to rank the printed summary")
+    for name, default in DEFAULT_PARAMS.items():
+        parser.add_argument("--" + name.replace('_', '-'), default=None,
+                            help=f"values as 'a,b,c' or 'start:stop:step' (default {default})")
+    args = parser.parse_args(argv)
+
+    ranges = {}
+    for name, default in DEFAULT_PARAMS.items():
+        text = getattr(args, name)
+        if text is not None:
+            try:
+                ranges[name] = parse_values(text, type(default))
+            except ValueError as error:
+                parser.error(f"--{name.replace('_', '-')}: {error}")
+
+    data = process_data(load_ohlcv(args.data))
+
+    start = time.perf_counter()
+    results = sweep(data, ranges, trade_amt=args.trade_amt, compound_flag=args.compound_flag,
+                    max_workers=args.workers, vectorized=args.vectorized)
+    elapsed = time.perf_counter() - start
+
+    results.to_csv(args.output, index=False)
+    print(f"Ran {len(results)} combinations in {elapsed:.2f}s, results written to {args.output}")
+    if args.sort_by in results.columns:
+        print(results.sort_values(args.sort_by, ascending=False).head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
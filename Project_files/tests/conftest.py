@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules live flat in Project_files and import each other by name
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
@@ -0,0 +1,218 @@
+import io
+import os
+from contextlib import redirect_stderr
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtester import TRADE_PERIODS_PER_YEAR, BackTester, TradeLedger, longest_streaks, trade_statistics
+from conftest import PROJECT_DIR
+from datastore import read_csv
+from execution import ExecutionModel
+from metrics import sortino_ratio
+from resample import resample
+from streaming import RunningStatistics, StreamingBackTester
+
+SIGNAL_DATA = os.path.join(PROJECT_DIR, "final_data.csv")
+
+
+def ledger_columns(trades):
+    return {name: trades.column(name) for name in TradeLedger.FIELDS}
+
+
+def assert_same_trades(actual, expected):
+    assert len(actual) == len(expected)
+    for name, values in ledger_columns(expected).items():
+        np.testing.assert_array_equal(actual.column(name), values, err_msg=name)
+
+
+def run_backtest(method, data, compound_flag, **kwargs):
+    bt = BackTester("BTC", signal_data_path=data, compound_flag=compound_flag, **kwargs)
+    with redirect_stderr(io.StringIO()):
+        getattr(bt, method)(1000)
+    return bt
+
+
+@pytest.mark.parametrize("compound_flag", [0, 1])
+def test_get_trades_matches_loop(compound_flag):
+    data = read_csv(SIGNAL_DATA)
+    expected = run_backtest("get_trades_loop", data, compound_flag)
+    actual = run_backtest("get_trades", data, compound_flag)
+
+    assert len(expected.trades) > 0
+    assert_same_trades(actual.trades, expected.trades)
+    assert actual.position.qty == expected.position.qty
+
+
+def tp_sl_frame(bars, seed=0, rate=0.1, distance=0.03):
+    """Bars with random +1/-1 signals and TP/SL levels set on every bar."""
+    rng = np.random.default_rng(seed)
+    events = np.flatnonzero(rng.random(len(bars)) < rate)
+    signals = np.zeros(len(bars), dtype=np.int64)
+    signals[events] = np.where(np.arange(len(events)) % 2 == 0, 1, -1)
+    close = bars['close'].to_numpy()
+    side = rng.choice([1.0, -1.0], len(bars))
+    return bars.assign(signals=signals, TP=close * (1 + side * distance), SL=close * (1 - side * distance))
+
+
+@pytest.mark.parametrize("compound_flag", [0, 1])
+def test_tp_sl_matches_loop(compound_flag):
+    data = tp_sl_frame(read_csv(SIGNAL_DATA)[['datetime', 'open', 'high', 'low', 'close', 'volume']])
+    expected = run_backtest("get_trades_loop", data, compound_flag)
+    actual = run_backtest("get_trades", data, compound_flag)
+
+    assert len(expected.trades) > 0
+    assert_same_trades(actual.trades, expected.trades)
+
+
+def test_intrabar_tp_sl_matches_loop():
+    """TP/SL resolved on 6-hour master rows under daily signal bars."""
+    rng = np.random.default_rng(1)
+    n = 4 * 400
+    close = 10000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    master = pd.DataFrame({'datetime': pd.date_range("2020-01-01", periods=n, freq="6h"), 'open': close,
+                           'high': close * 1.004, 'low': close * 0.996, 'close': close,
+                           'volume': rng.lognormal(8, 0.5, n)})
+    bars = tp_sl_frame(resample(master, "1D")[['datetime', 'open', 'high', 'low', 'close', 'volume']],
+                       distance=0.01)
+
+    expected = run_backtest("get_trades_loop", bars, 1, master_file_path=master.copy())
+    actual = run_backtest("get_trades", bars, 1, master_file_path=master.copy())
+
+    assert len(expected.trades) > 0
+    assert_same_trades(actual.trades, expected.trades)
+
+
+@pytest.mark.parametrize("fill_delay", [1, 3])
+def test_tp_sl_waits_for_delayed_fill(fill_delay):
+    data = tp_sl_frame(read_csv(SIGNAL_DATA)[['datetime', 'open', 'high', 'low', 'close', 'volume']],
+                       distance=0.01)
+    bt = run_backtest("get_trades", data, 1, execution=ExecutionModel(fill_delay=fill_delay))
+    init_time, final_time = bt.trades.column('init_time'), bt.trades.column('final_time')
+
+    # get_trades_loop() has no fill delay; StreamingBackTester buffers bars until they fill
+    streaming = StreamingBackTester("BTC", 1000, 1, keep_trades=True, execution=ExecutionModel(fill_delay=fill_delay))
+    with redirect_stderr(io.StringIO()):
+        for bar, closing_time in zip(data.to_dict("records"), bt.data['nextdatetime']):
+            streaming.on_bar(pd.Timestamp(bar['datetime']), closing_time, bar['signals'], bar['close'],
+                             bar['high'], bar['low'], bar['TP'], bar['SL'], bar['volume'])
+        streaming.finish()
+
+    assert len(bt.trades) > 0
+    assert (final_time > init_time).all()
+    assert len(streaming.trades) == len(bt.trades)
+    for i, trade in enumerate(streaming.trades):
+        reference = bt.trades.trade(i)
+        assert (trade.qty, trade.init_timestamp, trade.final_timestamp) == \
+            (reference.qty, reference.init_timestamp, reference.final_timestamp)
+        assert trade.init_price == pytest.approx(reference.init_price)
+        assert trade.final_price == pytest.approx(reference.final_price)
+
+
+def test_sharpe_and_sortino_use_the_same_trade_returns():
+    bt = run_backtest("get_trades", read_csv(SIGNAL_DATA), 1)
+    stats = bt.get_statistics()
+    returns = bt.trades.pnl() / bt.trades.column('init_price')
+
+    running = RunningStatistics(bt.initial_capital)
+    for i in range(len(bt.trades)):
+        running.update(bt.trades.trade(i))
+    running_stats = running.statistics()
+
+    annualisation = np.sqrt(TRADE_PERIODS_PER_YEAR)
+    assert stats['Sharpe Ratio'] == pytest.approx(returns.mean() / returns.std() * annualisation)
+    assert stats['Sortino Ratio'] == pytest.approx(sortino_ratio(returns, TRADE_PERIODS_PER_YEAR))
+    assert running_stats['Sharpe Ratio'] == pytest.approx(stats['Sharpe Ratio'])
+    assert running_stats['Sortino Ratio'] == pytest.approx(stats['Sortino Ratio'])
+
+
+@pytest.mark.parametrize("wins, expected", [
+    ([], (0, 0)),
+    ([True, True, True], (3, 0)),
+    ([False, False], (0, 2)),
+    ([True, False, True, False, True], (1, 1)),
+    ([True, False, False, True, True, True, False], (3, 2)),
+])
+def test_longest_streaks(wins, expected):
+    assert longest_streaks(np.array(wins, dtype=bool)) == expected
+
+
+def test_trade_statistics_of_hand_built_ledger():
+    hours = np.array([1, 2, 3, 4]) * 3_600_000_000_000
+    start = pd.Timestamp("2021-01-01").value + np.arange(4) * 10 * 3_600_000_000_000
+    trades = TradeLedger("BTC")
+    # pnl: 98.5, -51.5, -100, 99.5
+    trades.extend(np.array([1000.0, -1000.0, 1000.0, -500.0]), np.full(4, 100.0),
+                  np.array([110.0, 105.0, 90.0, 80.0]), start, start + hours, np.array([1.5, 1.5, 0.0, 0.5]))
+
+    stats = trade_statistics(trades, 0.1, np.array([0.01, 0.02, 0.03, 0.04]), initial_capital=1000)
+
+    peak = 1098.5
+    returns = np.array([98.5, -51.5, -100.0, 99.5]) / 100
+    assert stats['Total Trades'] == 4
+    assert (stats['Winning Trades'], stats['Losing Trades']) == (2, 2)
+    assert (stats['No. of Long Trades'], stats['No. of Short Trades']) == (2, 2)
+    assert (stats['Winning Streak'], stats['Losing Streak']) == (1, 2)
+    assert stats['Win Rate'] == 50
+    assert stats['Net Profit'] == pytest.approx(46.5)
+    assert stats['Gross Profit'] == pytest.approx(50.0)
+    assert stats['Average Profit'] == pytest.approx(46.5 / 4)
+    assert (stats['Largest Win'], stats['Largest Loss']) == (pytest.approx(99.5), pytest.approx(-100.0))
+    assert (stats['Average Win'], stats['Average Loss']) == (pytest.approx(99.0), pytest.approx(-75.75))
+    assert stats['Maximum Holding Time'] == pd.Timedelta(hours=4)
+    assert stats['Average Holding Time'] == pd.Timedelta(hours=2.5)
+    assert stats['Benchmark Return(%)'] == pytest.approx(10.0)
+    assert stats['Maximum Drawdown(%)'] == pytest.approx(151.5 / peak * 100)
+    assert stats['Average Drawdown(%)'] == pytest.approx((51.5 + 151.5 + 52.0) / peak / 4 * 100)
+    assert stats['Maximum Adverse Excursion'] == pytest.approx(4.0)
+    assert stats['Average Adverse Excursion'] == pytest.approx(2.5)
+    assert stats['Sharpe Ratio'] == pytest.approx(returns.mean() / returns.std() * np.sqrt(TRADE_PERIODS_PER_YEAR))
+
+
+def test_trade_statistics_of_empty_ledger():
+    assert trade_statistics(TradeLedger("BTC"), 0.1, np.array([])) is None
+
+
+def calc_pnl_loop(bt):
+    """Per-bar loop in the style of the original calc_pnl(), with each trade's first bar marked
+    from its entry price and its last bar marked to its exit price and charged its costs."""
+    times = bt.data.index.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    close = bt.data['close'].to_numpy(dtype=np.float64)
+    trades = [(t.qty, t.init_price, t.final_price, t.init_timestamp.value, t.final_timestamp.value, t.costs)
+              for t in bt.trades]
+    if bt.position.qty != 0:
+        trades.append((bt.position.qty, bt.position.price, close[-1], pd.Timestamp(bt.position.timestamp).value,
+                       np.iinfo(np.int64).max, 0.0))
+
+    pnl, position = np.zeros(len(times)), np.zeros(len(times))
+    for qty, init_price, final_price, init_time, final_time, costs in trades:
+        held = [i for i in range(len(times)) if init_time <= times[i] < final_time]
+        if not held:
+            # Opened and closed within one bar
+            held = [min(np.searchsorted(times, init_time), len(times) - 1)]
+        for i in held:
+            mark_from = init_price if i == held[0] else close[i - 1]
+            mark_to = final_price if i == held[-1] else close[i]
+            pnl[i] += qty * (mark_to - mark_from) / init_price - (costs if i == held[-1] else 0.0)
+            position[i] += qty
+    return pnl, position
+
+
+@pytest.mark.parametrize("compound_flag", [0, 1])
+def test_calc_pnl_matches_loop(compound_flag):
+    data = read_csv(SIGNAL_DATA)
+    # Cut where a position is still open, so the last trade is marked to the last close
+    bt = run_backtest("get_trades", data, compound_flag)
+    middle_exit = bt.trades.trade(len(bt.trades) // 2).final_timestamp
+    cut = int(np.searchsorted(data['datetime'].astype("datetime64[ns]"), middle_exit)) - 1
+    bt = run_backtest("get_trades", data.iloc[:cut], compound_flag, execution=ExecutionModel(slippage=0.001))
+    bt.calc_pnl()
+    pnl, position = calc_pnl_loop(bt)
+
+    assert bt.position.qty != 0 and len(bt.trades) > 10
+    np.testing.assert_allclose(bt.data['pnl'], pnl, rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(bt.data['position'], position, atol=1e-9)
+    np.testing.assert_allclose(bt.data['capital'], bt.initial_capital + np.cumsum(pnl), rtol=1e-12)
+    open_pnl = bt.position.qty * (bt.data['close'].iloc[-1] - bt.position.price) / bt.position.price
+    assert bt.data['pnl'].sum() == pytest.approx(bt.trades.pnl().sum() + open_pnl)
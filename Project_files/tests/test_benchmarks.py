@@ -0,0 +1,42 @@
+import io
+import json
+from contextlib import redirect_stdout
+
+import pytest
+
+from benchmarks import COMPARE_COLUMNS, compact_report, compare_results, main, regime_ohlcv
+
+
+def results(*records):
+    return {'results': [{'stage': stage, 'bars': bars, 'seconds': seconds, 'peak_mb': peak_mb}
+                        for stage, bars, seconds, peak_mb in records]}
+
+
+def test_compare_results_flags_regressions():
+    table = compare_results(results(("strat", 1000, 1.0, 100), ("load", 1000, 1.0, 100)),
+                            results(("strat", 1000, 1.5, 100), ("load", 1000, 1.05, 100)))
+
+    assert list(table.columns) == COMPARE_COLUMNS
+    assert table.set_index('stage')['regression'].to_dict() == {'strat': True, 'load': False}
+
+
+def test_compare_without_common_stages(tmp_path):
+    baseline, current = tmp_path / "baseline.json", tmp_path / "current.json"
+    baseline.write_text(json.dumps(results(("strat", 1000, 1.0, 100))))
+    current.write_text(json.dumps(results(("strat", 2000, 2.0, 200))))
+
+    assert list(compare_results(json.loads(baseline.read_text()), json.loads(current.read_text())).columns) \
+        == COMPARE_COLUMNS
+    with redirect_stdout(io.StringIO()) as output:
+        assert main(["compare", str(baseline), str(current)]) == 0
+    assert "No stage" in output.getvalue()
+
+
+def test_compact_report_measures_peak_rss():
+    report = compact_report(regime_ohlcv(20_000, seed=1))
+
+    for key in ('float64_peak_mb', 'compact_peak_mb'):
+        assert report[key] >= 0
+    assert report['saved_mb'] == pytest.approx(report['float64_peak_mb'] - report['compact_peak_mb'])
+    assert report['bars'] == 20_000
+    assert report['trades'] > 0 and report['compact_trades'] > 0
@@ -0,0 +1,62 @@
+import io
+from contextlib import redirect_stderr
+
+import numpy as np
+import pytest
+
+from backtester import BackTester, TradeLedger
+from benchmarks import regime_ohlcv
+from chunked import WARMUP, run_chunked
+from engine import run_strategy
+from execution import ExecutionModel
+from indicator_cache import IndicatorCache
+from main import process_data
+
+N_BARS = 12_000
+
+EXECUTIONS = {
+    'default': {},
+    'costs': {'taker_fee': 0.001, 'maker_fee': 0.0002, 'slippage': 0.0005, 'funding_rate': 0.0001,
+              'fee_tiers': [(0, 0.0004, 0.0008), (50_000, 0.0001, 0.0003)], 'fill_delay': 2},
+}
+
+
+@pytest.fixture(scope="module")
+def raw():
+    return regime_ohlcv(N_BARS, seed=3)
+
+
+def in_memory(raw, execution):
+    data = run_strategy(process_data(raw.copy(deep=False), IndicatorCache()))
+    bt = BackTester("BTC", signal_data_path=data, compound_flag=1, execution=ExecutionModel(**execution))
+    with redirect_stderr(io.StringIO()):
+        bt.get_trades(1000)
+    return data, bt
+
+
+@pytest.mark.parametrize("execution", list(EXECUTIONS))
+@pytest.mark.parametrize("chunk_size", [WARMUP // 3, 4_999, N_BARS])
+def test_run_chunked_matches_in_memory_run(raw, chunk_size, execution, tmp_path):
+    data, expected = in_memory(raw, EXECUTIONS[execution])
+    signals_output = tmp_path / "final_data.csv"
+    with redirect_stderr(io.StringIO()):
+        chunked = run_chunked(raw, process_data, chunk_size, signals_output=str(signals_output),
+                              trades_output=None, execution=ExecutionModel(**EXECUTIONS[execution]))
+
+    written = np.loadtxt(signals_output, delimiter=",", skiprows=1, usecols=-1, dtype=np.int64)
+    np.testing.assert_array_equal(written, data['signals'].to_numpy())
+
+    assert len(expected.trades) > 0
+    assert len(chunked.trades) == len(expected.trades)
+    for name in TradeLedger.FIELDS:
+        np.testing.assert_allclose(chunked.trades.column(name), expected.trades.column(name), rtol=1e-12,
+                                   err_msg=name)
+    assert chunked.position.qty == pytest.approx(expected.position.qty)
+
+    stats, expected_stats = chunked.get_statistics(), expected.get_statistics()
+    assert stats.keys() == expected_stats.keys()
+    for key, value in expected_stats.items():
+        if isinstance(value, float):
+            assert stats[key] == pytest.approx(value, rel=1e-9, nan_ok=True), key
+        else:
+            assert stats[key] == value, key
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datastore import convert_csv, load_store, read_csv
+
+
+def write_csv(tmp_path, data):
+    path = tmp_path / "data.csv"
+    data.to_csv(path, index=False)
+    return path
+
+
+def test_convert_csv_promotes_dtypes_across_chunks(tmp_path):
+    data = pd.DataFrame({
+        'datetime': pd.date_range("2021-01-01", periods=10, freq="1min").astype(str),
+        'close': [1, 2, 3, 4, 5, 6.5, 7.25, 8, 9, 10],
+        'volume': [1, 2, 3, 4, 5, 6, 7, 8, np.nan, 10],
+        'trade_type': ["HOLD"] * 5 + ["LONG"] * 5,
+    })
+    path = write_csv(tmp_path, data)
+
+    convert_csv(path, tmp_path / "store", chunksize=4)
+    store = load_store(tmp_path / "store")
+    expected = read_csv(path)
+
+    assert store['close'].dtype == np.float64
+    np.testing.assert_array_equal(store['close'], expected['close'])
+    np.testing.assert_array_equal(store['volume'], expected['volume'])
+    assert store['trade_type'].tolist() == expected['trade_type'].tolist()
+    assert (store['datetime'] == pd.to_datetime(expected['datetime'])).all()
+
+
+def test_convert_csv_rejects_mixed_text_and_numbers(tmp_path):
+    data = pd.DataFrame({'close': [1.0, 2.0, 3.0, 4.0], 'note': [1, 2, "x", "y"]})
+    path = write_csv(tmp_path, data)
+
+    with pytest.raises(ValueError, match="note"):
+        convert_csv(path, tmp_path / "store", chunksize=2)
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from conftest import PROJECT_DIR
+from datastore import read_csv
+from main import strat, strat_loop
+
+
+@pytest.fixture(scope="module")
+def final_data():
+    """The shipped pipeline output: OHLCV, process_data() indicators and the strat() columns."""
+    return read_csv(os.path.join(PROJECT_DIR, "final_data.csv"))
+
+
+@pytest.fixture
+def indicators(final_data):
+    return final_data.drop(columns=['trade_type', 'signals'])
+
+
+def test_strat_reproduces_final_data(final_data, indicators):
+    result = strat(indicators)
+
+    assert (result['signals'].to_numpy() == final_data['signals'].to_numpy()).all()
+    assert (result['trade_type'].to_numpy() == final_data['trade_type'].to_numpy()).all()
+    assert (result['signals'] != 0).sum() == 302
+
+
+def test_strat_matches_strat_loop(indicators):
+    result = strat(indicators.copy())
+    expected = strat_loop(indicators.copy())
+
+    assert (result['signals'].to_numpy() == expected['signals'].to_numpy()).all()
+    assert (result['trade_type'].to_numpy() == expected['trade_type'].to_numpy()).all()
+
+
+def test_strat_compact_matches_final_data(final_data, indicators):
+    result = strat(indicators, compact=True)
+
+    assert (result['signals'].to_numpy() == final_data['signals'].to_numpy()).all()
+    assert (result['trade_type'].astype(str).to_numpy() == final_data['trade_type'].to_numpy()).all()
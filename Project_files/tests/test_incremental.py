@@ -0,0 +1,78 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from incremental import BollingerBands, IncrementalIndicators, PriceChange, RollingMean, RollingVariance
+
+
+def run(indicator, values):
+    return np.array([indicator.update(value) for value in values], dtype=np.float64)
+
+
+def test_rolling_mean_recovers_after_nan():
+    values = [1, 2, np.nan, 4, 5, 6, 7, 8]
+    result = run(RollingMean(3), values)
+
+    np.testing.assert_allclose(result, pd.Series(values).rolling(3).mean(), equal_nan=True)
+    np.testing.assert_allclose(result[-3:], [5, 6, 7])
+
+
+@pytest.mark.parametrize("ddof", [0, 1])
+def test_rolling_variance_recovers_after_nan(ddof):
+    rng = np.random.default_rng(0)
+    values = rng.normal(0, 1, 200)
+    values[[5, 50, 51, 120]] = np.nan
+    result = run(RollingVariance(14, ddof), values)
+
+    np.testing.assert_allclose(result, pd.Series(values).rolling(14).var(ddof=ddof), rtol=1e-9, equal_nan=True)
+
+
+def test_bollinger_bands_recover_after_nan():
+    values = 100 + np.arange(60.0) % 7
+    values[10] = np.nan
+    bands = BollingerBands(20)
+    upper, middle, lower = np.array([bands.update(value) for value in values]).T
+
+    series = pd.Series(values)
+    mean, std = series.rolling(20).mean(), series.rolling(20).std(ddof=0)
+    np.testing.assert_allclose(middle, mean, equal_nan=True)
+    np.testing.assert_allclose(upper, mean + 2 * std, rtol=1e-12, equal_nan=True)
+    np.testing.assert_allclose(lower, mean - 2 * std, rtol=1e-12, equal_nan=True)
+    assert np.isfinite(middle[30:]).all()
+
+
+def test_running_sums_stay_accurate_over_long_series():
+    rng = np.random.default_rng(1)
+    values = 1e6 + rng.normal(0, 1, 100_000)
+    mean = run(RollingMean(20), values)
+    variance = run(RollingVariance(20, ddof=1), values)
+
+    series = pd.Series(values)
+    np.testing.assert_allclose(mean[-1000:], series.rolling(20).mean()[-1000:], rtol=1e-12)
+    np.testing.assert_allclose(variance[-1000:], series.rolling(20).var()[-1000:], rtol=1e-6)
+
+
+def test_price_change_from_zero_close():
+    values = [1.0, 0.0, 2.0, 0.0, 0.0, -1.0]
+    result = run(PriceChange(), values)
+
+    np.testing.assert_array_equal(result, pd.Series(values).pct_change().to_numpy())
+    assert math.isinf(result[2]) and math.isnan(result[4])
+
+
+def test_incremental_indicators_match_pandas_across_gaps():
+    rng = np.random.default_rng(2)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 400)))
+    close[[60, 61, 250]] = np.nan
+    data = pd.DataFrame({'high': close * 1.01, 'low': close * 0.99, 'close': close, 'volume': 1000.0})
+    indicators = IncrementalIndicators()
+    rows = [indicators.update(*bar) for bar in data[['high', 'low', 'close', 'volume']].itertuples(index=False)]
+
+    change = data['close'].pct_change()
+    expected = {'Price_Change': change, 'Volatility': change.rolling(window=14).std(),
+                'SMA_20': data['close'].rolling(20).mean()}
+    for name, values in expected.items():
+        np.testing.assert_allclose([row[name] for row in rows], values, rtol=1e-9, equal_nan=True, err_msg=name)
+    assert np.isnan(rows[70]['Volatility']) and np.isfinite(rows[80]['Volatility'])
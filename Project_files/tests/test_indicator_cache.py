@@ -0,0 +1,66 @@
+import numpy as np
+
+from indicator_cache import IndicatorCache
+
+
+def compute(n, value=1.0):
+    return lambda: np.full(n, value)
+
+
+def test_memory_tier_bounded_by_bytes():
+    cache = IndicatorCache(max_bytes=3 * 8000)
+    for i in range(5):
+        cache.get('sma', ['close'], {'length': i}, compute(1000, i))
+
+    assert len(cache.memory) == 3
+    assert cache.memory_bytes == 3 * 8000
+    # The two least recently used entries were evicted
+    cache.get('sma', ['close'], {'length': 0}, compute(1000, 0))
+    assert cache.misses == 6
+
+
+def test_oversized_arrays_are_not_kept():
+    cache = IndicatorCache(max_bytes=1000)
+    values = cache.get('sma', ['close'], {}, compute(1000))
+
+    assert len(values) == 1000
+    assert len(cache.memory) == 0 and cache.memory_bytes == 0
+
+
+def test_hits_return_copies():
+    cache = IndicatorCache()
+    first = cache.get('sma', ['close'], {}, compute(10))
+    first[:] = 5
+    second = cache.get('sma', ['close'], {}, compute(10, 2.0))
+
+    assert cache.memory_hits == 1
+    np.testing.assert_array_equal(second, np.ones(10))
+
+
+def test_zero_entries_disables_memory_tier():
+    cache = IndicatorCache(max_entries=0)
+    cache.get('sma', ['close'], {}, compute(10))
+    cache.get('sma', ['close'], {}, compute(10))
+
+    assert cache.misses == 2 and len(cache.memory) == 0
+
+
+def test_dtypes_are_cached_separately():
+    cache = IndicatorCache()
+    full = cache.get('sma', ['close'], {}, compute(1000))
+    compact = cache.get('sma', ['close'], {}, compute(1000), np.float32)
+
+    assert full.dtype == np.float64 and compact.dtype == np.float32
+    assert cache.misses == 2
+    assert cache.memory_bytes == 8000 + 4000
+
+
+def test_compact_process_data_caches_float32_only():
+    from benchmarks import regime_ohlcv
+    from main import process_data
+
+    cache = IndicatorCache()
+    process_data(regime_ohlcv(1000), cache, compact=True)
+
+    assert len(cache.memory) > 0
+    assert all(values.dtype == np.float32 for values in cache.memory.values())
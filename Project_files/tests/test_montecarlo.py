@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from montecarlo import METHODS, simulate
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_simulate_without_trades_raises(method):
+    with pytest.raises(ValueError, match="No trades"):
+        simulate("trades", (np.zeros(0), np.zeros(0)), 100, method, 5, 1000)
+
+
+def test_simulate_without_returns_raises():
+    with pytest.raises(ValueError, match="No returns"):
+        simulate("returns", (np.zeros(0),), 100, "block", 5, 1000)
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_simulate_shapes(method):
+    pnl = np.random.default_rng(0).normal(1, 20, 50)
+    samples = simulate("trades", (pnl, pnl / 10_000), 200, method, 5, 1000)
+
+    assert set(samples) == {'Net Profit', 'Terminal Capital', 'Maximum Drawdown(%)', 'Sharpe Ratio'}
+    assert all(len(values) == 200 for values in samples.values())
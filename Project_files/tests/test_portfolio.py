@@ -0,0 +1,57 @@
+import io
+import os
+from contextlib import redirect_stderr
+
+import numpy as np
+import pytest
+
+from backtester import BackTester, TradeLedger
+from conftest import PROJECT_DIR
+from datastore import read_csv
+from execution import ExecutionModel
+from portfolio import PortfolioBackTester
+
+
+@pytest.fixture(scope="module")
+def sources():
+    data = read_csv(os.path.join(PROJECT_DIR, "final_data.csv"))
+    return {'BTC': data, 'ALT': data.iloc[:1000]}
+
+
+def test_statistics_before_get_trades_are_none(sources):
+    portfolio = PortfolioBackTester(sources, max_workers=1)
+
+    assert portfolio.get_statistics() is None
+    assert portfolio.get_symbol_statistics() == {'BTC': None, 'ALT': None}
+
+
+def test_statistics_after_get_trades(sources):
+    portfolio = PortfolioBackTester(sources, compound_flag=1, max_workers=1)
+    portfolio.get_trades()
+    stats = portfolio.get_statistics()
+    symbol_stats = portfolio.get_symbol_statistics()
+
+    assert stats['Total Trades'] == len(portfolio.trades) > 0
+    assert sum(s['Total Trades'] for s in symbol_stats.values()) == stats['Total Trades']
+
+
+@pytest.mark.parametrize("compound_flag", [0, 1])
+def test_single_symbol_portfolio_matches_backtester_with_execution(sources, compound_flag):
+    execution = ExecutionModel(taker_fee=0.001, maker_fee=0.0002, slippage=0.0005, funding_rate=0.0001,
+                               fill_delay=1)
+    portfolio = PortfolioBackTester({'BTC': sources['BTC']}, compound_flag=compound_flag, max_workers=1,
+                                    execution=execution)
+    portfolio.get_trades()
+
+    bt = BackTester("BTC", signal_data_path=sources['BTC'], compound_flag=compound_flag, execution=execution)
+    with redirect_stderr(io.StringIO()):
+        bt.get_trades(portfolio.initial_capital)
+
+    assert len(bt.trades) > 0
+    for name in TradeLedger.FIELDS:
+        np.testing.assert_allclose(portfolio.trades.column(name), bt.trades.column(name), rtol=1e-9, err_msg=name)
+
+
+def test_size_dependent_costs_are_rejected(sources):
+    with pytest.raises(ValueError):
+        PortfolioBackTester(sources, execution=ExecutionModel(impact=0.1))
@@ -0,0 +1,54 @@
+import io
+import os
+from contextlib import redirect_stderr
+
+import pytest
+
+from backtester import BackTester
+from conftest import PROJECT_DIR
+from datastore import load_ohlcv
+from indicator_cache import IndicatorCache
+from main import process_data, strat
+from profiling import Profiler, profiler
+
+
+@pytest.fixture
+def enabled_profiler():
+    yield profiler
+    profiler.disable()
+    profiler.reset()
+    profiler.modes = set()
+
+
+def test_profiles_pipeline_stages(enabled_profiler):
+    enabled_profiler.enable("time,tracemalloc")
+    data = load_ohlcv(os.path.join(PROJECT_DIR, "BTC_2019_2023_1d.csv"))
+    with enabled_profiler.stage("main"):
+        result = strat(process_data(data.copy(deep=False), IndicatorCache()))
+        bt = BackTester("BTC", signal_data_path=result, compound_flag=1)
+        with redirect_stderr(io.StringIO()):
+            bt.get_trades(1000)
+        bt.get_statistics()
+
+    report = enabled_profiler.report()
+    stages = {row['stage']: row for row in report['stages']}
+    assert report['modes'] == ['time', 'tracemalloc']
+    assert {'main', 'main/process_data', 'main/strat', 'main/get_trades', 'main/get_statistics'} <= stages.keys()
+    for row in stages.values():
+        assert row['calls'] >= 1
+        assert row['seconds'] >= 0
+        assert row['peak_mb'] >= 0
+    assert stages['main']['peak_mb'] >= stages['main/process_data']['peak_mb']
+    assert report['counters']['bars processed'] == len(data)
+    assert report['counters']['trades closed'] == len(bt.trades)
+    assert "process_data" in enabled_profiler.summary()
+
+
+def test_disabled_profiler_records_nothing():
+    disabled = Profiler()
+    with disabled.stage("main"):
+        disabled.count("bars processed", 10)
+
+    assert disabled.report()['stages'] == [] and disabled.report()['counters'] == {}
+    with pytest.raises(ValueError, match="Unknown profiling mode"):
+        disabled.enable("time,gpu")
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from backtester import trade_excursions
+from rangequery import SparseTable
+
+
+@pytest.mark.parametrize("ufunc, reduce", [(np.minimum, np.min), (np.maximum, np.max)])
+@pytest.mark.parametrize("n, block_size", [(1, 32), (31, 32), (1000, 32), (4099, 8)])
+def test_sparse_table_matches_slices(ufunc, reduce, n, block_size):
+    rng = np.random.default_rng(n)
+    values = rng.normal(0, 1, n)
+    table = SparseTable(values, ufunc, block_size=block_size, chunksize=64)
+
+    start = rng.integers(0, n, 500)
+    end = np.minimum(start + rng.geometric(1 / max(n // 10, 1), 500), n)
+    # Length-1 ranges, ranges ending at the last row and the whole array
+    start = np.concatenate((start, np.arange(min(n, 20)), rng.integers(0, n, 20), [0]))
+    end = np.concatenate((end, np.arange(min(n, 20)) + 1, np.full(20, n), [n]))
+
+    result = table.query(start, end)
+    expected = [reduce(values[lo:hi]) for lo, hi in zip(start, end)]
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_sparse_table_empty_ranges_give_identity():
+    table = SparseTable(np.arange(100.0), np.minimum)
+
+    assert table.query([5, 99], [5, 99]).tolist() == [np.inf, np.inf]
+    assert table.query([99], [1000]).tolist() == [99.0]
+
+
+def test_trade_excursions_match_loop():
+    rng = np.random.default_rng(0)
+    low = 100 + rng.normal(0, 5, 500)
+    high = low + rng.uniform(0, 3, 500)
+    n_trades = 200
+    start = rng.integers(0, 490, n_trades)
+    end = start + rng.integers(0, 10, n_trades)
+    qty = rng.choice([-1000.0, 500.0], n_trades)
+    init_price = rng.uniform(95, 105, n_trades)
+    final_price = rng.uniform(95, 105, n_trades)
+
+    lows = SparseTable(low, np.minimum).query(start, end)
+    highs = SparseTable(high, np.maximum).query(start, end)
+    result = trade_excursions(qty, init_price, final_price, lows, highs)
+
+    for i in range(n_trades):
+        prices_low = [init_price[i], final_price[i], *low[start[i]:end[i]]]
+        prices_high = [init_price[i], final_price[i], *high[start[i]:end[i]]]
+        if qty[i] > 0:
+            mae = (init_price[i] - min(prices_low)) / init_price[i]
+            mfe = (max(prices_high) - init_price[i]) / init_price[i]
+        else:
+            mae = (max(prices_high) - init_price[i]) / init_price[i]
+            mfe = (init_price[i] - min(prices_low)) / init_price[i]
+        assert result['mae'][i] == pytest.approx(mae, abs=1e-15)
+        assert result['mfe'][i] == pytest.approx(mfe, abs=1e-15)
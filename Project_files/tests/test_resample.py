@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks import regime_ohlcv
+from indicator_cache import IndicatorCache
+from main import process_data
+from resample import align_higher_timeframe
+
+HIGHER_TIMEFRAMES = {"1D": ['close', 'SMA_20', 'RSI', 'ATR'], "4h": ['SMA_50', 'MACD']}
+
+
+@pytest.fixture(scope="module")
+def hourly():
+    return regime_ohlcv(24 * 120, seed=4, freq="1h")
+
+
+def with_higher_timeframes(data):
+    return process_data(data.copy(), IndicatorCache(), higher_timeframes=HIGHER_TIMEFRAMES)
+
+
+def test_higher_timeframe_columns_only_use_closed_bars(hourly):
+    full = with_higher_timeframes(hourly)
+    columns = [f"{column}_{freq}" for freq, names in HIGHER_TIMEFRAMES.items() for column in names]
+    assert full[columns].notna().any().all()
+
+    # Cut points inside a day, on the last hour of a day and on the first hour of the next
+    for t in (24 * 40 + 5, 24 * 41 - 1, 24 * 41, 24 * 90 + 13, len(hourly) - 1):
+        prefix = with_higher_timeframes(hourly.iloc[:t + 1])
+        for column in columns:
+            np.testing.assert_allclose(prefix[column].to_numpy(), full[column].iloc[:t + 1].to_numpy(),
+                                       rtol=1e-12, err_msg=f"{column} truncated at {t}")
+
+
+def test_daily_value_reaches_hourly_bars_on_the_last_hour():
+    times = pd.date_range("2021-01-01", periods=72, freq="1h")
+    days = pd.date_range("2021-01-01", periods=3, freq="1D")
+    aligned = align_higher_timeframe(times, pd.Timedelta(hours=1), days, "1D", [10.0, 20.0, 30.0])
+
+    assert np.isnan(aligned[:23]).all()
+    assert (aligned[23:47] == 10.0).all()
+    assert (aligned[47:71] == 20.0).all()
+    assert aligned[71] == 30.0
@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks import regime_ohlcv
+from conftest import PROJECT_DIR
+from datastore import read_csv
+from engine import generate_signals
+from indicator_cache import IndicatorCache
+from main import process_data
+from rules import Expr, RuleSet, at_least, col, default_rules
+
+
+@pytest.fixture(scope="module")
+def indicators():
+    return read_csv(os.path.join(PROJECT_DIR, "final_data.csv")).drop(columns=['trade_type', 'signals'])
+
+
+@pytest.mark.parametrize("params", [
+    {},
+    {'trailing_stop_multiplier': 1.0, 'rsi_overbought': 65, 'take_profit': 0.02, 'min_confirmations': 4},
+    {'rsi_oversold': 35, 'volume_floor_factor': 1.0, 'min_confirmations': 2},
+])
+def test_default_rules_match_generate_signals(indicators, params):
+    signals, trade_codes = default_rules(**params).signals(indicators)
+    expected_signals, expected_codes = generate_signals(indicators, **params)
+
+    np.testing.assert_array_equal(signals, expected_signals)
+    np.testing.assert_array_equal(trade_codes, expected_codes)
+
+
+def test_default_rules_match_generate_signals_on_minute_bars():
+    data = process_data(regime_ohlcv(20_000, seed=2), IndicatorCache())
+    signals, trade_codes = default_rules().signals(data)
+    expected_signals, expected_codes = generate_signals(data)
+
+    assert (expected_signals != 0).sum() > 0
+    np.testing.assert_array_equal(signals, expected_signals)
+    np.testing.assert_array_equal(trade_codes, expected_codes)
+
+
+def test_at_least_counts_votes():
+    data = {'close': np.zeros(4), 'a': np.array([1.0, 1.0, 0.0, 0.0]), 'b': np.array([1.0, 0.0, 1.0, 0.0]),
+            'c': np.array([1.0, 1.0, 1.0, 0.0])}
+    votes = [col('a') > 0, col('b') > 0, col('c') > 0]
+
+    assert at_least(2, *votes).evaluate(data, {}).tolist() == [True, True, True, False]
+    assert at_least(3, *votes).evaluate(data, {}).tolist() == [True, False, False, False]
+    assert at_least(0, *votes).evaluate(data, {}).all()
+
+
+def test_previous_and_crosses():
+    data = {'close': np.array([1.0, 3.0, 2.0, 4.0]), 'level': np.full(4, 2.5)}
+
+    previous = col('close').previous().evaluate(data, {})
+    np.testing.assert_array_equal(previous, [np.nan, 1.0, 3.0, 2.0])
+    assert col('close').crosses_above(col('level')).evaluate(data, {}).tolist() == [False, True, False, True]
+    assert col('close').crosses_below(2.5).evaluate(data, {}).tolist() == [False, False, True, False]
+
+
+def test_nan_comparisons_are_false_and_required_nan_bars_hold():
+    close = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+    signal = np.array([np.nan, 1.0, np.nan, -1.0, 1.0, -1.0])
+    data = pd.DataFrame({'close': close, 'signal': signal})
+
+    assert (col('signal') > 0).evaluate(data, {}).tolist() == [False, True, False, False, True, False]
+    assert (col('signal') <= 0).evaluate(data, {}).tolist() == [False, False, False, True, False, True]
+
+    rules = RuleSet(long_entry=col('signal') > 0, short_entry=col('signal') < 0,
+                    reverse_to_short=col('signal') < 0, reverse_to_long=col('signal') > 0,
+                    required=('close', 'signal'), start_index=0)
+    signals, _ = rules.signals(data)
+    # NaN bars are skipped: the long from bar 1 reverses on bar 3, not on bar 2
+    assert signals.tolist() == [0, 1, 0, -2, 2, -2]
+
+
+def test_expr_is_abstract():
+    with pytest.raises(TypeError):
+        Expr()
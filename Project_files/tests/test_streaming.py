@@ -0,0 +1,99 @@
+import io
+import os
+from contextlib import redirect_stderr
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtester import BackTester
+from conftest import PROJECT_DIR
+from datastore import read_csv
+from engine import TRADE_TYPES, generate_signals
+from execution import ExecutionModel
+from streaming import StreamingBackTester, StreamingStrategy, run_stream, simulated_feed
+
+
+@pytest.fixture(scope="module")
+def final_data():
+    return read_csv(os.path.join(PROJECT_DIR, "final_data.csv"))
+
+
+def stream_strategy(data, **params):
+    strategy = StreamingStrategy(**params)
+    return [strategy.on_bar(bar) for bar in data.to_dict("records")]
+
+
+def test_streaming_strategy_reproduces_final_data(final_data):
+    decisions = stream_strategy(final_data)
+
+    assert [signal for signal, _ in decisions] == final_data['signals'].tolist()
+    assert [trade_type for _, trade_type in decisions] == final_data['trade_type'].tolist()
+
+
+def test_streaming_strategy_matches_engine_with_params(final_data):
+    params = {'trailing_stop_multiplier': 1.0, 'rsi_overbought': 65, 'take_profit': 0.02,
+              'min_confirmations': 4}
+    signals, trade_codes = generate_signals(final_data, **params)
+    decisions = stream_strategy(final_data, **params)
+
+    assert [signal for signal, _ in decisions] == signals.tolist()
+    assert [trade_type for _, trade_type in decisions] == TRADE_TYPES[trade_codes].tolist()
+
+
+def test_run_stream_infers_modal_bar_duration():
+    def feed():
+        # The first bar sits an hour before the rest of a one-minute feed
+        for i, bar in enumerate(simulated_feed(3000)):
+            if i == 0:
+                bar['datetime'] -= pd.Timedelta(hours=1)
+            yield bar
+
+    inferred = run_stream(feed(), keep_trades=True)
+    expected = run_stream(feed(), keep_trades=True, bar_duration=pd.Timedelta(minutes=1))
+
+    assert len(expected.trades) > 0
+    assert [(t.init_timestamp, t.final_timestamp, t.final_price) for t in inferred.trades] == \
+        [(t.init_timestamp, t.final_timestamp, t.final_price) for t in expected.trades]
+
+
+@pytest.mark.parametrize("compound_flag", [0, 1])
+@pytest.mark.parametrize("execution", [
+    {},
+    {'taker_fee': 0.001, 'maker_fee': 0.0002, 'slippage': 0.0005, 'impact': 0.5, 'funding_rate': 0.0001},
+    {'slippage': 0.0005, 'fee_tiers': [(0, 0.0004, 0.0008), (20_000, 0.0001, 0.0003)], 'fill_delay': 2},
+], ids=["default", "costs", "fill_delay"])
+def test_streaming_backtester_matches_backtester(final_data, compound_flag, execution):
+    # Alternating +1/-1 signals stay valid whichever bars TP/SL close the position on
+    rng = np.random.default_rng(0)
+    events = np.flatnonzero(rng.random(len(final_data)) < 0.1)
+    signals = np.zeros(len(final_data), dtype=np.int64)
+    signals[events] = np.where(np.arange(len(events)) % 2 == 0, 1, -1)
+    close = final_data['close'].to_numpy()
+    side = rng.choice([1.0, -1.0], len(close))
+    data = final_data[['datetime', 'open', 'high', 'low', 'close', 'volume']].assign(
+        signals=signals, TP=close * (1 + side * 0.02), SL=close * (1 - side * 0.02))
+
+    expected = BackTester("BTC", signal_data_path=data, compound_flag=compound_flag,
+                          execution=ExecutionModel(**execution))
+    streaming = StreamingBackTester("BTC", 1000, compound_flag, keep_trades=True,
+                                    execution=ExecutionModel(**execution))
+    with redirect_stderr(io.StringIO()):
+        expected.get_trades(1000)
+        for bar, closing_time in zip(data.to_dict("records"), expected.data['nextdatetime']):
+            streaming.on_bar(pd.Timestamp(bar['datetime']), closing_time, bar['signals'], bar['close'],
+                             bar['high'], bar['low'], bar['TP'], bar['SL'], bar['volume'])
+        streaming.finish()
+
+    assert len(streaming.trades) == len(expected.trades) > 0
+    for i, trade in enumerate(streaming.trades):
+        reference = expected.trades.trade(i)
+        assert (trade.qty, trade.init_timestamp, trade.final_timestamp) == \
+            (reference.qty, reference.init_timestamp, reference.final_timestamp)
+        assert trade.init_price == pytest.approx(reference.init_price)
+        assert trade.final_price == pytest.approx(reference.final_price)
+        assert trade.costs == pytest.approx(reference.costs)
+
+    stats, expected_stats = streaming.get_statistics(), expected.get_statistics()
+    for key in ('Net Profit', 'Maximum Adverse Excursion', 'Average Adverse Excursion', 'Sharpe Ratio'):
+        assert stats[key] == pytest.approx(expected_stats[key]), key
@@ -0,0 +1,56 @@
+import io
+import os
+from contextlib import redirect_stdout
+
+import pandas as pd
+import pytest
+
+from conftest import PROJECT_DIR
+from datastore import convert_csv, read_csv
+from execution import ExecutionModel
+from sweep import main, parameter_grid, parse_values, sweep
+
+
+def test_parse_values_lists_and_ranges():
+    assert parse_values("1,2,3", int) == [1, 2, 3]
+    assert parse_values("0.05:0.2:0.05", float) == [0.05, 0.1, 0.15, 0.2]
+    assert parse_values("2:4:1", int) == [2, 3, 4]
+    assert parse_values("3.0", int) == [3]
+
+
+@pytest.mark.parametrize("text", ["2.5", "2,3.5", "1:3:0.5"])
+def test_parse_values_rejects_fractional_ints(text):
+    with pytest.raises(ValueError):
+        parse_values(text, int)
+
+
+def test_parameter_grid_fills_defaults():
+    grid = parameter_grid({'min_confirmations': [3, 4]})
+    assert [params['min_confirmations'] for params in grid] == [3, 4]
+    assert all(params['take_profit'] == 0.15 for params in grid)
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_sweep_uses_execution_model(vectorized):
+    data = read_csv(os.path.join(PROJECT_DIR, "final_data.csv"))
+    ranges = {'min_confirmations': [3, 4]}
+    free = sweep(data, ranges, max_workers=1, vectorized=vectorized,
+                 execution=ExecutionModel(taker_fee=0, maker_fee=0))
+    default = sweep(data, ranges, max_workers=1, vectorized=vectorized)
+
+    assert (free['Net Profit'] == free['Gross Profit']).all()
+    assert (default['Net Profit'] < free['Net Profit']).all()
+
+
+def test_main_reads_columnar_store(tmp_path):
+    csv_path = os.path.join(PROJECT_DIR, "BTC_2019_2023_1d.csv")
+    convert_csv(csv_path, tmp_path / "store")
+    outputs = {}
+    for name, source in (("csv", csv_path), ("store", str(tmp_path / "store"))):
+        outputs[name] = tmp_path / f"{name}.csv"
+        with redirect_stdout(io.StringIO()):
+            main(["--data", source, "--output", str(outputs[name]), "--vectorized", "--min-confirmations", "3,4"])
+
+    expected = read_csv(outputs["csv"])
+    assert len(expected) == 2
+    pd.testing.assert_frame_equal(read_csv(outputs["store"]), expected)
@@ -0,0 +1,55 @@
+import io
+import os
+from contextlib import redirect_stdout
+
+import pytest
+
+import main
+from benchmarks import regime_ohlcv
+from conftest import PROJECT_DIR
+from datastore import load_ohlcv
+from engine import run_strategy
+from indicator_cache import IndicatorCache
+
+
+@pytest.fixture(scope="module")
+def data():
+    return load_ohlcv(os.path.join(PROJECT_DIR, "BTC_2019_2023_1d.csv")).iloc[:500]
+
+
+def validate(data):
+    result_data = main.strat(main.process_data(data.copy(deep=False)))
+    with redirect_stdout(io.StringIO()) as output:
+        is_valid = main.validate_strategy(data, result_data)
+    return is_valid, output.getvalue()
+
+
+def test_validate_strategy_passes(data):
+    is_valid, output = validate(data)
+
+    assert is_valid
+    assert "No lookahead bias detected" in output
+
+
+def test_validate_strategy_fails_when_replay_diverges(data, monkeypatch):
+    # A strat() change that streaming.py does not mirror: causal, but not reproduced by the replay
+    monkeypatch.setattr(main, "strat", lambda data, compact=False: run_strategy(data, compact, min_confirmations=4))
+    is_valid, output = validate(data)
+
+    assert not is_valid
+    assert "No lookahead bias detected" not in output
+    assert "Streaming replay diverges" in output
+
+
+def test_validate_strategy_compact_reproduces_float32_flips():
+    # On this series float32 indicators flip signals around bar 35751; the replay must agree
+    raw = regime_ohlcv(100_000, seed=1).iloc[:40_000]
+    full = run_strategy(main.process_data(raw.copy(deep=False), IndicatorCache()))
+    result_data = run_strategy(main.process_data(raw.copy(deep=False), IndicatorCache(), compact=True), compact=True)
+    assert (full['signals'].to_numpy() != result_data['signals'].to_numpy()).any()
+
+    with redirect_stdout(io.StringIO()) as output:
+        is_valid = main.validate_strategy(raw, result_data, compact=True)
+
+    assert is_valid, output.getvalue()
+    assert "No lookahead bias detected across all 40000 bars" in output.getvalue()
@@ -0,0 +1,101 @@
+import io
+import os
+from contextlib import redirect_stderr
+
+import numpy as np
+import pytest
+
+from backtester import BackTester, TradeLedger
+from conftest import PROJECT_DIR
+from datastore import read_csv
+from engine import generate_signals
+from execution import ExecutionModel
+from variants import MIN_VECTOR_VARIANTS, VariantBackTester, backtest_variants, variant_signals
+
+
+@pytest.fixture(scope="module")
+def indicators():
+    return read_csv(os.path.join(PROJECT_DIR, "final_data.csv")).drop(columns=['trade_type', 'signals'])
+
+
+def param_sets(k, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{'trailing_stop_multiplier': float(rng.choice([1.0, 1.5, 2.0, 3.0])),
+             'rsi_overbought': int(rng.choice([60, 65, 70, 75])),
+             'rsi_oversold': int(rng.choice([25, 30, 35])),
+             'take_profit': float(rng.choice([0.02, 0.05, 0.15])),
+             'volume_floor_factor': float(rng.choice([0.5, 0.8, 1.0])),
+             'min_confirmations': int(rng.choice([2, 3, 4]))} for _ in range(k)]
+
+
+@pytest.mark.parametrize("k", [3, MIN_VECTOR_VARIANTS + 5])
+def test_variant_signals_match_generate_signals(indicators, k):
+    params = param_sets(k)
+    signals, trade_codes = variant_signals(indicators, params)
+
+    assert signals.shape == trade_codes.shape == (k, len(indicators))
+    for v, param_set in enumerate(params):
+        expected_signals, expected_codes = generate_signals(indicators, **param_set)
+        np.testing.assert_array_equal(signals[v], expected_signals, err_msg=str(param_set))
+        np.testing.assert_array_equal(trade_codes[v], expected_codes, err_msg=str(param_set))
+
+
+def assert_matches_backtester(data, signals, compound_flag, execution):
+    variants = VariantBackTester("BTC", data, compound_flag, execution=ExecutionModel(**execution))
+    for row in signals:
+        bt = BackTester("BTC", signal_data_path=data.assign(signals=row), compound_flag=compound_flag,
+                        execution=ExecutionModel(**execution))
+        with redirect_stderr(io.StringIO()):
+            bt.get_trades(1000)
+        actual = variants.run(row)
+
+        assert len(actual.trades) == len(bt.trades)
+        for name in TradeLedger.FIELDS:
+            np.testing.assert_allclose(actual.trades.column(name), bt.trades.column(name), rtol=1e-12,
+                                       err_msg=name)
+        assert actual.position.qty == pytest.approx(bt.position.qty)
+        if bt.position.qty != 0:
+            assert actual.entry_costs == pytest.approx(bt.entry_costs)
+    return variants
+
+
+@pytest.mark.parametrize("compound_flag", [0, 1])
+@pytest.mark.parametrize("execution", [
+    {},
+    {'taker_fee': 0.001, 'maker_fee': 0.0002, 'slippage': 0.0005, 'funding_rate': 0.0001, 'fill_delay': 2},
+    {'fee_tiers': [(0, 0.0004, 0.0008), (20_000, 0.0001, 0.0003)], 'impact': 0.5},
+], ids=["default", "costs", "tiers_impact"])
+def test_variant_backtester_matches_backtester(indicators, compound_flag, execution):
+    signals, _ = variant_signals(indicators, param_sets(6))
+    variants = assert_matches_backtester(indicators, signals, compound_flag, execution)
+
+    assert variants.vectorized == (not execution.get('fee_tiers'))
+
+
+def test_variant_backtester_runs_tp_sl_through_get_trades(indicators):
+    # Alternating +1/-1 signals stay valid whichever bars TP/SL close the position on
+    rng = np.random.default_rng(0)
+    signals = np.zeros((4, len(indicators)), dtype=np.int8)
+    for row in signals:
+        events = np.flatnonzero(rng.random(len(row)) < 0.1)
+        row[events] = np.where(np.arange(len(events)) % 2 == 0, 1, -1)
+    close = indicators['close'].to_numpy()
+    data = indicators.assign(TP=close * 1.02, SL=close * 0.98)
+    variants = assert_matches_backtester(data, signals, 1, {'slippage': 0.0005})
+
+    assert not variants.vectorized
+
+
+def test_backtest_variants_statistics(indicators):
+    params = param_sets(MIN_VECTOR_VARIANTS + 2)
+    results = backtest_variants(indicators, params, compound_flag=1)
+
+    assert len(results) == len(params)
+    for v in (0, len(params) - 1):
+        signals, _ = generate_signals(indicators, **params[v])
+        bt = BackTester("BTC", signal_data_path=indicators.assign(signals=signals), compound_flag=1)
+        with redirect_stderr(io.StringIO()):
+            bt.get_trades(1000)
+        stats = bt.get_statistics()
+        assert results['Total Trades'].iloc[v] == stats['Total Trades']
+        assert results['Net Profit'].iloc[v] == pytest.approx(stats['Net Profit'])
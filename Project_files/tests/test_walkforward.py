@@ -0,0 +1,64 @@
+import io
+import os
+from contextlib import redirect_stderr, redirect_stdout
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import PROJECT_DIR
+from datastore import convert_csv, read_csv
+from execution import ExecutionModel
+from walkforward import main, walk_forward, walk_forward_windows
+
+TIMES = pd.date_range("2020-01-01", periods=1000, freq="1D")
+
+
+def test_default_step_tiles_test_windows():
+    windows = walk_forward_windows(TIMES, "365D", "90D")
+
+    assert len(windows) > 1
+    for (_, _, _, test_end), (_, _, next_test_start, _) in zip(windows, windows[1:]):
+        assert test_end == next_test_start
+    test_rows = np.concatenate([np.arange(w[2], w[3]) for w in windows])
+    assert len(np.unique(test_rows)) == len(test_rows)
+
+
+@pytest.mark.parametrize("test, step", [("0D", None), ("90D", "0D"), ("90D", "-30D"), ("90D", "30D")])
+def test_invalid_windows_raise(test, step):
+    with pytest.raises(ValueError):
+        walk_forward_windows(TIMES, "365D", test, step)
+
+
+def test_main_rejects_overlapping_test_windows():
+    with redirect_stderr(io.StringIO()) as errors, pytest.raises(SystemExit):
+        main(["--test", "90D", "--step", "30D"])
+    assert "overlap" in errors.getvalue()
+
+
+def test_walk_forward_uses_execution_model():
+    data = read_csv(os.path.join(PROJECT_DIR, "final_data.csv"))
+    ranges = {'min_confirmations': [3, 4]}
+    free, _ = walk_forward(data, ranges, "365D", "180D", max_workers=1,
+                           execution=ExecutionModel(taker_fee=0, maker_fee=0))
+    default, _ = walk_forward(data, ranges, "365D", "180D", max_workers=1)
+
+    traded = free['test Total Trades'] > 0
+    assert traded.any()
+    assert (free.loc[traded, 'test Net Profit'] == free.loc[traded, 'test Gross Profit']).all()
+    assert (default.loc[traded, 'test Net Profit'] < free.loc[traded, 'test Net Profit']).all()
+
+
+def test_main_reads_columnar_store(tmp_path):
+    csv_path = os.path.join(PROJECT_DIR, "BTC_2019_2023_1d.csv")
+    convert_csv(csv_path, tmp_path / "store")
+    outputs = {}
+    for name, source in (("csv", csv_path), ("store", str(tmp_path / "store"))):
+        outputs[name] = tmp_path / f"{name}.csv"
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            main(["--data", source, "--output", str(outputs[name]), "--workers", "1", "--train", "365D",
+                  "--test", "180D", "--min-confirmations", "3,4"])
+
+    expected = read_csv(outputs["csv"])
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(read_csv(outputs["store"]), expected)
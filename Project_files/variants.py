@@ -0,0 +1,307 @@
+import io
+from contextlib import redirect_stderr
+
+import numpy as np
+import pandas as pd
+
+from backtester import BackTester, Position, TradeLedger
+from engine import (CLOSE_LONG, CLOSE_SHORT, DEFAULT_PARAMS, LONG, REVERSE_LONG_TO_SHORT, REVERSE_SHORT_TO_LONG,
+                    SHORT, START_INDEX, column, compute_conditions, run_state_machine)
+
+# Bars whose per-variant entry masks are built at once; bounds the (bars x variants) temporaries
+BLOCK_SIZE = 2048
+
+# Variant count from which the vectorized pass beats running the variants one by one
+MIN_VECTOR_VARIANTS = 48
+
+# Signal of each trade code, indexed like TRADE_TYPES
+CODE_SIGNALS = np.array([0, 1, -1, -2, -1, 2, 1], dtype=np.int8)
+
+
+def variant_params(param_sets):
+    """Full parameter dicts (defaults filled in) and {name: length-K array} of their values."""
+    params = [{**DEFAULT_PARAMS, **param_set} for param_set in param_sets]
+    vectors = {name: np.array([param_set[name] for param_set in params], dtype=np.float64)
+               for name in DEFAULT_PARAMS}
+    return params, vectors
+
+
+def entry_masks(conditions, columns, vectors, lo, hi):
+    """(bars x variants) long and short entry masks of bars [lo, hi), as compute_conditions() builds them."""
+    rsi = columns['RSI'][lo:hi, None]
+    volume = columns['volume'][lo:hi, None]
+    volume_sma = columns['Volume_SMA'][lo:hi, None]
+    volume_ok = ((volume > volume_sma * vectors['volume_confirmation_factor'])
+                 | (volume > volume_sma * vectors['volume_floor_factor']))
+
+    long_count = (conditions['long_votes'][lo:hi, None]
+                  + ((rsi < vectors['rsi_overbought']) & (rsi > 40)) + volume_ok)
+    short_count = (conditions['short_votes'][lo:hi, None]
+                   + ((rsi > vectors['rsi_oversold']) & (rsi < 60)) + volume_ok)
+    return long_count >= vectors['min_confirmations'], short_count >= vectors['min_confirmations']
+
+
+def vector_state_machine(conditions, columns, vectors, start_index, state, block_size=BLOCK_SIZE):
+    """(K x N) trade codes of all variants, advancing their state arrays together bar by bar."""
+    close, atr = columns['close'], columns['ATR']
+    n = len(close)
+    k = len(vectors['take_profit'])
+    trade_codes = np.zeros((k, n), dtype=np.int8)
+    multiplier = vectors['trailing_stop_multiplier']
+    take_profit = vectors['take_profit']
+    position, trailing_stop, entry_price = state['position'], state['trailing_stop'], state['entry_price']
+
+    # The exits and reversals are the same for every variant, so they stay per-bar scalars
+    long_exit = conditions['long_exit'].tolist()
+    short_exit = conditions['short_exit'].tolist()
+    reverse_to_short = conditions['reverse_to_short'].tolist()
+    reverse_to_long = conditions['reverse_to_long'].tolist()
+    close_l = close.tolist()
+    valid = conditions['valid'].copy()
+    valid[:start_index] = False
+
+    # Flat variants divide by a zero entry price; those lanes are masked out
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for lo in range(start_index, n, block_size):
+            hi = min(lo + block_size, n)
+            bars = (np.flatnonzero(valid[lo:hi]) + lo).tolist()
+            if not bars:
+                continue
+            long_entry, short_entry = entry_masks(conditions, columns, vectors, lo, hi)
+            any_entry = (long_entry | short_entry).any(axis=1).tolist()
+            # A short entry overrides a long entry on the same bar, as in strat()
+            long_entry &= ~short_entry
+            stop_offset = atr[lo:hi, None] * multiplier
+            long_stop = close[lo:hi, None] - stop_offset
+            short_stop = close[lo:hi, None] + stop_offset
+            # Codes are written bar-major and transposed into the (K x N) matrix once per block
+            codes = np.zeros((hi - lo, k), dtype=np.int8)
+
+            for i in bars:
+                j = i - lo
+                if not any_entry[j] and not position.any():
+                    continue
+                current_close = close_l[i]
+                code = codes[j]
+
+                flat = position == 0
+                is_long = position == 1
+                is_short = position == -1
+
+                open_short = flat & short_entry[j]
+                open_long = flat & long_entry[j]
+
+                if reverse_to_short[i]:
+                    reverse_short, close_long = is_long, None
+                elif long_exit[i]:
+                    reverse_short, close_long = None, is_long
+                else:
+                    reverse_short = None
+                    close_long = is_long & ((current_close < trailing_stop)
+                                            | ((current_close - entry_price) / entry_price > take_profit))
+                if reverse_to_long[i]:
+                    reverse_long, close_short = is_short, None
+                elif short_exit[i]:
+                    reverse_long, close_short = None, is_short
+                else:
+                    reverse_long = None
+                    close_short = is_short & ((current_close > trailing_stop)
+                                              | ((entry_price - current_close) / entry_price > take_profit))
+
+                # Held positions trail their stop before any state changes
+                if close_long is not None:
+                    hold = is_long & ~close_long
+                    np.putmask(trailing_stop, hold, np.maximum(trailing_stop, long_stop[j]))
+                if close_short is not None:
+                    hold = is_short & ~close_short
+                    np.putmask(trailing_stop, hold, np.minimum(trailing_stop, short_stop[j]))
+
+                new_long = open_long if reverse_long is None else open_long | reverse_long
+                new_short = open_short if reverse_short is None else open_short | reverse_short
+                np.putmask(code, open_long, LONG)
+                np.putmask(code, open_short, SHORT)
+                if reverse_short is not None:
+                    np.putmask(code, reverse_short, REVERSE_LONG_TO_SHORT)
+                if reverse_long is not None:
+                    np.putmask(code, reverse_long, REVERSE_SHORT_TO_LONG)
+                if close_long is not None:
+                    np.putmask(code, close_long, CLOSE_LONG)
+                    np.putmask(position, close_long, 0)
+                    np.putmask(trailing_stop, close_long, 0)
+                if close_short is not None:
+                    np.putmask(code, close_short, CLOSE_SHORT)
+                    np.putmask(position, close_short, 0)
+                    np.putmask(trailing_stop, close_short, 0)
+
+                np.putmask(position, new_long, 1)
+                np.putmask(position, new_short, -1)
+                np.putmask(entry_price, new_long | new_short, current_close)
+                np.putmask(trailing_stop, new_long, long_stop[j])
+                np.putmask(trailing_stop, new_short, short_stop[j])
+
+            trade_codes[:, lo:hi] = codes.T
+
+    return trade_codes
+
+
+def each_variant(conditions, columns, vectors, start_index, state):
+    """(K x N) trade codes of the variants run one at a time through run_state_machine()."""
+    close, atr = columns['close'], columns['ATR']
+    trade_codes = np.zeros((len(vectors['take_profit']), len(close)), dtype=np.int8)
+    for v in range(len(trade_codes)):
+        variant = {name: values[v:v + 1] for name, values in vectors.items()}
+        long_entry, short_entry = entry_masks(conditions, columns, variant, 0, len(close))
+        variant_state = {name: values[v].item() for name, values in state.items()}
+        _, trade_codes[v] = run_state_machine(close, atr, {**conditions, 'long_entry': long_entry[:, 0],
+                                                            'short_entry': short_entry[:, 0]},
+                                              start_index, vectors['trailing_stop_multiplier'][v],
+                                              vectors['take_profit'][v], variant_state)
+        for name, values in state.items():
+            values[v] = variant_state[name]
+    return trade_codes
+
+
+def variant_signals(data, param_sets, start_index=START_INDEX, state=None, block_size=BLOCK_SIZE):
+    """Signals of K parameter sets of strat() in one pass over the bars.
+
+    Conditions that do not depend on the parameters are computed once and shared; the
+    position, entry price and trailing stop of every variant are length-K arrays updated
+    together bar by bar, so the interpreter cost is paid per bar rather than per bar and
+    variant. Below MIN_VECTOR_VARIANTS variants that per-bar cost outweighs the saving and each
+    variant runs through run_state_machine() instead. Returns (signals, trade_codes) as
+    (K x N) int8 matrices whose rows equal generate_signals() for each parameter set.
+    state is an optional dict of 'position', 'trailing_stop' and 'entry_price' arrays,
+    updated with the final state as in run_state_machine().
+    """
+    params, vectors = variant_params(param_sets)
+    k = len(params)
+    columns = {name: column(data, name) for name in ('close', 'ATR', 'RSI', 'volume', 'Volume_SMA')}
+    conditions = compute_conditions(data)
+
+    state = state if state is not None else {}
+    state['position'] = np.array(state.get('position', np.zeros(k)), dtype=np.int8)
+    for name in ('trailing_stop', 'entry_price'):
+        state[name] = np.array(state.get(name, np.zeros(k)), dtype=np.float64)
+
+    if k < MIN_VECTOR_VARIANTS:
+        trade_codes = each_variant(conditions, columns, vectors, start_index, state)
+    else:
+        trade_codes = vector_state_machine(conditions, columns, vectors, start_index, state, block_size)
+    return CODE_SIGNALS[trade_codes], trade_codes
+
+
+class VariantBackTester:
+    """Backtests of many signal rows over the same bars, sharing one BackTester's setup.
+
+    Loading, datetime indexing, fill prices and the master-data index are built once. When
+    costs depend on neither order size nor turnover (no impact or fee tiers) and no bar sets
+    TP/SL, a row's trades are built from its signal events with array operations: positions
+    are the running sum of the signals, so every open and close is known up front, and only
+    compounding walks the trades in order. Fill delay, slippage and funding go through the
+    ExecutionModel as in get_trades(). Other execution models, TP/SL levels, and rows
+    compounding the trade amount to zero or below run the get_trades() event loop. Results
+    match one BackTester per row.
+    """
+
+    def __init__(self, symbol, data, compound_flag=0, initial_capital=1000, execution=None, bar_duration=None):
+        """data holds the bars (datetime plus OHLC(V)) the signal rows were generated from."""
+        bars = {name: data[name] for name in ('datetime', 'open', 'high', 'low', 'close', 'volume', 'TP', 'SL')
+                if name in data}
+        bars['signals'] = np.zeros(len(data['close']), dtype=np.int8)
+        self.symbol = symbol
+        self.compound_flag = compound_flag
+        self.bt = BackTester(symbol, signal_data_path=bars, compound_flag=compound_flag,
+                             initial_capital=initial_capital, execution=execution, bar_duration=bar_duration)
+
+        model = self.bt.execution
+        fill = model.fill_index(len(self.bt.data))
+        self.fill_closes = self.bt.data["close"].to_numpy(dtype=np.float64)[fill]
+        self.fill_times = self.bt.data["nextdatetime"].to_numpy(dtype="datetime64[ns]").view(np.int64)[fill]
+        has_tp_sl = (self.bt.data["TP"].to_numpy() != 0).any() or (self.bt.data["SL"].to_numpy() != 0).any()
+        self.vectorized = not model.fee_tiers and not model.impact and not has_tp_sl
+
+    def run(self, signals, trade_amt=1000):
+        """Backtest one signal row and return the BackTester holding its trades."""
+        bt = self.bt
+        bt.trades = TradeLedger(self.symbol)
+        bt.position = Position(self.symbol, 0, None, None)
+        bt.tp = bt.sl = 0
+        bt.entry_costs = 0.0
+        if self.vectorized and self.signal_trades(signals, trade_amt):
+            return bt
+
+        bt.data['signals'] = signals
+        with redirect_stderr(io.StringIO()):
+            bt.get_trades(trade_amt)
+        return bt
+
+    def signal_trades(self, signals, trade_amt):
+        """Fill the ledger from the signal events of one row; False if get_trades() has to run it instead."""
+        bt, model = self.bt, self.bt.execution
+        events = np.flatnonzero(signals)
+        moves = np.asarray(signals)[events].astype(np.int64)
+        after = np.cumsum(moves)
+        if np.any(np.abs(after) > 1) or np.any(np.abs(moves) > 2):
+            # An invalid signal; get_trades() raises the error
+            return False
+        opened = after != 0
+        opens = events[opened]
+        closes = events[(after - moves) != 0]
+        sides = after[opened]
+        n = len(closes)
+
+        # Market fills in both directions; without impact the notional does not change the price
+        entry_prices = model.fill_price(self.fill_closes[opens], sides, 0.0)
+        entry_times = self.fill_times[opens]
+        init_price = entry_prices[:n]
+        final_price = model.fill_price(self.fill_closes[closes], -sides[:n], 0.0)
+        init_time, final_time = entry_times[:n], self.fill_times[closes]
+        funded = model.funding_times is not None or model.funding_rate != 0
+
+        if self.compound_flag:
+            # Each trade's size is the trade amount after the pnl of the trades before it
+            qty = np.empty(n)
+            price_change = (final_price - init_price).tolist()
+            init_prices = init_price.tolist()
+            costs = np.empty(n)
+            for j, side in enumerate(sides[:n].tolist()):
+                if trade_amt <= 0:
+                    return False
+                size = side * trade_amt
+                notional = abs(size)
+                cost = model.fee(notional) + model.fee(notional)
+                if funded:
+                    cost += model.funding(size, init_time[j], final_time[j])
+                qty[j], costs[j] = size, cost
+                trade_amt = trade_amt + (size * price_change[j] / init_prices[j] - cost)
+            if trade_amt <= 0 and len(opens) > n:
+                return False
+        else:
+            qty = sides[:n] * trade_amt
+            notional = np.abs(qty)
+            costs = model.fee(notional) + model.fee(notional)
+            if funded:
+                costs += [model.funding(size, start, end) for size, start, end in zip(qty.tolist(), init_time, final_time)]
+
+        bt.trades.extend(qty, init_price, final_price, init_time, final_time, costs)
+        if len(opens) > n:
+            size = int(sides[n]) * trade_amt
+            bt.position = Position(self.symbol, size, float(entry_prices[n]), pd.Timestamp(int(entry_times[n])))
+            bt.entry_costs = model.fee(abs(size))
+        # Fees of whole arrays leave an array turnover; without fee tiers nothing reads it
+        model.reset()
+        return True
+
+    def statistics(self, signal_matrix, trade_amt=1000):
+        """get_statistics() of every row of a (K x N) signal matrix, as a list of dicts (None without trades)."""
+        return [self.run(signals, trade_amt).get_statistics() for signals in signal_matrix]
+
+
+def backtest_variants(data, param_sets, symbol="BTC", trade_amt=1000, compound_flag=1, **kwargs):
+    """Signals and backtests of every parameter set; a DataFrame of parameters and statistics per variant."""
+    params, _ = variant_params(param_sets)
+    signals, _ = variant_signals(data, params)
+    bt = VariantBackTester(symbol, data, compound_flag, **kwargs)
+    results = bt.statistics(signals, trade_amt)
+    return pd.DataFrame([{**param_set, **(stats or {'Total Trades': 0})}
+                         for param_set, stats in zip(params, results)])
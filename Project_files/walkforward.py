@@ -0,0 +1,216 @@
+import argparse
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr
+
+import numpy as np
+import pandas as pd
+
+from backtester import BackTester
+from datastore import load_ohlcv
+from engine import DEFAULT_PARAMS, START_INDEX, generate_signals
+from sweep import attach_shared, parameter_grid, parse_values, share_columns, shared
+
+
+def window_lengths(train, test, step=None):
+    """Return train, test and step (default test) in nanoseconds.
+
+    A step shorter than test would overlap the test windows, which walk_forward() stitches into
+    one out-of-sample curve, so it raises ValueError, as does a non-positive test or step.
+    """
+    train, test = pd.to_timedelta(train).value, pd.to_timedelta(test).value
+    step = pd.to_timedelta(step).value if step is not None else test
+    if test <= 0 or step <= 0:
+        raise ValueError("test and step must be positive durations")
+    if step < test:
+        raise ValueError("step must be at least the test length, or the test windows overlap")
+    return train, test, step
+
+
+def walk_forward_windows(times, train, test, step=None, anchored=False):
+    """Split sorted datetimes into (train_start, train_end, test_start, test_end) row ranges.
+
+    train, test and step are durations ('365D', pd.Timedelta, ...); step defaults to test so
+    the test windows tile the timeline. Rolling windows keep a fixed train length, anchored
+    windows always train from the first bar. The last test window may be cut short by the data.
+    Invalid lengths raise ValueError (see window_lengths()).
+    """
+    times = np.asarray(times).astype("datetime64[ns]").view(np.int64)
+    train, test, step = window_lengths(train, test, step)
+
+    windows = []
+    start = times[0]
+    while True:
+        test_start = start + train
+        bounds = np.searchsorted(times, [times[0] if anchored else start, test_start, test_start + test],
+                                 side="left")
+        if bounds[1] >= len(times):
+            break
+        if bounds[0] < bounds[1] < bounds[2]:
+            windows.append((int(bounds[0]), int(bounds[1]), int(bounds[1]), int(bounds[2])))
+        start += step
+    return windows
+
+
+def backtest_window(params, lo, hi):
+    """Run the strategy and BackTester on rows [lo, hi) of the shared columns.
+
+    Indicators are the full-history values, so the window starts with warm indicators and a
+    flat position; the bar before lo only feeds the crossover lookback.
+    """
+    columns = shared['columns']
+    symbol, trade_amt, compound_flag, execution = shared['config']
+    first = max(lo - 1, 0)
+
+    window = {name: values[first:hi] for name, values in columns.items()}
+    signals, _ = generate_signals(window, **params, start_index=max(lo, START_INDEX) - first)
+    bars = {
+        'datetime': shared['datetime'][lo:hi],
+        'open': window['open'][lo - first:],
+        'high': window['high'][lo - first:],
+        'low': window['low'][lo - first:],
+        'close': window['close'][lo - first:],
+        'volume': window['volume'][lo - first:],
+        'signals': signals[lo - first:],
+    }
+
+    bt = BackTester(symbol, signal_data_path=bars, compound_flag=compound_flag, initial_capital=trade_amt,
+                    execution=execution)
+    with redirect_stderr(io.StringIO()):
+        bt.get_trades(trade_amt)
+    return bt
+
+
+def run_fold(fold):
+    """Optimize parameters on the fold's train rows and evaluate the best set on its test rows."""
+    train_lo, train_hi, test_lo, test_hi = fold['window']
+
+    best_params, best_score = None, -np.inf
+    for params in fold['grid']:
+        stats = backtest_window(params, train_lo, train_hi).get_statistics()
+        score = stats[fold['objective']] if stats else -np.inf
+        if best_params is None or score > best_score:
+            best_params, best_score = params, score
+
+    bt = backtest_window(best_params, test_lo, test_hi)
+    bt.calc_pnl()
+    return {
+        'params': best_params,
+        'train_score': best_score,
+        'test_stats': bt.get_statistics(),
+        'pnl': bt.data['pnl'].to_numpy(),
+    }
+
+
+def walk_forward(data, ranges, train="365D", test="90D", step=None, anchored=False, objective="Net Profit",
+                 symbol="BTC", trade_amt=1000, compound_flag=1, max_workers=None, execution=None):
+    """Walk-forward optimization over processed indicator data.
+
+    For every window the parameter grid built from `ranges` (as for sweep()) is backtested
+    on the train rows, the combination with the highest `objective` statistic is kept and
+    then backtested on the following test rows. Indicators are computed once by the caller
+    and shared read-only with the worker processes, which run the folds concurrently.
+
+    Returns (folds, equity): a DataFrame with one row per fold (windows, chosen parameters,
+    train score and test statistics) and the stitched out-of-sample equity curve. Each fold
+    trades trade_amt from its own start; with compound_flag the fold's pnl is scaled by the
+    capital reached at its start, since pnl is linear in the starting trade amount (up to
+    fee_tiers and impact). execution is the ExecutionModel of every backtest (default: flat fee).
+    """
+    times = pd.to_datetime(data['datetime']).to_numpy(dtype="datetime64[ns]")
+    windows = walk_forward_windows(times, train, test, step, anchored)
+    grid = parameter_grid(ranges)
+    folds = [{'window': window, 'grid': grid, 'objective': objective} for window in windows]
+
+    shm, layout = share_columns(data)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=attach_shared,
+                                 initargs=(layout, symbol, trade_amt, compound_flag, execution)) as pool:
+            results = list(pool.map(run_fold, folds))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    rows, pnls, fold_ids = [], [], []
+    capital = trade_amt
+    for i, ((train_lo, train_hi, test_lo, test_hi), result) in enumerate(zip(windows, results)):
+        scale = capital / trade_amt if compound_flag else 1
+        pnl = result['pnl'] * scale
+        capital += pnl.sum()
+        pnls.append(pnl)
+        fold_ids.append(np.full(len(pnl), i))
+
+        stats = result['test_stats'] or {'Total Trades': 0}
+        rows.append({
+            'train_start': times[train_lo], 'train_end': times[train_hi - 1],
+            'test_start': times[test_lo], 'test_end': times[test_hi - 1],
+            **result['params'],
+            'train_score': result['train_score'],
+            **{f"test {key}": value for key, value in stats.items()},
+        })
+
+    test_rows = np.concatenate([np.arange(w[2], w[3]) for w in windows]) if windows else np.zeros(0, dtype=int)
+    pnl = np.concatenate(pnls) if pnls else np.zeros(0)
+    equity = pd.DataFrame({
+        'fold': np.concatenate(fold_ids) if fold_ids else np.zeros(0, dtype=int),
+        'pnl': pnl,
+        'capital': trade_amt + np.cumsum(pnl),
+    }, index=pd.DatetimeIndex(times[test_rows], name="datetime"))
+
+    return pd.DataFrame(rows), equity
+
+
+def main(argv=None):
+    from main import process_data
+
+    parser = argparse.ArgumentParser(description="Walk-forward optimization of strat() parameters.")
+    parser.add_argument("--data", default="BTC_2019_2023_1d.csv", help="OHLCV CSV file or columnar store")
+    parser.add_argument("--train", default="365D", help="train window length")
+    parser.add_argument("--test", default="90D", help="test window length")
+    parser.add_argument("--step", default=None, help="window step (default: test window length)")
+    parser.add_argument("--anchored", action="store_true", help="always train from the first bar")
+    parser.add_argument("--objective", default="Net Profit", help="get_statistics() metric to maximize")
+    parser.add_argument("--output", default="walk_forward.csv", help="where to write the per-fold table")
+    parser.add_argument("--equity-output", default=None, help="where to write the out-of-sample equity curve")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--trade-amt", type=float, default=1000)
+    parser.add_argument("--compound-flag", type=int, default=1)
+    for name, default in DEFAULT_PARAMS.items():
+        parser.add_argument("--" + name.replace('_', '-'), default=None,
+                            help=f"values as 'a,b,c' or 'start:stop:step' (default {default})")
+    args = parser.parse_args(argv)
+
+    ranges = {}
+    for name, default in DEFAULT_PARAMS.items():
+        text = getattr(args, name)
+        if text is not None:
+            try:
+                ranges[name] = parse_values(text, type(default))
+            except ValueError as error:
+                parser.error(f"--{name.replace('_', '-')}: {error}")
+    try:
+        window_lengths(args.train, args.test, args.step)
+    except ValueError as error:
+        parser.error(str(error))
+
+    data = process_data(load_ohlcv(args.data))
+
+    start = time.perf_counter()
+    folds, equity = walk_forward(data, ranges, args.train, args.test, args.step, args.anchored, args.objective,
+                                 trade_amt=args.trade_amt, compound_flag=args.compound_flag,
+                                 max_workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    folds.to_csv(args.output, index=False)
+    if args.equity_output:
+        equity.to_csv(args.equity_output)
+    print(f"Ran {len(folds)} folds in {elapsed:.2f}s, results written to {args.output}")
+    if len(equity):
+        print(f"Out-of-sample capital: {args.trade_amt:.2f} -> {equity['capital'].iloc[-1]:.2f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])